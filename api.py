@@ -50,6 +50,8 @@ import fnmatch
 import fileinput
 import csv, sys
 
+from hc2.devices.vdevice import VirtualDevice
+
 CMD_MATCH_STR = 'local cmdText ='
 ARG_MATCH_STR = 'local argText ='
 
@@ -168,16 +170,15 @@ class HomeCenter2(object):
         '''{dev_id}.button.{id}.{name}.{caption}.lua if it is lua button
         {dev_id}.button.{id}.{name}.{caption}.txt if is is sck text button
         '''
+        vdev = self._get_vdev_model(dev)
         self.logger.debug('... _get_dev_btn_dump_filename_by_btn_id(dev=%s,btn_id=%s)' % (
-            dev['name'].encode('utf8'),btn_id))
-        buttons = self._get_dev_all_buttons(dev)
-        for button in buttons:
-            if str(button['id']) == str(btn_id): 
-                filename = self._get_dev_btn_dump_filename(dev['id'], button)
-                self.logger.debug('... btn_dump_filename %s' % filename)
-                return filename
-        self.logger.warning('... can not find button dump filename!')
-        return None
+            vdev.name.encode('utf8'),btn_id))
+        filename = vdev.btn_filename(btn_id)
+        if filename is None:
+            self.logger.warning('... can not find button dump filename!')
+            return None
+        self.logger.debug('... btn_dump_filename %s' % filename)
+        return filename
         
     def _get_dev_btn_dump_filename(self,dev_id,button):
         '''{dev_id}.button.{id}.{name}.{caption}.lua if it is lua button
@@ -313,14 +314,14 @@ class HomeCenter2(object):
         
         return dev
     
+    def _get_vdev_model(self,dev):
+        '''return VirtualDevice of dev json object (or dev itself if already a VirtualDevice)'''
+        if isinstance(dev, VirtualDevice):
+            return dev
+        return VirtualDevice(dev, self._get_dev_btn_dump_filename)
+
     def _get_dev_all_buttons(self,dev):
-        buttons = []
-        for entry in dev['properties']['rows']:
-            entry_type = entry['type']
-            for element in entry['elements']:
-                if entry_type == 'button':
-                    buttons.append(element)
-        return buttons
+        return self._get_vdev_model(dev).buttons
         
     def _update_vdev_on_hc2(self,dev):
         api_url = 'http://%s:%s/api/virtualDevices/%s' % (self.hostname,self.hostport,dev['id'])
@@ -500,9 +501,10 @@ class HomeCenter2(object):
         
         # dump vdev from hc2
         dev = self.dump_device(dev_id)
+        vdev = self._get_vdev_model(dev)
         
         # get src btn dump filename
-        src_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev,src_btn_id)
+        src_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(vdev,src_btn_id)
         self.logger.info('... src btn filename %s' % src_btn_filename)
         if src_btn_filename is None:
             self.logger.warning('can not clone vdev button code, exit')
@@ -515,28 +517,26 @@ class HomeCenter2(object):
         #    btn_msg = fh.read().encode('utf8')
 
         # cp src btn dump file to dest btn dump file
-        buttons = self._get_dev_all_buttons(dev)
-        for button in buttons:
-            dest_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev, button['id'])
-            dest_btn_file_path = os.path.join(dump_path,dest_btn_filename)
-            if dest_btn_id is None:
-                # update all buttons
+        if dest_btn_id is None:
+            # update all buttons
+            for button, dest_btn_filename in vdev.btn_filenames():
                 t_btn_id = button['id']
                 if str(t_btn_id) != str(src_btn_id):
-                    shutil.copyfile(src_btn_file_path, dest_btn_file_path)
+                    shutil.copyfile(src_btn_file_path, os.path.join(dump_path,dest_btn_filename))
                     self.logger.info('... cp src btn (%s) dump file for all btn (%s) dump file' % (
                         src_btn_id,t_btn_id))
                 else:
                     self.logger.debug('... skip cp src btn (%s) dump file for all btn (%s) dump file' % (
                         src_btn_id,t_btn_id))
+        else:
+            dest_btn_filename = vdev.btn_filename(dest_btn_id)
+            if dest_btn_filename is not None:
+                shutil.copyfile(src_btn_file_path, os.path.join(dump_path,dest_btn_filename))
+                self.logger.info('... cp src btn (%s) dump file for dest btn (%s) dump file' % (
+                    src_btn_id,dest_btn_id))
             else:
-                if str(dest_btn_id) == str(button['id']):
-                    shutil.copyfile(src_btn_file_path, dest_btn_file_path)
-                    self.logger.info('... cp src btn (%s) dump file for dest btn (%s) dump file' % (
-                        src_btn_id,dest_btn_id))
-                else:
-                    self.logger.debug('... skip cp src btn (%s) dump file for dest btn (%s) dump file' % (
-                        src_btn_id,dest_btn_id))
+                self.logger.warning('... dest btn (%s) not exist, skip cp src btn (%s) dump file' % (
+                    dest_btn_id,src_btn_id))
         
         # update hc2 vdev for hc2
         self.update_vdevice(dev_id)
@@ -582,10 +582,8 @@ class HomeCenter2(object):
         self.logger.info('backup_vdev_btn_cmd_arg(dev_id=%s)' % dev_id)
         dev = self._get_vdev_by_id(dev_id)
         dump_path = self._get_dev_dump_path(dev_id)
-        buttons = self._get_dev_all_buttons(dev)
         cmd_arg_list = []
-        for button in buttons:
-            btn_filename = self._get_dev_btn_dump_filename(dev_id, button)
+        for button, btn_filename in self._get_vdev_model(dev).btn_filenames():
             btn_file_path = os.path.join(dump_path,btn_filename)
             btn_cmd_arg = self._parse_cmd_arg_text_from_file(btn_file_path)
             btn_caption = button['caption'].encode('utf8')
@@ -630,7 +628,7 @@ class HomeCenter2(object):
         
         # get vdev json object from local json file
         with open(filename) as fh:
-            dev = json.loads(fh.read())
+            vdev = self._get_vdev_model(json.loads(fh.read()))
 
         # parsing cmd_arg file and update local btn dump file
         cmd_arg_filename = self._get_vdev_btn_cmd_arg_filename(dev_id)  
@@ -642,9 +640,9 @@ class HomeCenter2(object):
                 for row in reader:
                     self.logger.debug('... row (%s)' % row)
                     btn_id,_,cmd_text,arg_text = row
-                    btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev,btn_id)
-                    btn_file_path = os.path.join(dump_path,btn_filename)
-                    if os.path.exists(btn_file_path):
+                    btn_filename = self._get_dev_btn_dump_filename_by_btn_id(vdev,btn_id)
+                    btn_file_path = os.path.join(dump_path,btn_filename or '')
+                    if btn_filename and os.path.exists(btn_file_path):
                         for line in fileinput.input(btn_file_path, inplace=1):
                             if CMD_MATCH_STR in line:
                                 new_line = "%s '%s'\n" % (CMD_MATCH_STR,cmd_text)
@@ -658,7 +656,7 @@ class HomeCenter2(object):
                                     line.replace('\n',''),new_line.replace('\n','')))
                             sys.stdout.write(new_line)
                     else:
-                        self.logger.warning('... btn file not exist, skip' % btn_filename)
+                        self.logger.warning('... btn file not exist, skip %s' % btn_filename)
                         
         else:
             self.logger.warning('... no cmd_arg backup file exist, exit! %s' % cmd_arg_filename) 
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Offline throughput benchmarks of hc2 service operations against the
+in-process FakeHC2Server:
+
+    dump        HC2BaseService.dump_device of each virtual device
+    push        HC2BaseService.update_vdevice of each dumped virtual device
+    push_many   HC2BaseService.update_vdevices of all dumped virtual devices
+    clone       HC2BaseService.clone_vdevice of a dumped virtual device (clone is deleted after)
+    topology    HC2BaseService.get_hc2_topology
+    resolve     HC2BaseService.get_hc2_id_by_name of each scene name with a loaded topology
+
+Usage::
+
+    $ python bench/bench_hc2.py --devices 200 --latency 0.01
+    $ python bench/bench_hc2.py --bench dump --bench push --json
+
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures  # noqa: E402
+from hc2.base_service import HC2BaseService  # noqa: E402
+from hc2.api_base import HC2APIBase  # noqa: E402
+from hc2.api_cache import HC2ResponseCache  # noqa: E402
+
+
+class HC2Benchmark(object):
+
+    def __init__(self, server, dump_root, logger=None):
+        self.server = server
+        self.dump_root = dump_root
+        self.logger = logger or logging.getLogger(__name__)
+        self.service = HC2BaseService(server.args(dump_root=dump_root), self.logger)
+
+    def _vdev_ids(self):
+        return [dev['id'] for dev in self.server.fixtures.devices if dev.get('type') == 'virtual_device']
+
+    def _clear_cache(self):
+        """drop the cached hc2 responses, so the next GETs are sent to the server"""
+        HC2ResponseCache.get_cache(self.server.host, self.server.port, self.server.username).clear()
+
+    def _scene_names(self):
+        return [scene['name'] for scene in self.server.fixtures.scenes if scene['visible']]
+
+    def bench_dump(self):
+        dev_ids = self._vdev_ids()
+        for dev_id in dev_ids:
+            self.service.dump_device(dev_id)
+        return len(dev_ids)
+
+    def bench_push(self):
+        dev_ids = self._vdev_ids()
+        for dev_id in dev_ids:
+            if not os.path.exists(self.service._get_dev_dump_path(dev_id)):
+                self.service.dump_device(dev_id)
+        # the GETs of the dump setup are not pushed from the response cache
+        self._clear_cache()
+        self.server.reset_counts()
+        start = time.time()
+        for dev_id in dev_ids:
+            self.service.update_vdevice(dev_id)
+        return len(dev_ids), time.time() - start
+
+    def bench_push_many(self):
+        dev_ids = self._vdev_ids()
+        self.service.dump_devices(dev_ids)
+        self._clear_cache()
+        self.server.reset_counts()
+        start = time.time()
+        self.service.update_vdevices(dev_ids)
+        return len(dev_ids), time.time() - start
+
+    def bench_clone(self, count=5):
+        dev_ids = self._vdev_ids()[:1]
+        if not dev_ids:
+            return 0
+        self.service.dump_device(dev_ids[0])
+        self.server.reset_counts()
+        start = time.time()
+        new_ids = []
+        for _ in range(count):
+            new_dev = self.service.clone_vdevice(dev_ids[0])
+            if new_dev:
+                new_ids.append(new_dev['id'])
+        elapsed = time.time() - start
+        from hc2.api_vdev import HC2APIVirtualDevice
+        vdev_api = HC2APIVirtualDevice(self.service.args, self.logger)
+        for new_id in new_ids:
+            vdev_api.delete(new_id)
+        return count, elapsed
+
+    def bench_topology(self, count=5):
+        for _ in range(count):
+            self.service.get_hc2_topology()
+        return count
+
+    def bench_resolve(self):
+        topology = self.service.get_hc2_topology()
+        names = self._scene_names()
+        self.server.reset_counts()
+        start = time.time()
+        for name in names:
+            self.service.get_hc2_id_by_name(name, topology=topology)
+        return len(names), time.time() - start
+
+    def run(self, name):
+        """return result dict of benchmark name"""
+
+        # start each benchmark cold: no pooled connection, no cached response
+        HC2APIBase.close_sessions()
+        self._clear_cache()
+        self.server.reset_counts()
+
+        start = time.time()
+        result = getattr(self, 'bench_%s' % name)()
+        elapsed = time.time() - start
+        if isinstance(result, tuple):
+            # benchmark with its own setup step, timed by itself
+            result, elapsed = result
+        return {
+            'bench': name,
+            'ops': result,
+            'seconds': round(elapsed, 4),
+            'ops_per_second': round(result / elapsed, 2) if elapsed else None,
+            'requests': self.server.total_requests(),
+            'bytes': self.server.bytes_sent,
+        }
+
+
+BENCHMARKS = ['dump', 'push', 'push_many', 'clone', 'topology', 'resolve']
+
+
+def _format_table(results):
+    lines = ['%-10s %8s %10s %10s %10s %12s' % ('bench', 'ops', 'seconds', 'ops/s', 'requests', 'bytes')]
+    for result in results:
+        lines.append('%-10s %8s %10.4f %10s %10s %12s' % (
+            result['bench'], result['ops'], result['seconds'], result['ops_per_second'],
+            result['requests'], result['bytes']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hc2 service throughput benchmarks on a fake hc2')
+    parser.add_argument('--bench', action='append', choices=BENCHMARKS, default=None,
+                        help='benchmark to run, can be given multiple times, default: all')
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--vdevs', type=int, default=None, help='default: devices / 10')
+    parser.add_argument('--scenes', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- response delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 503')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--json', action='store_true', default=False, help='print results as json')
+    parser.add_argument('--debug', action='store_true', default=False)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+                        level=logging.DEBUG if args.debug else logging.ERROR)
+    logger = logging.getLogger('bench')
+
+    fixtures = HC2Fixtures(devices=args.devices, vdevs=args.vdevs, scenes=args.scenes, rooms=args.rooms)
+    dump_root = tempfile.mkdtemp(prefix='hc2bench')
+    results = []
+    with FakeHC2Server(fixtures, latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, logger=logger) as server:
+        try:
+            benchmark = HC2Benchmark(server, dump_root, logger)
+            for _ in range(args.repeat):
+                for name in args.bench or BENCHMARKS:
+                    results.append(benchmark.run(name))
+        finally:
+            HC2APIBase.close_sessions()
+            shutil.rmtree(dump_root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(_format_table(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+"""
+In-process stand-in of a Fibaro HC2 web api for offline tests and benchmarks.
+
+FakeHC2Server serves fixture data from memory on a local port:
+
+    /api/devices[/<id>]                 GET
+    /api/virtualDevices[/<id>]          GET, POST, PUT, DELETE
+    /api/scenes[/<id>]                  GET, PUT
+    /api/sceneControl?id=<id>&action=   GET
+    /api/globalVariables[/<name>]       GET, POST, PUT, DELETE
+    /api/rooms[/<id>]                   GET
+    /api/users[/<id>]                   GET
+    /api/service/reboot                 POST
+    /api/refreshStates?last=<cursor>    GET
+
+with configurable response latency, jitter and error rate. Virtual device
+fixtures are built from cmds/repo_daikin/*.json.template and
+cmds/repo_saporo/saporo.json.template.
+
+Writes through the api and the emit helpers (set_device_property,
+set_gvar, emit) append hc2 change events to the refreshStates feed,
+a refreshStates request without newer events is held up to
+refresh_wait seconds (long-poll).
+
+Usage::
+
+    server = FakeHC2Server(HC2Fixtures(devices=400), latency=0.02).start()
+    hc2 = HC2BaseService(server.args(), logger)
+    ...
+    server.stop()
+
+or run it standalone::
+
+    $ python bench/fake_hc2.py --port 8080 --devices 400 --latency 0.02
+
+"""
+
+import os
+import re
+import sys
+import socket
+import copy
+import json
+import time
+import random
+import logging
+import threading
+import argparse
+import urlparse
+import BaseHTTPServer
+import SocketServer
+from collections import deque
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VDEV_TEMPLATE_FILES = [
+    os.path.join(REPO_ROOT, 'cmds', 'repo_daikin', 'daikin.unit.json.template'),
+    os.path.join(REPO_ROOT, 'cmds', 'repo_saporo', 'saporo.json.template'),
+    os.path.join(REPO_ROOT, 'cmds', 'repo_daikin', 'daikin.master.json.template'),
+]
+
+ROOM_NAMES = ['Living Room', 'Kitchen', 'Bedroom', 'Study', 'Bathroom', 'Garage',
+              'Dining Room', 'Guest Room', 'Balcony', 'Hallway']
+DEVICE_TYPES = ['com.fibaro.binarySwitch', 'com.fibaro.multilevelSwitch',
+                'com.fibaro.temperatureSensor', 'com.fibaro.motionSensor']
+DEVICE_NAMES = ['Light', 'Dimmer', 'Temperature', 'Motion']
+SCENE_NAMES = ['Reading Mode', 'Turn on the lights at night', 'Movie Time', 'Good Morning',
+               'Good Night', 'Leave Home', 'Back Home', 'Party Mode', 'Environmental Information',
+               'All Lights Off']
+
+FIRST_DEVICE_ID = 10
+FIRST_SCENE_ID = 1
+FIRST_ROOM_ID = 1
+
+# refreshStates events kept for clients polling with an old cursor
+REFRESH_EVENTS_MAX = 10000
+
+
+def _load_template(file_path):
+    with open(file_path) as fh:
+        return json.loads(fh.read())
+
+
+class HC2Fixtures(object):
+    """hc2 entities served by FakeHC2Server, all collections are id ordered lists"""
+
+    def __init__(self, devices=100, vdevs=None, scenes=50, gvars=20, rooms=10, users=3, seed=0):
+        self.random = random.Random(seed)
+        self.rooms = self._build_rooms(rooms)
+        self.devices = self._build_devices(devices, devices // 10 if vdevs is None else vdevs)
+        self.scenes = self._build_scenes(scenes)
+        self.gvars = self._build_gvars(gvars)
+        self.users = self._build_users(users)
+
+    def _room_id(self, index):
+        return FIRST_ROOM_ID + index % len(self.rooms) if self.rooms else 0
+
+    def _build_rooms(self, count):
+        rooms = []
+        for i in range(count):
+            name = ROOM_NAMES[i % len(ROOM_NAMES)]
+            if i >= len(ROOM_NAMES):
+                name = '%s %s' % (name, i // len(ROOM_NAMES) + 1)
+            rooms.append({
+                'id': FIRST_ROOM_ID + i,
+                'name': name,
+                'sectionID': 1,
+                'icon': 'room_%s' % (i % 8),
+                'defaultSensors': {'temperature': 0, 'humidity': 0, 'light': 0},
+                'defaultThermostat': None,
+                'sortOrder': i + 1,
+            })
+        return rooms
+
+    def _build_devices(self, count, vdev_count):
+        templates = [_load_template(file_path) for file_path in VDEV_TEMPLATE_FILES]
+        devices = []
+        for i in range(count):
+            dev_id = FIRST_DEVICE_ID + i
+            room_id = self._room_id(i)
+            if i < vdev_count:
+                device = copy.deepcopy(templates[i % len(templates)])
+                device['name'] = '%s_%s' % (device['name'], dev_id)
+                device['type'] = 'virtual_device'
+                device['properties']['ip'] = '192.168.1.%s' % (100 + i % 100)
+            else:
+                type_index = i % len(DEVICE_TYPES)
+                device = {
+                    'name': '%s %s' % (DEVICE_NAMES[type_index], dev_id),
+                    'type': DEVICE_TYPES[type_index],
+                    'enabled': True,
+                    'visible': True,
+                    'properties': {
+                        'value': str(self.random.randint(0, 99)),
+                        'dead': 'false',
+                        'batteryLevel': str(self.random.randint(10, 100)),
+                        'configured': 'true',
+                        'zwaveVersion': '3.67',
+                    },
+                    'actions': {'turnOn': 0, 'turnOff': 0, 'setValue': 1},
+                    'created': 1510000000,
+                    'modified': 1510000000,
+                    'sortOrder': i + 1,
+                }
+            device['id'] = dev_id
+            device['roomID'] = room_id
+            devices.append(device)
+        return devices
+
+    def _build_scenes(self, count):
+        scenes = []
+        for i in range(count):
+            scene_id = FIRST_SCENE_ID + i
+            name = SCENE_NAMES[i % len(SCENE_NAMES)]
+            if i >= len(SCENE_NAMES):
+                name = '%s %s' % (name, i // len(SCENE_NAMES) + 1)
+            scenes.append({
+                'id': scene_id,
+                'name': name,
+                'type': 'lua',
+                'roomID': self._room_id(i),
+                'visible': i % 7 != 6,
+                'runConfig': 'TRIGGER_AND_MANUAL',
+                'autostart': False,
+                'runningInstances': 0,
+                'lua': '--[[\n%%%% properties\n%%%% globals\n--]]\n\n'
+                       'fibaro:debug("scene %s start")\n'
+                       'fibaro:call(%s, "turnOn")\n' % (scene_id, FIRST_DEVICE_ID + i),
+            })
+        return scenes
+
+    def _build_gvars(self, count):
+        gvars = []
+        for i in range(count):
+            if i < 2:
+                name = ['AC_Ctrl_Datas', 'AC_Ctrl_Cmds'][i]
+                value = json.dumps({'units': [{'uid': u, 'power': 'off'} for u in range(8)]})
+            else:
+                name = 'gvar_%s' % i
+                value = str(self.random.randint(0, 1000))
+            gvars.append({
+                'name': name,
+                'value': value,
+                'readOnly': False,
+                'isEnum': False,
+                'created': 1510000000,
+                'modified': 1510000000,
+            })
+        return gvars
+
+    def _build_users(self, count):
+        return [{'id': 2 + i,
+                 'name': 'admin' if i == 0 else 'user%s' % i,
+                 'type': 'superuser' if i == 0 else 'user',
+                 'email': 'user%s@example.com' % i} for i in range(count)]
+
+
+class _FakeHC2Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        self.server.hc2.logger.debug('fake hc2 ' + fmt % args)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _handle(self, method):
+        hc2 = self.server.hc2
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        try:
+            body = self._read_body() if method in ('PUT', 'POST') else None
+            status, content = hc2.handle(method, url.path, params, body, self.headers.get('Authorization'))
+        except Exception:
+            hc2.logger.error('fake hc2 %s %s fail' % (method, self.path), exc_info=True)
+            status, content = 500, None
+        if content is None:
+            data = ''
+        elif isinstance(content, str):
+            data = content
+        else:
+            data = json.dumps(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class):
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, handler_class)
+        self._requests = {}  # open request socket: its handler thread
+        self._requests_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self._process_request_thread, args=(request, client_address))
+        thread.daemon = self.daemon_threads
+        with self._requests_lock:
+            self._requests[request] = thread
+        thread.start()
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            with self._requests_lock:
+                self._requests.pop(request, None)
+
+    def close_requests(self, timeout=5.0):
+        """close the open (keep-alive) connections and wait their handler threads end"""
+        with self._requests_lock:
+            requests = list(self._requests.items())
+        for request, thread in requests:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        for request, thread in requests:
+            thread.join(timeout)
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], socket.error):
+            # client closed its keep-alive connection
+            self.hc2.logger.debug('fake hc2 connection %s:%s closed' % client_address)
+        else:
+            self.hc2.logger.error('fake hc2 request from %s:%s fail' % client_address, exc_info=True)
+
+
+class FakeHC2Server(object):
+
+    _path_re = re.compile(r'^/api/(?P<api>[A-Za-z]+)(?:/(?P<key>[^/]+))?(?:/(?P<action>[^/]+))?$')
+
+    def __init__(self, fixtures=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, username='admin', password='admin', seed=0, refresh_wait=1.0,
+                 logger=None):
+        self.fixtures = fixtures or HC2Fixtures()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.username = username
+        self.password = password
+        self.logger = logger or logging.getLogger(__name__)
+        self.random = random.Random(seed)
+        self.request_counts = {}  # (method, endpoint): count
+        self.bytes_sent = 0
+        self._httpd = None
+        self._thread = None
+        self._lock = threading.RLock()
+        self._collection_cache = {}  # api: serialized collection json
+        self.refresh_wait = refresh_wait
+        self._refresh_last = 1
+        self._refresh_events = deque(maxlen=REFRESH_EVENTS_MAX)  # (last, change, event)
+        self._refresh_cond = threading.Condition(self._lock)
+
+    # -- server life cycle
+    def start(self):
+        self._httpd = _ThreadingHTTPServer((self.host, self.port), _FakeHC2Handler)
+        self._httpd.hc2 = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.debug('fake hc2 listen on %s:%s' % (self.host, self.port))
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            with self._refresh_cond:
+                # release long-poll requests
+                self._refresh_cond.notify_all()
+            self._httpd.shutdown()
+            self._thread.join()
+            # no handler thread is left to run into the interpreter shutdown
+            self._httpd.close_requests()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def args(self, **kwargs):
+        """return argparse.Namespace with hc2 connection attributes for hc2 api/service classes"""
+        t_args = argparse.Namespace(hostname=self.host, hostport=self.port,
+                                    username=self.username, password=self.password)
+        for key, value in kwargs.items():
+            setattr(t_args, key, value)
+        return t_args
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts = {}
+            self.bytes_sent = 0
+
+    def total_requests(self):
+        with self._lock:
+            return sum(self.request_counts.values())
+
+    # -- refreshStates change events
+    def emit(self, event_type, data, change=None):
+        """append event {type, data} and the device state change {id, <property>: value}
+        to the refreshStates feed, return the feed cursor"""
+
+        with self._refresh_cond:
+            self._refresh_last += 1
+            self._refresh_events.append((self._refresh_last,
+                                         change, {'type': event_type, 'data': data}))
+            self._refresh_cond.notify_all()
+            return self._refresh_last
+
+    def set_device_property(self, dev_id, name, value):
+        """change device property and emit DevicePropertyUpdatedEvent"""
+
+        with self._lock:
+            _, device = self._find('devices', dev_id)
+            if device is None:
+                raise KeyError(dev_id)
+            properties = device.setdefault('properties', {})
+            old_value = properties.get(name)
+            properties[name] = value
+            self._changed()
+            return self.emit('DevicePropertyUpdatedEvent',
+                             {'id': device['id'], 'property': name, 'newValue': value, 'oldValue': old_value},
+                             {'id': device['id'], name: value})
+
+    def set_gvar(self, name, value):
+        """change global variable value and emit GlobalVariableChangedEvent"""
+
+        with self._lock:
+            _, gvar = self._find('globalVariables', name)
+            if gvar is None:
+                raise KeyError(name)
+            old_value = gvar['value']
+            gvar['value'] = value
+            self._changed()
+            return self.emit('GlobalVariableChangedEvent',
+                             {'variableName': name, 'newValue': value, 'oldValue': old_value})
+
+    def _refresh_states(self, params):
+        last = int(params.get('last') or 0)
+        if last and last >= self._refresh_last and self.refresh_wait:
+            # long-poll until a newer event or refresh_wait
+            self._refresh_cond.wait(self.refresh_wait)
+        events = [entry for entry in self._refresh_events if entry[0] > last] if last else []
+        return 200, json.dumps({
+            'status': 'IDLE',
+            'last': self._refresh_last,
+            'timestamp': int(time.time()),
+            'logs': [],
+            'changes': [change for _, change, _ in events if change is not None],
+            'events': [event for _, _, event in events],
+        })
+
+    def _emit_write(self, method, api, entry):
+        """emit the hc2 event of a write on api entry"""
+
+        if api == 'globalVariables':
+            event_type = {'PUT': 'GlobalVariableChangedEvent', 'POST': 'GlobalVariableAddedEvent',
+                          'DELETE': 'GlobalVariableRemovedEvent'}[method]
+            self.emit(event_type, {'variableName': entry['name'], 'newValue': entry.get('value')})
+        else:
+            event_type = {'PUT': 'ModifiedEvent', 'POST': 'CreatedEvent', 'DELETE': 'RemovedEvent'}[method]
+            self.emit(('Scene' if api == 'scenes' else 'Device') + event_type, {'id': entry['id']})
+
+    # -- request handling
+    def _collections(self):
+        return {
+            'devices': self.fixtures.devices,
+            'virtualDevices': self.fixtures.devices,
+            'scenes': self.fixtures.scenes,
+            'globalVariables': self.fixtures.gvars,
+            'rooms': self.fixtures.rooms,
+            'users': self.fixtures.users,
+        }
+
+    @staticmethod
+    def _key_of(api):
+        return 'name' if api == 'globalVariables' else 'id'
+
+    def _find(self, api, key):
+        key_name = self._key_of(api)
+        for index, entry in enumerate(self._collections()[api]):
+            if str(entry[key_name]) == str(key):
+                if api == 'virtualDevices' and entry.get('type') != 'virtual_device':
+                    return None, None
+                return index, entry
+        return None, None
+
+    def _collection_json(self, api):
+        content = self._collection_cache.get(api)
+        if content is None:
+            entries = self._collections()[api]
+            if api == 'virtualDevices':
+                entries = [entry for entry in entries if entry.get('type') == 'virtual_device']
+            content = self._collection_cache[api] = json.dumps(entries)
+        return content
+
+    def _changed(self):
+        self._collection_cache.clear()
+
+    def _authorized(self, authorization):
+        if self.username is None:
+            return True
+        import base64
+        expected = 'Basic ' + base64.b64encode('%s:%s' % (self.username, self.password))
+        return authorization == expected
+
+    def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle(self, method, path, params, body, authorization=None):
+        """return (status code, json object or str) of hc2 api request"""
+
+        m = self._path_re.match(path)
+        api = key = action = None
+        if m:
+            api, key, action = m.group('api'), m.group('key'), m.group('action')
+        endpoint = '/%s%s' % (api, '/{key}' if key else '')
+        with self._lock:
+            self.request_counts[(method, endpoint)] = self.request_counts.get((method, endpoint), 0) + 1
+
+        self._delay()
+        if not self._authorized(authorization):
+            return 401, None
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 503, None
+
+        with self._lock:
+            status, content = self._dispatch(method, api, key, action, params, body)
+            if isinstance(content, str):
+                self.bytes_sent += len(content)
+        return status, content
+
+    def _dispatch(self, method, api, key, action, params, body):
+        if api == 'sceneControl' and method == 'GET':
+            _, scene = self._find('scenes', params.get('id'))
+            if scene is None:
+                return 404, None
+            scene['runningInstances'] = 1 if params.get('action', 'start') == 'start' else 0
+            self._changed()
+            self.emit('SceneRunningInstancesEvent', {'id': scene['id'], 'runningInstances': scene['runningInstances']})
+            return 202, None
+
+        if api == 'refreshStates' and method == 'GET':
+            return self._refresh_states(params)
+
+        if api == 'service' and key == 'reboot' and method == 'POST':
+            return 202, None
+
+        if api not in self._collections() or action:
+            return 404, None
+
+        if method == 'GET':
+            if key is None:
+                return 200, self._collection_json(api)
+            _, entry = self._find(api, key)
+            return (200, json.dumps(entry)) if entry is not None else (404, None)
+
+        if method == 'PUT' and key is not None and api in ('virtualDevices', 'scenes', 'globalVariables'):
+            _, entry = self._find(api, key)
+            if entry is None:
+                return 404, None
+            for attr, value in (body or {}).items():
+                if attr not in ('id', 'type'):
+                    entry[attr] = value
+            entry['modified'] = int(time.time())
+            self._changed()
+            self._emit_write(method, api, entry)
+            return 200, json.dumps(entry)
+
+        if method == 'POST' and key is None and api in ('virtualDevices', 'globalVariables'):
+            entry = dict(body or {})
+            if api == 'virtualDevices':
+                entry['id'] = max([dev['id'] for dev in self.fixtures.devices] or [FIRST_DEVICE_ID]) + 1
+                entry['type'] = 'virtual_device'
+                entry.setdefault('roomID', 0)
+                entry['created'] = entry['modified'] = int(time.time())
+            elif self._find(api, entry.get('name'))[1] is not None:
+                return 409, None
+            self._collections()[api].append(entry)
+            self._changed()
+            self._emit_write(method, api, entry)
+            return 201, json.dumps(entry)
+
+        if method == 'DELETE' and key is not None and api in ('virtualDevices', 'globalVariables'):
+            index, entry = self._find(api, key)
+            if entry is None:
+                return 404, None
+            self._collections()[api].pop(index)
+            self._changed()
+            self._emit_write(method, api, entry)
+            return 200, None
+
+        return 405, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run fake Fibaro HC2 web api server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--vdevs', type=int, default=None)
+    parser.add_argument('--scenes', type=int, default=50)
+    parser.add_argument('--gvars', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- response delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 503')
+    parser.add_argument('--refresh-wait', type=float, default=1.0,
+                        help='seconds a refreshStates request without new events is held')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--debug', action='store_true', default=False)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+                        level=logging.DEBUG if args.debug else logging.INFO)
+    fixtures = HC2Fixtures(devices=args.devices, vdevs=args.vdevs, scenes=args.scenes,
+                           gvars=args.gvars, rooms=args.rooms)
+    server = FakeHC2Server(fixtures, host=args.host, port=args.port, latency=args.latency,
+                           jitter=args.jitter, error_rate=args.error_rate, refresh_wait=args.refresh_wait,
+                           username=args.username, password=args.password).start()
+    logging.info('fake hc2 serving %s devices on %s:%s, ctrl-c to stop' % (
+        len(fixtures.devices), server.host, server.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,15 @@ class CMDBase(object):
     astr_pi_port = 'pi_port'
     astr_modbus_id = 'modbus_id'
     astr_hc2_service = 'hc2_api'
+    astr_connect_timeout = 'connect_timeout'
+    astr_read_timeout = 'read_timeout'
+    astr_pool_maxsize = 'pool_maxsize'
+    astr_concurrency = 'concurrency'
+    astr_cache_ttl = 'cache_ttl'
+    astr_max_retries = 'max_retries'
+    astr_metrics_file = 'metrics_file'
+    astr_dump_root = 'dump_root'
+    astr_dump_dedup = 'dump_dedup'
     
     # -- common functions for all CMDBase
     @classmethod
@@ -47,6 +56,67 @@ class CMDBase(object):
             action='store_true',
             help='print debug message',
             default=False)
+
+        parser.add_argument(
+            '--connect-timeout',
+            dest=cls.astr_connect_timeout,
+            type=float,
+            help='hc2 api connect timeout in seconds',
+            default=None)
+
+        parser.add_argument(
+            '--read-timeout',
+            dest=cls.astr_read_timeout,
+            type=float,
+            help='hc2 api read timeout in seconds',
+            default=None)
+
+        parser.add_argument(
+            '--pool-maxsize',
+            dest=cls.astr_pool_maxsize,
+            type=int,
+            help='max keep-alive connections to one hc2',
+            default=None)
+
+        parser.add_argument(
+            '--concurrency',
+            dest=cls.astr_concurrency,
+            type=int,
+            help='max concurrent api requests to one hc2 for bulk commands',
+            default=None)
+
+        parser.add_argument(
+            '--cache-ttl',
+            dest=cls.astr_cache_ttl,
+            type=float,
+            help='seconds to reuse hc2 api GET responses, 0 to disable',
+            default=None)
+
+        parser.add_argument(
+            '--retries',
+            dest=cls.astr_max_retries,
+            type=int,
+            help='max retries of failed idempotent hc2 api requests',
+            default=None)
+
+        parser.add_argument(
+            '--metrics',
+            dest=cls.astr_metrics_file,
+            help='save hc2 api request metrics to file at exit (*.prom for prometheus text, json otherwise)',
+            default=None)
+
+        parser.add_argument(
+            '--dump-root',
+            dest=cls.astr_dump_root,
+            help='local dump folder of remote hc2 files, default: .dump',
+            default=None)
+
+        parser.add_argument(
+            '--dedup',
+            dest=cls.astr_dump_dedup,
+            action='store_true',
+            help='dump vdev button scripts into the content-addressed blob store (.dump/<hostname>/blobs)',
+            default=False)
         return parser
 
     @classmethod
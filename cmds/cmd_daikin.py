@@ -292,15 +292,21 @@ class CMDDaikin(CMDBase):
         dev_id = getattr(args, cls.astr_dev_id)
         
         # update local dumped btn files with local cmd_args_file
-        cmd_arg_list = hc2.daikin_update_btn_cmd_arg(dev_id)
+        summary = hc2.daikin_update_btn_cmd_arg(dev_id)
 
         # print update result
-        if cmd_arg_list:
+        if summary:
             sys.stderr.write('daikin vdev btn cmd arg update result:\n')
-            for entry in cmd_arg_list:
-                sys.stderr.write('%s\n' % entry)
+            for result in summary['results']:
+                if result['status'] == 'changed':
+                    for _,new_line in result['changes']:
+                        sys.stderr.write('%s %s\n' % (result['id'], new_line))
+                elif result['status'] != 'unchanged':
+                    sys.stderr.write('%s %s %s\n' % (result['id'], result['status'], result['error']))
+            sys.stderr.write('{total} btns: {changed} changed, {unchanged} unchanged, {missing} missing, '
+                             '{failed} failed in {seconds}s\n'.format(**summary))
         else:
-            sys.stderr.write('daikin vdev (%s) btn cmd arg update file\n' % dev_id)
+            sys.stderr.write('daikin vdev (%s) btn cmd arg update fail\n' % dev_id)
 
         # update hc2 vdev
         vdev = hc2.vdev_update(dev_id)
@@ -8,6 +8,8 @@ from cmd_base import CMDBase
     
 class CMDDevice(CMDBase):
 
+    astr_pull_all = 'pull_all'
+
     @classmethod
     def cmd_push(cls,args):
         '''todo not implement yet'''
@@ -19,6 +21,12 @@ class CMDDevice(CMDBase):
         ''''''
         hc2 = cls.get_args_hc2(args)
         dev_id = getattr(args, cls.astr_dev_id)
+        if getattr(args, cls.astr_pull_all, False):
+            cls.cmd_pull_all(args)
+            return
+        if dev_id is None:
+            sys.stderr.write('ERROR: dev_id or --all is required\n\n')
+            return
         if hc2.dev_pull(dev_id):
             sys.stderr.write('success pull remote({args.hostname}) device(id:{args.dev_id})\n\n'.format(
                 args=args))
@@ -26,6 +34,20 @@ class CMDDevice(CMDBase):
             sys.stderr.write('fail to pull remote({args.hostname}) device(id:{args.dev_id})\n\n'.format(
                 args=args))
 
+    @classmethod
+    def cmd_pull_all(cls, args):
+        '''pull all remote hc2 devices with one device list query'''
+        hc2 = cls.get_args_hc2(args)
+        summary = hc2.dev_pull_all()
+        if summary is None:
+            sys.stderr.write('fail to pull remote({args.hostname}) devices\n\n'.format(args=args))
+            return
+        for dev_id in summary['failed']:
+            sys.stderr.write('fail to pull remote({args.hostname}) device(id:{dev_id})\n'.format(
+                args=args, dev_id=dev_id))
+        sys.stderr.write('remote({args.hostname}) {dumped} of {total} devices pulled in {seconds}s\n\n'.format(
+            args=args, dumped=len(summary['dumped']), total=summary['total'], seconds=summary['seconds']))
+
     @classmethod
     def get_cmd_parser(cls,base_parser,subparsers):
         cmd_parser = subparsers.add_parser(
@@ -36,13 +58,24 @@ class CMDDevice(CMDBase):
         
         scmd_subparsers = cmd_parser.add_subparsers(title='sub-command')
         
-        # dev pull <remote> <dev_id>
+        # dev pull <remote> [<dev_id> | --all]
         scmd_parser = scmd_subparsers.add_parser(
             'pull',
             help='save hc2 device object json',
             parents=[base_parser])
         cls.add_parser_arg_remote_name(scmd_parser)
-        cls.add_parser_arg_dev_id(scmd_parser)
+        scmd_parser.add_argument(
+            cls.astr_dev_id,
+            type=int,
+            nargs='?',
+            default=None,
+            help='hc2 device id')
+        scmd_parser.add_argument(
+            '--all',
+            dest=cls.astr_pull_all,
+            action='store_true',
+            help='pull all hc2 devices with one device list query (see --concurrency)',
+            default=False)
         scmd_parser.set_defaults(func=cls.cmd_pull)
         
 #         # dev push <remote> <dev_id>
@@ -0,0 +1,75 @@
+"""
+Command Tool for HC2 Dry-Run Plan
+"""
+
+import sys
+import json
+
+from cmd_base import CMDBase
+
+
+class CMDPlan(CMDBase):
+
+    astr_category = 'category'
+    astr_json = 'json'
+
+    @classmethod
+    def _write_plan(cls, host_name, plan):
+        count = 0
+        for category in sorted(plan.keys()):
+            entries = plan[category]
+            if entries is None:
+                sys.stderr.write('err: fail to query remote hc2 (%s) %s\n' % (host_name, category))
+                continue
+            for entry in entries:
+                count += 1
+                sys.stdout.write('%s %s %s (%s)\n' % (
+                    entry['action'], category, entry['id'], (entry['name'] or u'').encode('utf8')))
+                for change in entry['changes']:
+                    if 'diff' in change:
+                        sys.stdout.write('    ~ %s\n' % change['attr'])
+                        for line in change['diff']:
+                            sys.stdout.write('      %s\n' % line.encode('utf8'))
+                    else:
+                        sys.stdout.write('    ~ %s: %s -> %s\n' % (
+                            change['attr'], json.dumps(change['old']), json.dumps(change['new'])))
+        sys.stderr.write('remote hc2 (%s) plan: %s pending changes\n' % (host_name, count))
+
+    @classmethod
+    def cmd_plan(cls, args):
+        """show pending changes of local dump files against remote hc2 without writing anything"""
+
+        hc2 = cls.get_args_hc2(args)
+        categories = getattr(args, cls.astr_category, None)
+        plan = hc2.plan(categories)
+        if getattr(args, cls.astr_json, False):
+            sys.stdout.write(json.dumps(plan, indent=2) + '\n')
+        else:
+            cls._write_plan(args.hostname, plan)
+        return plan
+
+    @classmethod
+    def get_cmd_parser(cls, base_parser, subparsers):
+        # plan <remote> [--category <category>] [--json]
+        cmd_parser = subparsers.add_parser(
+            'plan',
+            description=__doc__,
+            help=cls.cmd_plan.__doc__,
+            parents=[base_parser])
+        cls.add_parser_arg_remote_name(cmd_parser)
+        cmd_parser.add_argument(
+            '--category',
+            dest=cls.astr_category,
+            action='append',
+            choices=['devices', 'scenes', 'globalVariables'],
+            help='hc2 category to plan, can be given multiple times, default: all',
+            default=None)
+        cmd_parser.add_argument(
+            '--json',
+            dest=cls.astr_json,
+            action='store_true',
+            help='print plan as json',
+            default=False)
+        cmd_parser.set_defaults(func=cls.cmd_plan)
+
+        return cmd_parser
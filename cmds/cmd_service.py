@@ -9,6 +9,16 @@ from cmd_base import CMDBase
 
 class CMDService(CMDBase):
 
+    astr_snapshot_file = 'snapshot_file'
+    astr_category = 'category'
+    astr_key = 'key'
+    astr_match = 'match'
+    astr_changed_since = 'changed_since'
+    astr_remote_names = 'remote_names'
+    astr_listen = 'listen'
+    astr_refresh = 'refresh'
+    astr_live = 'live'
+
     @classmethod
     def cmd_reboot(cls, args):
         """reboot hc2 service"""
@@ -17,6 +27,76 @@ class CMDService(CMDBase):
 
         return hc2.service_reboot()
 
+    @classmethod
+    def cmd_snapshot(cls, args):
+        """save all hc2 entities into one compressed snapshot file"""
+
+        hc2 = cls.get_args_hc2(args)
+
+        return hc2.service_snapshot(getattr(args, cls.astr_snapshot_file, None))
+
+    @classmethod
+    def cmd_snapshot_get(cls, args):
+        """print one entity json object of a snapshot file"""
+
+        import json
+        from hc2.base_service import HC2BaseService
+        obj = HC2BaseService.read_snapshot(getattr(args, cls.astr_snapshot_file),
+                                           getattr(args, cls.astr_category),
+                                           getattr(args, cls.astr_key))
+        if obj is None:
+            sys.stderr.write('err: no {args.category} {args.key} in snapshot\n'.format(args=args))
+        else:
+            sys.stdout.write(json.dumps(obj, indent=2) + '\n')
+        return obj
+
+    @classmethod
+    def cmd_dumps(cls, args):
+        """list local dumped hc2 entities of the dump catalog"""
+
+        changed_since = getattr(args, cls.astr_changed_since, None)
+        if changed_since is not None:
+            import time
+            try:
+                changed_since = float(changed_since)
+            except ValueError:
+                fmt = '%Y-%m-%d %H:%M:%S' if ' ' in changed_since else '%Y-%m-%d'
+                changed_since = time.mktime(time.strptime(changed_since, fmt))
+
+        hc2 = cls.get_args_hc2(args)
+
+        return hc2.service_dumps(getattr(args, cls.astr_category, None),
+                                 getattr(args, cls.astr_match, None),
+                                 changed_since)
+
+    @classmethod
+    def cmd_name_server(cls, args):
+        """serve hc2 element name resolution over http for remote hc2s"""
+
+        import copy
+        import logging
+        from remotes import RemoteCollection
+        from hc2.name_service import HC2NameServer, HC2NameResolver
+
+        logger = logging.getLogger()
+        t_remotes = RemoteCollection(args, logger)
+        resolvers = {}
+        for remote_name in getattr(args, cls.astr_remote_names):
+            t_remote = t_remotes[remote_name]
+            if t_remote is None:
+                sys.stderr.write('err: remote %s not exist\n' % remote_name)
+                return None
+            t_args = copy.copy(args)
+            for astr in (cls.astr_hostname, cls.astr_hostport, cls.astr_username, cls.astr_password):
+                setattr(t_args, astr, t_remote[astr])
+            resolvers[remote_name] = HC2NameResolver(t_args, logger, getattr(args, cls.astr_refresh, None),
+                                                     live=getattr(args, cls.astr_live, False))
+
+        host, _, port = getattr(args, cls.astr_listen).rpartition(':')
+        server = HC2NameServer(resolvers, host or '0.0.0.0', int(port), logger=logger)
+        server.serve_forever()
+        return server
+
     @classmethod
     def get_cmd_parser(cls, base_parser, subparsers):
         cmd_parser = subparsers.add_parser(
@@ -34,3 +114,85 @@ class CMDService(CMDBase):
             parents=[base_parser])
         cls.add_parser_arg_remote_name(scmd_parser)
         scmd_parser.set_defaults(func=cls.cmd_reboot)
+
+        # service snapshot <remote> [--output <file>]
+        scmd_parser = scmd_subparsers.add_parser(
+            'snapshot',
+            help='save all hc2 entities into one compressed snapshot file',
+            parents=[base_parser])
+        cls.add_parser_arg_remote_name(scmd_parser)
+        scmd_parser.add_argument(
+            '--output',
+            dest=cls.astr_snapshot_file,
+            help='snapshot file path, default: .dump/<hostname>/snapshots/<hostname>.<time>.zip',
+            default=None)
+        scmd_parser.set_defaults(func=cls.cmd_snapshot)
+
+        # service snapshot-get <snapshot_file> <category> <key>
+        scmd_parser = scmd_subparsers.add_parser(
+            'snapshot-get',
+            help='print one entity of a snapshot file',
+            parents=[base_parser])
+        scmd_parser.add_argument(
+            cls.astr_snapshot_file,
+            help='snapshot file path')
+        scmd_parser.add_argument(
+            cls.astr_category,
+            choices=['devices', 'virtualDevices', 'scenes', 'globalVariables', 'rooms', 'users'],
+            help='hc2 entity category')
+        scmd_parser.add_argument(
+            cls.astr_key,
+            help='hc2 entity id (global variable name)')
+        scmd_parser.set_defaults(func=cls.cmd_snapshot_get)
+
+        # service dumps <remote> [--category <category>] [--match <glob>] [--changed-since <time>]
+        scmd_parser = scmd_subparsers.add_parser(
+            'dumps',
+            help='list local dumped hc2 entities',
+            parents=[base_parser])
+        cls.add_parser_arg_remote_name(scmd_parser)
+        scmd_parser.add_argument(
+            '--category',
+            dest=cls.astr_category,
+            choices=['devices', 'scenes', 'variables'],
+            help='dumped entity category, default: all',
+            default=None)
+        scmd_parser.add_argument(
+            '--match',
+            dest=cls.astr_match,
+            help='glob of dumped entity id or name',
+            default=None)
+        scmd_parser.add_argument(
+            '--changed-since',
+            dest=cls.astr_changed_since,
+            help='only entities whose dump changed after time (unix time or "YYYY-MM-DD[ HH:MM:SS]")',
+            default=None)
+        scmd_parser.set_defaults(func=cls.cmd_dumps)
+
+        # service name-server <remote> [<remote> ...] [--listen [<host>:]<port>] [--refresh <seconds>] [--live]
+        scmd_parser = scmd_subparsers.add_parser(
+            'name-server',
+            help='serve hc2 scene/device name resolution over http',
+            parents=[base_parser])
+        scmd_parser.add_argument(
+            cls.astr_remote_names,
+            nargs='+',
+            help='remote hc2 names, the key parameter of requests')
+        scmd_parser.add_argument(
+            '--listen',
+            dest=cls.astr_listen,
+            help='listen address, default: %(default)s',
+            default='0.0.0.0:8000')
+        scmd_parser.add_argument(
+            '--refresh',
+            dest=cls.astr_refresh,
+            type=float,
+            help='seconds to pull hc2 topology again, default: only reload on topology.json change',
+            default=None)
+        scmd_parser.add_argument(
+            '--live',
+            dest=cls.astr_live,
+            action='store_true',
+            help='keep hc2 topology current with the hc2 refreshStates change feed')
+        scmd_parser.set_defaults(func=cls.cmd_name_server)
+        return cmd_parser
@@ -7,6 +7,10 @@ import sys
 from cmd_dev import CMDDevice
 
 class CMDVDevice(CMDDevice):
+
+    astr_dev_ids = 'dev_ids'
+    astr_match = 'match'
+    astr_json = 'json'
     
     @classmethod
     def cmd_clone(cls,args):
@@ -45,11 +49,35 @@ class CMDVDevice(CMDDevice):
             sys.stderr.write('success to update vdev (%s,%s) on remote hc2 (%s)\n' % (
                 t_vdev['id'],t_vdev['name'].encode('utf8'),remote_name))
         else:
-            sys.stderr.write('fail to update vdev (%s,%s) on remote hc2 (%s)\n' % (
-                t_vdev['id'],t_vdev['name'].encode('utf8'),remote_name))
+            sys.stderr.write('fail to update vdev (%s) on remote hc2 (%s)\n' % (
+                dev_id,remote_name))
 
         return t_vdev
         
+    @classmethod
+    def cmd_push_many(cls,args):
+        '''update many vdevs on remote hc2 with local dumped files concurrently'''
+        hc2 = cls.get_args_hc2(args)
+        dev_ids = getattr(args, cls.astr_dev_ids) or None
+        summary = hc2.vdev_update_many(dev_ids, getattr(args, cls.astr_match, None))
+        if summary is None:
+            sys.stderr.write('fail to query devices of remote hc2 (%s)\n' % args.hostname)
+            return None
+
+        if getattr(args, cls.astr_json, False):
+            import json
+            sys.stdout.write(json.dumps(summary, indent=2) + '\n')
+            return summary
+
+        for result in summary['results']:
+            sys.stderr.write('{id:>6} {status:<9} {bytes:>9}B {seconds:>7}s {name} {detail}\n'.format(
+                id=result['id'], status=result['status'], bytes=result['bytes'], seconds=result['seconds'],
+                name=(result['name'] or u'').encode('utf8'),
+                detail=result['error'] or ','.join(result['changes'])))
+        sys.stderr.write('{total} vdevs: {changed} changed, {unchanged} unchanged, {failed} failed, '
+                         '{bytes} bytes sent in {seconds}s\n'.format(**summary))
+        return summary
+
     @classmethod
     def cmd_delete(cls,args):
         '''delete remote hc2 virtual device'''
@@ -86,6 +114,31 @@ class CMDVDevice(CMDDevice):
         cls.add_parser_arg_dev_id(scmd_parser)
         scmd_parser.set_defaults(func=cls.cmd_push)
 
+        # vdev push-many <remote> [<dev_id> ...] [--match <glob>] [--json]
+        scmd_parser = scmd_subparsers.add_parser(
+            'push-many',
+            help=cls.cmd_push_many.__doc__,
+            parents=[base_parser])
+        cls.add_parser_arg_remote_name(scmd_parser)
+        scmd_parser.add_argument(
+            cls.astr_dev_ids,
+            type=int,
+            nargs='*',
+            help='hc2 vdev ids (a repeated id is pushed once), default: all local dumped vdevs')
+        scmd_parser.add_argument(
+            '--match',
+            dest=cls.astr_match,
+            help='glob of local dumped vdev id or name, e.g. "DAIKIN_*", '
+                 'given vdev ids are filtered with it as well',
+            default=None)
+        scmd_parser.add_argument(
+            '--json',
+            dest=cls.astr_json,
+            action='store_true',
+            help='print push report as json',
+            default=False)
+        scmd_parser.set_defaults(func=cls.cmd_push_many)
+
         # vdev clone <remote> <dev_id>
         scmd_parser = scmd_subparsers.add_parser(
             'clone',
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Concurrent counterpart of HC2APIBase.
+
+python2 has no asyncio, so HC2APIAsync wraps any HC2APIBase subclass
+(HC2APIDevice, HC2APIVirtualDevice, HC2APIScene, HC2APIGlobalVariable,
+HC2APIRoom, HC2APIService, HC2APIUsers) and runs its calls on a thread pool.
+The number of requests in flight against one hc2 is bounded by a
+HC2HostLimit shared by every HC2APIAsync of the same (hostname, hostport,
+username). The limit is the concurrency configured last (concurrency
+argument or args.concurrency), a HC2APIAsync without configured
+concurrency keeps the current limit (HC2_POOL_MAXSIZE at first).
+
+Usage::
+
+    with HC2APIAsync(HC2APIDevice(args, logger), concurrency=4) as hc2:
+        devices = hc2.get_many(dev_ids)
+        results = hc2.map(update_func, dev_ids)   # any function calling hc2 apis
+
+"""
+
+import threading
+from multiprocessing.pool import ThreadPool
+
+from api_base import HC2APIBase, HC2_POOL_MAXSIZE
+
+
+class HC2HostLimit(object):
+    """bound of the calls in flight against one hc2, the limit can be changed while in use"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.inflight = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            while self.inflight >= self.limit:
+                self._cond.wait()
+            self.inflight += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+
+class HC2APIAsync(object):
+
+    astr_concurrency = 'concurrency'
+
+    # in flight request limits, key by (hostname, hostport, username)
+    _host_limits = {}
+    _host_limits_lock = threading.Lock()
+
+    def __init__(self, api, concurrency=None, logger=None, workers=None):
+        """concurrency (or args.concurrency) if given is the in flight limit of the hc2 of api,
+        workers is the worker threads of this instance, the in flight limit by default"""
+        if not isinstance(api, HC2APIBase):
+            raise ValueError('%s needs HC2APIBase instance, got %s' % (
+                self.__class__.__name__, type(api)))
+        self.api = api
+        self.logger = logger or api.logger
+        concurrency = concurrency or getattr(api.args, self.astr_concurrency, None)
+        self.host_limit = self.get_host_limit(api, int(concurrency) if concurrency else None)
+        self.concurrency = int(workers or concurrency or self.host_limit.limit)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def get_host_limit(cls, api, limit=None):
+        """return the in flight limit shared for the hc2 of api, set to limit if given"""
+
+        key = (api.hostname, str(api.hostport), api.username)
+        with cls._host_limits_lock:
+            host_limit = cls._host_limits.get(key)
+            if host_limit is None:
+                host_limit = cls._host_limits[key] = HC2HostLimit(limit or HC2_POOL_MAXSIZE)
+            elif limit and limit != host_limit.limit:
+                host_limit.set_limit(limit)
+        return host_limit
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.concurrency)
+        return self._pool
+
+    def close(self):
+        """stop worker threads after pending calls are done"""
+
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def _call(self, func, *args):
+        with self.host_limit:
+            try:
+                return func(*args)
+            except:
+                self.logger.error('{cls.__name__} {func.__name__} call exception'.format(
+                    cls=self.__class__, func=func), exc_info=True)
+                return None
+
+    def submit(self, func, *args):
+        """schedule func(*args) and return multiprocessing AsyncResult"""
+
+        return self._get_pool().apply_async(self._call, (func,) + args)
+
+    def map(self, func, items):
+        """return [func(item) for item in items] executed concurrently,
+        an item of tuple type is expanded as func arguments"""
+
+        results = [self.submit(func, *(item if type(item) is tuple else (item,)))
+                   for item in items]
+        return [result.get() for result in results]
+
+    # -- async version of HC2APIBase http methods
+    def get_async(self, key=None, params=None):
+        return self.submit(self.api.get, key, params)
+
+    def put_async(self, key, obj):
+        return self.submit(self.api.put, key, obj)
+
+    def post_async(self, obj):
+        return self.submit(self.api.post, obj)
+
+    def delete_async(self, key):
+        return self.submit(self.api.delete, key)
+
+    # -- bulk http methods
+    def get_many(self, keys):
+        """return api GET result list in the order of keys"""
+
+        return self.map(self.api.get, keys)
+
+    def put_many(self, items):
+        """items is list of (key, obj), return api PUT result list in the same order"""
+
+        return self.map(self.api.put, [tuple(item) for item in items])
+
+    def post_many(self, objs):
+        return self.map(self.api.post, [(obj,) for obj in objs])
+
+    def delete_many(self, keys):
+        return self.map(self.api.delete, keys)
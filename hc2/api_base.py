@@ -1,8 +1,33 @@
 #!/usr/bin/env python
 
 import logging
+import threading
 import requests
 import json
+import urllib
+import random
+import time
+
+from requests.adapters import HTTPAdapter
+
+from api_cache import HC2ResponseCache, HC2_CACHE_TTL
+from api_singleflight import HC2SingleFlight
+from api_breaker import HC2CircuitBreaker
+from api_errors import HC2APIError
+from json_stream import iter_json_array, project
+
+HC2_POOL_MAXSIZE = 4
+HC2_CONNECT_TIMEOUT = 5
+HC2_READ_TIMEOUT = 60
+HC2_MAX_RETRIES = 2
+HC2_RETRY_BACKOFF = 0.5
+HC2_RETRY_BACKOFF_MAX = 8
+HC2_STREAM_CHUNK_SIZE = 64 * 1024
+
+# http verbs safe to send again after a failure
+HC2_IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+# http status codes of an overloaded or restarting hc2
+HC2_RETRY_STATUS_CODES = (502, 503, 504)
 
 
 class HC2APIBase(object):
@@ -17,6 +42,23 @@ class HC2APIBase(object):
     astr_password = 'password'
     astr_remote_name = 'remotename'
     astr_config_file = 'config_file'
+    astr_pool_maxsize = 'pool_maxsize'
+    astr_connect_timeout = 'connect_timeout'
+    astr_read_timeout = 'read_timeout'
+    astr_cache_ttl = 'cache_ttl'
+    astr_max_retries = 'max_retries'
+
+    # api paths (beside api_url) whose content is changed by a write on this api
+    cache_related_paths = []
+    # endpoint template name of api_url/<key> in request records
+    key_template = '{id}'
+
+    # callables called with a record dict after every hc2 http request
+    _request_hooks = []
+
+    # keep-alive sessions shared by every api class, key by (hostname, hostport, username)
+    _sessions = {}
+    _sessions_lock = threading.Lock()
         
     def __init__(self,args=None,logger=None):
         self.args = args
@@ -30,59 +72,279 @@ class HC2APIBase(object):
             hc2=self)
         self.api_url = self.api_root_url
 
+        self.timeout = (
+            getattr(self.args, self.astr_connect_timeout, None) or HC2_CONNECT_TIMEOUT,
+            getattr(self.args, self.astr_read_timeout, None) or HC2_READ_TIMEOUT)
+        self.session = self.get_session(
+            self.hostname, self.hostport, self.username, self.password,
+            pool_maxsize=getattr(self.args, self.astr_pool_maxsize, None) or HC2_POOL_MAXSIZE)
+        cache_ttl = getattr(self.args, self.astr_cache_ttl, None)
+        self.cache_ttl = HC2_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.cache = HC2ResponseCache.get_cache(self.hostname, self.hostport, self.username)
+        self.single_flight = HC2SingleFlight.get_group(self.hostname, self.hostport, self.username)
+        self.circuit_breaker = HC2CircuitBreaker.get_breaker(self.hostname, self.hostport)
+        max_retries = getattr(self.args, self.astr_max_retries, None)
+        self.max_retries = HC2_MAX_RETRIES if max_retries is None else int(max_retries)
+        self._local = threading.local()
+
+    @property
+    def last_error(self):
+        """HC2APIError of the last failed api call in current thread, None if it succeeded"""
+        return getattr(self._local, 'last_error', None)
+
+    @last_error.setter
+    def last_error(self, error):
+        self._local.last_error = error
+
+    @classmethod
+    def get_session(cls, hostname, hostport, username, password, pool_maxsize=HC2_POOL_MAXSIZE):
+        """return keep-alive requests session shared by all api classes of the same hc2 account"""
+
+        key = (hostname, str(hostport), username)
+        with cls._sessions_lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                # pool_block keeps concurrent callers from opening more than
+                # pool_maxsize connections to the (weak) hc2 web server
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=int(pool_maxsize),
+                                      pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                cls._sessions[key] = session
+            session.auth = requests.auth.HTTPBasicAuth(username, password)
+        return session
+
+    @classmethod
+    def add_request_hook(cls, hook):
+        """register hook(record) called after every hc2 http request of all api classes,
+        record keys: method, endpoint, status, latency, request_bytes, response_bytes, retries"""
+        if hook not in HC2APIBase._request_hooks:
+            HC2APIBase._request_hooks.append(hook)
+
+    @classmethod
+    def remove_request_hook(cls, hook):
+        if hook in HC2APIBase._request_hooks:
+            HC2APIBase._request_hooks.remove(hook)
+
+    @classmethod
+    def close_sessions(cls):
+        """close all shared hc2 sessions and their pooled connections"""
+
+        with cls._sessions_lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+    @staticmethod
+    def _get_cache_key(api_url, params=None):
+        if params:
+            return api_url + '?' + urllib.urlencode(sorted(params.items()))
+        return api_url
+
+    def _invalidate_cache(self, key=None):
+        """drop cached responses made stale by a write on api_url/key"""
+
+        api_urls = [self.api_url] + [self.api_root_url + path for path in self.cache_related_paths]
+        for api_url in api_urls:
+            self.cache.invalidate(api_url, subtree=False)
+            if key:
+                self.cache.invalidate(api_url + '/{key}'.format(key=key))
+
+    def _get_endpoint(self, api_url):
+        """return endpoint template of api_url, e.g. /devices/{id}"""
+
+        if api_url.startswith(self.api_url + '/'):
+            return self.api_url[len(self.api_root_url):] + '/' + self.key_template
+        return api_url[len(self.api_root_url):]
+
+    def _report_request(self, method, api_url, endpoint, status, latency, kwargs, r, retries):
+        response_bytes = 0
+        if r is not None:
+            if kwargs.get('stream'):
+                # body is not read yet
+                response_bytes = int(r.headers.get('Content-Length', 0))
+            else:
+                response_bytes = len(r.content or '')
+        record = {
+            'method': method,
+            'endpoint': endpoint or self._get_endpoint(api_url),
+            'status': status,
+            'latency': latency,
+            'request_bytes': len(kwargs.get('data') or ''),
+            'response_bytes': response_bytes,
+            'retries': retries,
+        }
+        for hook in list(self._request_hooks):
+            try:
+                hook(record)
+            except:
+                self.logger.error('hc2 api request hook %s exception' % hook, exc_info=True)
+
+    def _request(self, method, api_url, endpoint=None, **kwargs):
+        """send http request to hc2 and return requests response,
+        idempotent requests are retried with exponential backoff and jitter,
+        raise HC2APIError for timeout, connection or other requests error or open circuit breaker"""
+
+        retries = self.max_retries if method in HC2_IDEMPOTENT_METHODS else 0
+        attempt = 0
+        r = None
+        status = None
+        start_time = time.time()
+        try:
+            while True:
+                if not self.circuit_breaker.allow():
+                    status = HC2APIError.CIRCUIT_OPEN
+                    raise HC2APIError(HC2APIError.CIRCUIT_OPEN, method, api_url, retries=attempt,
+                                      message='hc2 considered down, call skipped')
+                try:
+                    r = self.session.request(method, api_url, timeout=self.timeout, **kwargs)
+                except requests.exceptions.Timeout as e:
+                    error = HC2APIError(HC2APIError.TIMEOUT, method, api_url, retries=attempt, message=str(e))
+                except requests.exceptions.ConnectionError as e:
+                    error = HC2APIError(HC2APIError.CONNECTION, method, api_url, retries=attempt, message=str(e))
+                except requests.exceptions.RequestException as e:
+                    # e.g. ChunkedEncodingError or TooManyRedirects, not retried but still a failed
+                    # call for the circuit breaker, so a half open circuit is not left waiting
+                    status = HC2APIError.UNKNOWN
+                    self.circuit_breaker.record_failure()
+                    raise HC2APIError(HC2APIError.UNKNOWN, method, api_url, retries=attempt, message=str(e))
+                else:
+                    status = r.status_code
+                    if r.status_code not in HC2_RETRY_STATUS_CODES:
+                        self.circuit_breaker.record_success()
+                        return r
+                    error = HC2APIError(HC2APIError.HTTP, method, api_url, status_code=r.status_code,
+                                        retries=attempt)
+                    # return the connection of a streamed response to the pool before retry
+                    r.close()
+                status = error.status_code or error.kind
+
+                self.circuit_breaker.record_failure()
+                if attempt >= retries:
+                    raise error
+                # full jitter backoff
+                delay = random.uniform(0, min(HC2_RETRY_BACKOFF_MAX, HC2_RETRY_BACKOFF * 2 ** attempt))
+                self.logger.debug('%s, retry in %.2f seconds' % (error, delay))
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            if self._request_hooks:
+                self._report_request(method, api_url, endpoint, status, time.time() - start_time,
+                                     kwargs, r, attempt)
+
+    def _call_fail(self, method, api_url, status_code, content):
+        """log and keep the error of a hc2 call answered with unexpected status code"""
+
+        self.last_error = HC2APIError(HC2APIError.HTTP, method, api_url, status_code=status_code)
+        msg = 'hc2 {method} api ({api_url}) call fail with requests status code {status_code}'.format(
+            method=method.lower(), api_url=api_url, status_code=status_code)
+        self.logger.warning(msg)
+        self.logger.debug('requests.%s fail response content:\n%s', method.lower(), content)
+
+    def _call_exception(self, method, api_url, error=None):
+        """log and keep the error of a hc2 call raising exception"""
+
+        if isinstance(error, HC2APIError):
+            self.last_error = error
+            self.logger.warning('{cls.__name__} {error}'.format(cls=self.__class__, error=error))
+        elif isinstance(error, ValueError):
+            self.last_error = HC2APIError(HC2APIError.DECODE, method, api_url, message=str(error))
+            self.logger.warning('{cls.__name__} {error}'.format(cls=self.__class__, error=self.last_error))
+        else:
+            self.last_error = HC2APIError(HC2APIError.UNKNOWN, method, api_url, message=str(error))
+            self.logger.error('{cls.__name__} {method} func exception'.format(
+                cls=self.__class__, method=method.lower()), exc_info=True)
+
     def names(self):
         """return name list from GET"""
 
-        data_set = self.get(key=None)
         t_names = []
-        if type(data_set) is list:
-            for entry in data_set:
-                if entry.get('name',None):
-                    t_names.append(entry.get('name'))
+        for entry in self.iter_items(fields=['name']):
+            if entry.get('name',None):
+                t_names.append(entry.get('name'))
         return t_names
+
+    def iter_items(self, key=None, fields=None, params=None):
+        """yield hc2 collection GET json objects one at a time while the response is downloaded,
+        each object keeps only fields keys if fields is given;
+        iteration stops early on api error, check last_error after the loop"""
+
+        self.last_error = None
+        if key:
+            api_url = self.api_url + '/{key}'.format(key=key)
+        else:
+            api_url = self.api_url
+
+        r = None
+        try:
+            content = self.cache.get(self._get_cache_key(api_url, params), ttl=self.cache_ttl)
+            if content is not None:
+                self.logger.debug('api cache hit {}'.format(api_url))
+                chunks = [content]
+            else:
+                r = self._request('GET', api_url, params=params, stream=True)
+                if r.status_code != 200:
+                    self._call_fail('GET', api_url, r.status_code, r.content)
+                    return
+                chunks = r.iter_content(HC2_STREAM_CHUNK_SIZE)
+
+            for item in iter_json_array(chunks):
+                yield project(item, fields)
+        except Exception as e:
+            self._call_exception('GET', api_url, e)
+        finally:
+            if r is not None:
+                r.close()
         
     def get(self, key=None, params=None):
         """Implement HC2 HTTP GET API"""
     
+        self.last_error = None
+        if key:
+            api_url = self.api_url + '/{key}'.format(key=key)
+        else:
+            api_url = self.api_url
+
         try:
-            if key:
-                api_url = self.api_url + '/{key}'.format(key=key)
-            else:
-                api_url = self.api_url
+            cache_key = self._get_cache_key(api_url, params)
+            content = self.cache.get(cache_key, ttl=self.cache_ttl)
+            if content is not None:
+                self.logger.debug('api cache hit {}'.format(cache_key))
+                return json.loads(content)
 
-            r = requests.get(api_url,
-                             auth=requests.auth.HTTPBasicAuth(
-                                 self.username,
-                                 self.password))
+            def _fetch():
+                r = self._request('GET', api_url, params=params)
+                if r.status_code == 200:
+                    self.cache.set(cache_key, r.content, ttl=self.cache_ttl)
+                return r.status_code, r.content
 
-            if r.status_code == 200:
-                self.logger.debug('api content {}'.format(r.content))
-                data = r.json()
-                self.logger.debug('api data type {}, data {}'.format(type(data), data))
+            # concurrent callers of the same url share one request, each decodes its own copy
+            status_code, content = self.single_flight.do(cache_key, _fetch)
+
+            if status_code == 200:
+                self.logger.debug('api content %s', content)
+                data = json.loads(content)
+                self.logger.debug('api data type %s', type(data))
                 return data
             else:
-                msg = 'hc2 get api ({api_url}) call fail with requests status code {status_code}'.format(
-                    api_url=api_url,status_code=r.status_code)
-                self.logger.warning(msg)
-                self.logger.debug('requests.get fail response content:\n%s' % (r.content))
+                self._call_fail('GET', api_url, status_code, content)
                 return None
-        except:
-            self.logger.error('{cls.__name__} get func exception'.format(cls=self.__class__), exc_info=True)
+        except Exception as e:
+            self._call_exception('GET', api_url, e)
             return None
         
     def put(self,key,obj):
         """Implement HC2 HTTP PUT API"""
 
+        self.last_error = None
+        api_url = self.api_url + '/{key}'.format(key=key)
         try:
-            api_url = self.api_url + '/{key}'.format(key=key)
-    
-            r = requests.put(
-                api_url, 
-                data=json.dumps(obj),
-                auth=requests.auth.HTTPBasicAuth(self.username,self.password)) 
+            r = self._request('PUT', api_url, data=json.dumps(obj))
 
             if r.status_code == 200:
-                self.logger.debug('api content %s' % r.content)
+                self.logger.debug('api content %s', r.content)
                 if r.content.strip() != '':
                     data = r.json()
                     self.logger.debug('api data type %s' % type(data))
@@ -91,50 +353,43 @@ class HC2APIBase(object):
                     self.logger.warning('api content empty, nothing to return')
                     return True
             else:
-                msg = 'hc2 put api ({api_url}) call fail with requests status code {status_code}'.format(
-                    api_url=api_url,status_code=r.status_code)
-                self.logger.warning(msg)
-                self.logger.debug('requests.put fail response content:\n%s' % (r.content))
+                self._call_fail('PUT', api_url, r.status_code, r.content)
                 return None
-        except:
-            self.logger.error('{cls.__name__} put func exception'.format(cls=self.__class__), exc_info=True)
+        except Exception as e:
+            self._call_exception('PUT', api_url, e)
             return None
+        finally:
+            self._invalidate_cache(key)
         
         
     def post(self,obj):
         """Implement HC2 HTTP POST API"""
 
+        self.last_error = None
+        api_url = self.api_url
         try:
-            api_url = self.api_url
-    
-            r = requests.post(
-                api_url, 
-                data=json.dumps(obj),
-                auth=requests.auth.HTTPBasicAuth(self.username,self.password)) 
+            r = self._request('POST', api_url, data=json.dumps(obj))
 
             if r.status_code in range(200,300):
                 data = r.json()
                 self.logger.debug('api data type %s' % type(data))
                 return data
             else:
-                msg = 'hc2 post api ({api_url}) call fail with requests status code {status_code}'.format(
-                    api_url=api_url,status_code=r.status_code)
-                self.logger.warning(msg)
-                self.logger.debug('requests.post fail response content:\n%s' % (r.content))
+                self._call_fail('POST', api_url, r.status_code, r.content)
                 return None
-        except:
-            self.logger.error('{cls.__name__} post func exception'.format(cls=self.__class__), exc_info=True)
+        except Exception as e:
+            self._call_exception('POST', api_url, e)
             return None
+        finally:
+            self._invalidate_cache()
 
     def delete(self,key):
         """Implement HC2 HTTP POST API"""
 
+        self.last_error = None
+        api_url = self.api_url + '/{key}'.format(key=key)
         try:
-            api_url = self.api_url + '/{key}'.format(key=key)
-    
-            r = requests.delete(
-                api_url, 
-                auth=requests.auth.HTTPBasicAuth(self.username,self.password)) 
+            r = self._request('DELETE', api_url)
 
             if r.status_code in range(200,300):
                 #data = r.json()
@@ -142,14 +397,13 @@ class HC2APIBase(object):
                 self.logger.debug('api data type %s' % type(data))
                 return data
             else:
-                msg = 'hc2 delete api ({api_url}) call fail with requests status code {status_code}'.format(
-                    api_url=api_url,status_code=r.status_code)
-                self.logger.warning(msg)
-                self.logger.debug('requests.delete fail response content:\n%s' % (r.content))
+                self._call_fail('DELETE', api_url, r.status_code, r.content)
                 return None
-        except:
-            self.logger.error('{cls.__name__} delete func exception'.format(cls=self.__class__), exc_info=True)
+        except Exception as e:
+            self._call_exception('DELETE', api_url, e)
             return None
+        finally:
+            self._invalidate_cache(key)
         
     @classmethod
     def main(cls):
@@ -244,7 +498,21 @@ class HC2APIBase(object):
         except:
             hc2.logger.error('exec HomeCenter2 API cmd error',exc_info=True ) 
         
-        
+
+
+class HC2SummaryAPIBase(HC2APIBase):
+    """api of a hc2 collection with a compact summary record type"""
+
+    # HC2Summary subclass of the api collection entries
+    summary_cls = None
+
+    def summaries(self):
+        """return compact summary record list of the api collection"""
+
+        return [self.summary_cls.from_json(item)
+                for item in self.iter_items(fields=self.summary_cls.__slots__)]
+
+
 if __name__ == '__main__':
     HC2APIBase.main()
         
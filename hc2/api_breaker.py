@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+HC2CircuitBreaker stops api calls to a hc2 which keeps failing.
+
+After failure_threshold consecutive failures the circuit opens and calls
+fail fast for reset_timeout seconds, then one trial call is let through
+(half open). A success closes the circuit, a failure opens it again.
+"""
+
+import time
+import threading
+
+HC2_BREAKER_FAILURE_THRESHOLD = 5
+HC2_BREAKER_RESET_TIMEOUT = 30
+
+
+class HC2CircuitBreaker(object):
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    # circuit breakers shared by all api classes, key by (hostname, hostport)
+    _breakers = {}
+    _breakers_lock = threading.Lock()
+
+    def __init__(self, failure_threshold=HC2_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=HC2_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_time = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_breaker(cls, hostname, hostport):
+        """return the circuit breaker shared by all api classes of the same hc2"""
+
+        key = (hostname, str(hostport))
+        with cls._breakers_lock:
+            breaker = cls._breakers.get(key)
+            if breaker is None:
+                breaker = cls()
+                cls._breakers[key] = breaker
+        return breaker
+
+    def allow(self):
+        """return True if a call may be sent to hc2"""
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_time >= self.reset_timeout:
+                # let one trial call through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_time = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_time = time.time()
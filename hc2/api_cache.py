@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+HC2ResponseCache keeps HC2 api GET response content for a short time
+so that repeated lookups of the same resource (e.g. /api/devices) within
+one command do not download it again.
+
+The cache stores the raw response content, each hit is decoded again so
+callers can modify the returned json object freely.
+
+One cache is shared by all api classes of the same hc2 account, each call
+gives its own ttl (cache_ttl of the api args), so an api with a smaller ttl
+only reads content fetched within it and an api with ttl 0 never reads
+nor stores a cached response.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+HC2_CACHE_TTL = 10
+HC2_CACHE_MAX_ENTRIES = 256
+HC2_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class HC2ResponseCache(object):
+
+    # caches shared by all api classes, key by (hostname, hostport, username)
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, ttl=HC2_CACHE_TTL, max_entries=HC2_CACHE_MAX_ENTRIES,
+                 max_bytes=HC2_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # url: (set_time, expire_time, content), in LRU order
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_cache(cls, hostname, hostport, username):
+        """return the response cache shared by all api classes of the same hc2 account"""
+
+        key = (hostname, str(hostport), username)
+        with cls._caches_lock:
+            cache = cls._caches.get(key)
+            if cache is None:
+                cache = cls()
+                cls._caches[key] = cache
+        return cache
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _pop(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+        return entry
+
+    def get(self, url, ttl=None):
+        """return cached content of url or None if missing, expired or set more than
+        ttl seconds ago (the cache ttl if None)"""
+
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl:
+            return None
+        with self._lock:
+            entry = self._pop(url)
+            if entry is None:
+                return None
+            set_time, expire_time, content = entry
+            now = time.time()
+            if expire_time < now:
+                return None
+            if set_time + ttl < now:
+                # too old for this caller, still fresh for the callers of a larger ttl
+                self._entries[url] = entry
+                self._bytes += len(content)
+                return None
+            # re-insert as most recently used
+            self._entries[url] = entry
+            self._bytes += len(content)
+            return content
+
+    def set(self, url, content, ttl=None):
+        """cache content of url for ttl seconds (the cache ttl if None), a zero ttl only
+        drops the older cached content of url"""
+
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl or content is None or len(content) > self.max_bytes:
+            with self._lock:
+                self._pop(url)
+            return
+        with self._lock:
+            self._pop(url)
+            now = time.time()
+            self._entries[url] = (now, now + ttl, content)
+            self._bytes += len(content)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, url, subtree=True):
+        """drop url (with any query string) and, with subtree, all cached sub resources of url"""
+
+        with self._lock:
+            for t_url in list(self._entries.keys()):
+                if t_url == url or t_url.startswith(url + '?') or \
+                        (subtree and t_url.startswith(url + '/')):
+                    self._pop(t_url)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
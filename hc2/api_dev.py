@@ -2,10 +2,14 @@
 '''
 '''
 
-from api_base import HC2APIBase
+from api_base import HC2SummaryAPIBase
+from summary import DeviceSummary
 
-class HC2APIDevice(HC2APIBase):
-    
+class HC2APIDevice(HC2SummaryAPIBase):
+
+    # virtual devices are listed in /api/devices as well
+    cache_related_paths = ['/virtualDevices']
+    summary_cls = DeviceSummary
     
     def __init__(self,args=None,logger=None):
         super(HC2APIDevice,self).__init__(args, logger)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+HC2APIError describes why a hc2 api call failed, HC2APIBase keeps the
+error of the last failed call in its last_error attribute.
+"""
+
+
+class HC2APIError(Exception):
+
+    TIMEOUT = 'timeout'
+    CONNECTION = 'connection'
+    HTTP = 'http'
+    CIRCUIT_OPEN = 'circuit_open'
+    DECODE = 'decode'
+    UNKNOWN = 'unknown'
+
+    def __init__(self, kind, method, url, status_code=None, message=None, retries=0):
+        self.kind = kind
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.message = message
+        self.retries = retries
+        super(HC2APIError, self).__init__(str(self))
+
+    def __str__(self):
+        text = 'hc2 {e.method} api ({e.url}) {e.kind} error'.format(e=self)
+        if self.status_code is not None:
+            text += ' with status code {}'.format(self.status_code)
+        if self.retries:
+            text += ' after {} retries'.format(self.retries)
+        if self.message:
+            text += ': {}'.format(self.message)
+        return text
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'method': self.method,
+            'url': self.url,
+            'status_code': self.status_code,
+            'message': self.message,
+            'retries': self.retries,
+        }
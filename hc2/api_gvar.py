@@ -5,7 +5,8 @@
 from api_base import HC2APIBase
 
 class HC2APIGlobalVariable(HC2APIBase):
-    
+
+    key_template = '{name}'
     
     def __init__(self,args=None,logger=None):
         super(HC2APIGlobalVariable,self).__init__(args, logger)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+HC2APIMetrics aggregates the request records reported by the HC2APIBase
+request hook into per endpoint histograms of latency and payload size,
+which can be dumped as json or prometheus text format.
+
+Usage::
+
+    metrics = HC2APIMetrics().install()
+    ...  # hc2 api calls
+    sys.stderr.write(metrics.to_prometheus())
+
+A request record is a dict with keys::
+
+    method, endpoint (e.g. /devices/{id}), status (http status code or
+    HC2APIError kind), latency (seconds), request_bytes, response_bytes,
+    retries
+"""
+
+import json
+import threading
+
+from api_base import HC2APIBase
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """return [(le, count), ...] including +Inf"""
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': [[str(le), count] for le, count in self.cumulative()],
+        }
+
+
+class _EndpointStats(object):
+
+    def __init__(self):
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.request_bytes = _Histogram(BYTES_BUCKETS)
+        self.response_bytes = _Histogram(BYTES_BUCKETS)
+        self.retries = 0
+
+
+class HC2APIMetrics(object):
+
+    def __init__(self):
+        self._stats = {}  # (method, endpoint, status): _EndpointStats
+        self._lock = threading.Lock()
+
+    def install(self):
+        """start recording requests of all hc2 api classes"""
+        HC2APIBase.add_request_hook(self.record)
+        return self
+
+    def uninstall(self):
+        HC2APIBase.remove_request_hook(self.record)
+
+    def record(self, record):
+        key = (record['method'], record['endpoint'], str(record['status']))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats()
+            stats.latency.observe(record['latency'])
+            stats.request_bytes.observe(record['request_bytes'])
+            stats.response_bytes.observe(record['response_bytes'])
+            stats.retries += record['retries']
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {'requests': [
+                {
+                    'method': method,
+                    'endpoint': endpoint,
+                    'status': status,
+                    'latency_seconds': stats.latency.to_dict(),
+                    'request_bytes': stats.request_bytes.to_dict(),
+                    'response_bytes': stats.response_bytes.to_dict(),
+                    'retries': stats.retries,
+                } for (method, endpoint, status), stats in sorted(self._stats.items())]}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """return metrics in prometheus text exposition format"""
+
+        lines = []
+        with self._lock:
+            items = sorted(self._stats.items())
+            for name, attr, text in [
+                    ('hc2_api_request_duration_seconds', 'latency', 'hc2 api request latency'),
+                    ('hc2_api_request_bytes', 'request_bytes', 'hc2 api request body size'),
+                    ('hc2_api_response_bytes', 'response_bytes', 'hc2 api response body size')]:
+                lines.append('# HELP %s %s' % (name, text))
+                lines.append('# TYPE %s histogram' % name)
+                for (method, endpoint, status), stats in items:
+                    labels = 'method="%s",endpoint="%s",status="%s"' % (method, endpoint, status)
+                    histogram = getattr(stats, attr)
+                    for le, count in histogram.cumulative():
+                        lines.append('%s_bucket{%s,le="%s"} %s' % (name, labels, le, count))
+                    lines.append('%s_sum{%s} %s' % (name, labels, histogram.sum))
+                    lines.append('%s_count{%s} %s' % (name, labels, histogram.count))
+            lines.append('# HELP hc2_api_retries_total hc2 api request retries')
+            lines.append('# TYPE hc2_api_retries_total counter')
+            for (method, endpoint, status), stats in items:
+                labels = 'method="%s",endpoint="%s",status="%s"' % (method, endpoint, status)
+                lines.append('hc2_api_retries_total{%s} %s' % (labels, stats.retries))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, file_path):
+        """write metrics to file_path, prometheus format for *.prom file, json otherwise"""
+
+        if file_path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = self.to_json()
+        with open(file_path, 'w') as fh:
+            fh.write(content)
+        return file_path
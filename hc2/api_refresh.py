@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+'''
+'''
+
+import json
+
+from api_base import HC2APIBase
+
+# seconds a refreshStates request may be held by hc2 before it answers
+HC2_REFRESH_WAIT = 30
+
+
+class HC2APIRefreshStates(HC2APIBase):
+    """hc2 /api/refreshStates change feed, poll(last) returns the device state changes
+    and events after the feed cursor last, never cached"""
+
+    def __init__(self, args=None, logger=None, refresh_wait=HC2_REFRESH_WAIT):
+        super(HC2APIRefreshStates, self).__init__(args, logger)
+        self.api_url = self.api_root_url + '/refreshStates'
+        # a long-poll request is answered after refresh_wait at most
+        self.timeout = (self.timeout[0], max(self.timeout[1], refresh_wait + self.timeout[0]))
+        self.logger.debug('api_url: %s' % self.api_url)
+
+    def poll(self, last=None):
+        """return refreshStates json object {last, changes, events, ...} after cursor last,
+        None if api call fail"""
+
+        self.last_error = None
+        params = {'last': last} if last else None
+        try:
+            r = self._request('GET', self.api_url, endpoint='/refreshStates', params=params)
+            if r.status_code == 200:
+                return json.loads(r.content)
+            self._call_fail('GET', self.api_url, r.status_code, r.content)
+            return None
+        except Exception as e:
+            self._call_exception('GET', self.api_url, e)
+            return None
+
+
+if __name__ == '__main__':
+    HC2APIRefreshStates.main()
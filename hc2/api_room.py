@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 
-from api_base import HC2APIBase
+from api_base import HC2SummaryAPIBase
+from summary import RoomSummary
 
 
-class HC2APIRoom(HC2APIBase):
+class HC2APIRoom(HC2SummaryAPIBase):
+
+    summary_cls = RoomSummary
 
     def __init__(self, args=None, logger=None):
         super(HC2APIRoom, self).__init__(args, logger)
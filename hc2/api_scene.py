@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 
-from api_base import HC2APIBase
+from api_base import HC2SummaryAPIBase
+from summary import SceneSummary
 
 
-class HC2APIScene(HC2APIBase):
+class HC2APIScene(HC2SummaryAPIBase):
+
+    summary_cls = SceneSummary
 
     def __init__(self, args=None, logger=None):
         super(HC2APIScene,self).__init__(args, logger)
@@ -11,31 +14,27 @@ class HC2APIScene(HC2APIBase):
         self.logger.debug('api_url: %s' % self.api_url)
         
     def put(self, key, obj):
-        if self.put(self, key, obj):
+        if super(HC2APIScene, self).put(key, obj):
             return self.get(key)
         else:
             return None
 
     def _scene_control(self, scene_id, action='start'):
 
-        import requests
-
+        self.last_error = None
         api_url = self.api_root_url + '/sceneControl'
         params = {'id': scene_id, 'action': 'start'}
 
-        r = requests.get(api_url,
-                         params=params,
-                         auth=requests.auth.HTTPBasicAuth(
-                             self.username,
-                             self.password))
+        try:
+            r = self._request('GET', api_url, params=params)
+        except Exception as e:
+            self._call_exception('GET', api_url, e)
+            return False
 
         if r.status_code in range(200,300):
             return True
         else:
-            msg = 'hc2 get api ({api_url}) call fail with requests status code {status_code}'.format(
-                api_url=api_url, status_code=r.status_code)
-            self.logger.warning(msg)
-            self.logger.debug('requests.get fail response content:\n%s' % (r.content))
+            self._call_fail('GET', api_url, r.status_code, r.content)
             return False
 
     def start_scene(self, scene_id):
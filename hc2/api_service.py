@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 
-import requests
 import json
 
 from api_base import HC2APIBase
@@ -15,27 +14,24 @@ class HC2APIService(HC2APIBase):
 
     def reboot(self):
 
+        self.last_error = None
+        api_url = self.api_url + '/reboot'
         try:
-            api_url = self.api_url + '/reboot'
-
-            r = requests.post(
-                api_url,
-                data=json.dumps({'data':'reset'}),
-                auth=requests.auth.HTTPBasicAuth(self.username, self.password))
+            r = self._request('POST', api_url, endpoint='/service/reboot', data=json.dumps({'data':'reset'}))
 
             if r.status_code in range(200, 300):
                 data = r.content
                 self.logger.debug('api data type %s' % type(data))
                 return data
             else:
-                msg = 'hc2 post api ({api_url}) call fail with requests status code {status_code}'.format(
-                    api_url=api_url, status_code=r.status_code)
-                self.logger.warning(msg)
-                self.logger.debug('requests.post fail response content:\n%s' % r.content)
+                self._call_fail('POST', api_url, r.status_code, r.content)
                 return None
-        except:
-            self.logger.error('{cls.__name__} post func exception'.format(cls=self.__class__), exc_info=True)
+        except Exception as e:
+            self._call_exception('POST', api_url, e)
             return None
+        finally:
+            # nothing cached survives a controller reboot
+            self.cache.clear()
 
     # @staticmethod
     # def get_dev_api_service(service):
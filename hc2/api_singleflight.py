@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+HC2SingleFlight coalesces identical in flight hc2 api requests: while one
+thread is fetching an url, other threads asking for the same url wait for
+that request and share its response instead of sending their own.
+"""
+
+import threading
+
+
+class _HC2Call(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class HC2SingleFlight(object):
+
+    # single flight groups shared by all api classes, key by (hostname, hostport, username)
+    _groups = {}
+    _groups_lock = threading.Lock()
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_group(cls, hostname, hostport, username):
+        """return the single flight group shared by all api classes of the same hc2 account"""
+
+        key = (hostname, str(hostport), username)
+        with cls._groups_lock:
+            group = cls._groups.get(key)
+            if group is None:
+                group = cls()
+                cls._groups[key] = group
+        return group
+
+    def do(self, key, func):
+        """return func() result, func is called only once for concurrent callers of the same key,
+        an exception raised by func is raised to every waiting caller as well"""
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _HC2Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
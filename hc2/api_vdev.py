@@ -2,10 +2,15 @@
 """
 """
 
-from api_base import HC2APIBase
+from api_base import HC2SummaryAPIBase
+from summary import DeviceSummary
 
 
-class HC2APIVirtualDevice(HC2APIBase):
+class HC2APIVirtualDevice(HC2SummaryAPIBase):
+
+    # virtual devices are listed in /api/devices as well
+    cache_related_paths = ['/devices']
+    summary_cls = DeviceSummary
 
     def __init__(self, args=None, logger=None):
         super(HC2APIVirtualDevice,self).__init__(args, logger)
@@ -38,20 +38,35 @@ Utility Tool Usage Examples:
 
 from api_scene import HC2APIScene
 from api_gvar import HC2APIGlobalVariable
+from api_dev import HC2APIDevice
+from api_room import HC2APIRoom
+from api_vdev import HC2APIVirtualDevice
+from api_async import HC2APIAsync
+from devices.registry import HC2DeviceRegistry
+from devices.vdevice import VirtualDevice
+from dump_manifest import HC2DumpManifest
+from dump_catalog import HC2DumpCatalog
+from snapshot import HC2Snapshot
+from blob_store import HC2BlobStore
+from name_index import HC2NameIndex, MATCH_RATIO_THRESHOLD
 
 import logging
 import re
 import os
 import json
+import copy
 import shutil
-import fnmatch
-import fileinput
 import csv
 import sys
 import codecs
+import time
+from multiprocessing.pool import ThreadPool
 
 CMD_MATCH_STR = 'local cmdText ='
 ARG_MATCH_STR = 'local argText ='
+# button script line holding CMD_MATCH_STR or ARG_MATCH_STR, the whole line is rewritten on restore
+CMD_ARG_LINE_RE = re.compile(r'^[^\n]*?(?P<match>%s|%s)[^\n]*$' % (
+    re.escape(CMD_MATCH_STR), re.escape(ARG_MATCH_STR)), re.MULTILINE)
 
 
 class HC2BaseService(object):
@@ -60,12 +75,19 @@ class HC2BaseService(object):
     astr_password = 'password'
     astr_hostname = 'hostname'
     astr_hostport = 'hostport'
+    astr_dump_root = 'dump_root'
+    astr_concurrency = 'concurrency'
+    astr_dump_dedup = 'dump_dedup'
 
     username = None
     password = None
     hostname = None
     hostport = None
     args = None
+    # {file path: added | modified | removed} of the last dump/pull call
+    last_dump_changes = None
+    # [{attr, old, new}, ...] of the last update_vdevice call
+    last_update_diff = None
 
     def __init__(self, args=None, logger=None):
         self.logger = logger or logging.getLogger(__name__)
@@ -79,6 +101,8 @@ class HC2BaseService(object):
         if self.username is None or self.password is None and self.hostname is None:
             raise ValueError('%s init with error username or password or hostname' %
                              self.__class__.__name__)
+
+        self.device_registry = HC2DeviceRegistry(HC2APIDevice(self.args, self.logger), self.logger)
     
     def __str__(self, *args, **kwargs):
         return '%s (%s:%s)' % (self.__class__.__name__,self.hostname,self.hostport)
@@ -99,6 +123,9 @@ class HC2BaseService(object):
         self.logger.debug('__getitem__ call %s with obj id %s' % (func_name,obj_id))
 
         if func:
+            item_func = getattr(self, '_get_%s_item' % obj_group, None)
+            if obj_id and item_func:
+                return item_func(obj_id)
             hc2_group = func()
             if obj_id:
                 for obj in hc2_group:
@@ -114,16 +141,12 @@ class HC2BaseService(object):
             return None
         
     def _get_devices(self):
-        """return hc2 /api/devices"""
-        import api_dev
-        hc2_dev_api = api_dev.HC2APIDevice(self.args,self.logger)
-        t_devices = hc2_dev_api.get(key=None)
-        if t_devices:
-            self._devices = t_devices
-        else:
-            self.logger.warning('hc2 device api for all devices call fail')
-           
-        return t_devices 
+        """return hc2 /api/devices, only the device registry summary index is kept"""
+        return self.device_registry.load()
+
+    def _get_devices_item(self, dev_id):
+        """return hc2 device from registry index or /api/devices/<dev_id>"""
+        return self.device_registry.get(dev_id)
         
     def _get_device_by_id(self,dev_id):
         return self['devices.'+str(dev_id)]
@@ -157,9 +180,14 @@ class HC2BaseService(object):
     # __getitem__ implement end
     
     # --- dump_device
+    def _get_dump_root_path(self):
+        """return the dump folder (./.dump/hostname) path without creating it"""
+        dump_root = getattr(self.args, self.astr_dump_root, None) or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), '.dump')
+        return os.path.join(dump_root, self.hostname)
+
     def _get_dump_root(self, del_exist=False):
-        dump_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), '.dump', self.hostname)
+        dump_path = self._get_dump_root_path()
 
         if os.path.exists(dump_path):
             if del_exist:
@@ -181,8 +209,11 @@ class HC2BaseService(object):
     #         os.makedirs(dump_path)
     #     return dump_path
     #
-    def _get_dev_dump_path(self,dev_id,del_exist=False):
-        """ create dump folder (./.dump/hostname/devices/dev_id) if not exist"""
+    def _get_dev_dump_path(self,dev_id,del_exist=False,create=True):
+        """ create dump folder (./.dump/hostname/devices/dev_id) if not exist,
+        only return its path if create is False"""
+        if not create:
+            return os.path.join(self._get_dump_root_path(),'devices',str(dev_id))
         dump_path = os.path.join(
             self._get_dump_root(),'devices',str(dev_id))
         if os.path.exists(dump_path):
@@ -210,17 +241,16 @@ class HC2BaseService(object):
         """{dev_id}.button.{id}.{name}.{caption}.lua if it is lua button
         {dev_id}.button.{id}.{name}.{caption}.txt if is is sck text button
         """
+        vdev = self._get_vdev_model(dev)
         self.logger.debug('... _get_dev_btn_dump_filename_by_btn_id(dev=%s,btn_id=%s)' % (
-            dev['name'].encode('utf8'),btn_id))
-        buttons = self._get_dev_all_buttons(dev)
-        for button in buttons:
-            if str(button['id']) == str(btn_id): 
-                filename = self._get_dev_btn_dump_filename(dev['id'], button)
-                self.logger.debug('... btn_dump_filename %s' % 
-                                  filename.encode('utf8'))
-                return filename
-        self.logger.warning('... can not find button dump filename!')
-        return None
+            vdev.name.encode('utf8'),btn_id))
+        filename = vdev.btn_filename(btn_id)
+        if filename is None:
+            self.logger.warning('... can not find button dump filename!')
+            return None
+        self.logger.debug('... btn_dump_filename %s' % 
+                          filename.encode('utf8'))
+        return filename
         
     def _get_dev_btn_dump_filename(self,dev_id,button):
         """{dev_id}.button.{id}.{name}.{caption}.lua if it is lua button
@@ -250,49 +280,195 @@ class HC2BaseService(object):
             dev_id=dev['id'],dev_name=dev['name'].encode('utf8'))
         return filename.decode('utf8')
 
+    def _get_dump_manifest(self):
+        """return the content hash manifest of this hc2 dump root"""
+        dump_root = self._get_dump_root()
+        manifest = getattr(self, '_dump_manifest', None)
+        if manifest is None or self._dump_manifest_root != dump_root:
+            manifest = self._dump_manifest = HC2DumpManifest(dump_root, self.logger)
+            self._dump_manifest_root = dump_root
+        return manifest
+
+    def _get_dump_catalog(self, create=True):
+        """return the sqlite catalog of the entities dumped in this hc2 dump root,
+        a new catalog is filled once from the existing dump folders,
+        None if create is False and no catalog exists yet"""
+        if not create:
+            if not os.path.exists(os.path.join(self._get_dump_root_path(), HC2DumpCatalog.filename)):
+                return None
+        dump_root = self._get_dump_root()
+        catalog = getattr(self, '_dump_catalog', None)
+        if catalog is None or self._dump_catalog_root != dump_root:
+            catalog = self._dump_catalog = HC2DumpCatalog(dump_root, self.logger)
+            self._dump_catalog_root = dump_root
+            if catalog.created:
+                self._index_dump_root(catalog)
+        return catalog
+
+    def _index_dump_root(self, catalog):
+        """record the entities of existing dump folders (dumped before the catalog) in catalog"""
+        dump_root = catalog.dump_root
+        for category in ('devices', 'scenes', 'variables'):
+            category_path = os.path.join(dump_root, category)
+            if not os.path.isdir(category_path):
+                continue
+            for key in os.listdir(category_path):
+                dump_path = os.path.join(category_path, key)
+                if not os.path.isdir(dump_path):
+                    continue
+                files = {}
+                json_filename = None
+                for filename in os.listdir(dump_path):
+                    file_path = os.path.join(dump_path, filename)
+                    if not os.path.isfile(file_path) or filename.endswith('.tmp'):
+                        continue
+                    with open(file_path, 'rb') as fh:
+                        files[filename] = fh.read()
+                    if filename == key + '.json' or (
+                            filename.startswith(key + '.') and filename.endswith('.json')):
+                        json_filename = filename
+                if json_filename is None:
+                    continue
+                try:
+                    entity = json.loads(files[json_filename])
+                except ValueError:
+                    self.logger.warning('dump file %s is not json, skip' % json_filename.encode('utf8'))
+                    continue
+                catalog.record(category, key, dump_path, files, json_filename,
+                               name=entity.get('name'), type=entity.get('type'),
+                               room_id=entity.get('roomID'),
+                               pulled=os.path.getmtime(os.path.join(dump_path, json_filename)))
+        catalog.save()
+        self.logger.debug('dump catalog %s created with %s entities' % (catalog.file_path, len(catalog)))
+
+    def _catalog_dump(self, category, key, entity, dump_path, files, json_filename):
+        """record entity dumped as files in the dump catalog"""
+        self._get_dump_catalog().record(
+            category, key, dump_path, files, json_filename,
+            name=entity.get('name'), type=entity.get('type'), room_id=entity.get('roomID'))
+
+    def _save_dump(self):
+        """save the dump manifest and commit the dump catalog"""
+        self._get_dump_manifest().save()
+        self._get_dump_catalog().save()
+
+    def get_dump_catalog(self, category=None, pattern=None, changed_since=None):
+        """return dump catalog entries of category (all if None) whose id or name matched with
+        glob pattern and whose dump content changed after timestamp changed_since"""
+        catalog = self._get_dump_catalog()
+        if changed_since is not None:
+            entries = catalog.changed_since(changed_since, category)
+            if pattern is not None:
+                matched = set((entry['category'], entry['id']) for entry in
+                              catalog.find(category, pattern=pattern))
+                entries = [entry for entry in entries if (entry['category'], entry['id']) in matched]
+            return entries
+        return catalog.find(category, pattern=pattern)
+
+    def _get_dumped_dev_json_file(self, dev_id):
+        """return local dumped device json file path of dev_id, None if not in the dump catalog"""
+        entry = self._get_dump_catalog().get('devices', dev_id)
+        if entry is None or entry['json_file'] is None or not os.path.exists(entry['json_file']):
+            self.logger.warning('device %s dump not exist in dump catalog (%s)' % (
+                dev_id, self._get_dump_catalog().file_path))
+            return None
+        return entry['json_file']
+
+    def _get_blob_store(self):
+        """return the content-addressed button script store of this hc2 dump root"""
+        return HC2BlobStore(os.path.join(self._get_dump_root(), 'blobs'), self.logger)
+
+    def _get_dev_btn_refs_filename(self, dev):
+        """{dev_id}.buttons.refs (json content, not *.json so it is not taken as the device json)"""
+        return u'{dev_id}.buttons.refs'.format(dev_id=dev['id'])
+
+    def _load_dev_btn_refs(self, dev_id):
+        """return {button id: reference entry} of the dedup button dump of dev_id, {} if not exist"""
+        dump_path = self._get_dev_dump_path(dev_id, create=False)
+        file_path = os.path.join(dump_path, self._get_dev_btn_refs_filename({'id': dev_id}))
+        if not os.path.exists(file_path):
+            return {}
+        key = (file_path, os.path.getmtime(file_path))
+        cached = getattr(self, '_btn_refs_cache', None)
+        if cached is None or cached[0] != key:
+            with open(file_path) as fh:
+                refs = dict((str(ref['id']), ref) for ref in json.loads(fh.read()))
+            cached = self._btn_refs_cache = (key, refs)
+        return cached[1]
+
+    def _restore_dev_btn_msgs(self, dev):
+        """fill the empty button msg of dumped dev json with its blob store script"""
+        refs = self._load_dev_btn_refs(dev['id'])
+        if not refs:
+            return dev
+        blob_store = self._get_blob_store()
+        for button in self._get_dev_all_buttons(dev):
+            ref = refs.get(str(button['id']))
+            if ref is not None and not button['msg']:
+                button['msg'] = blob_store.get_script(ref).decode('utf8')
+        return dev
+
     def _dump_device(self,dump_path,device):
         """save hc2 device json file ({dev_id}.{dev_name}.json) 
         and msg of button element content:
             lua: button.{id}.{name}.{caption}.lua
             sck: button.{id}.{name}.{caption}.txt
+        (or blob store references {dev_id}.buttons.refs with --dedup,
+        the button msg in device json is then left empty)
         and mainloop code:
             main.{dev_name}.lua
+        only the files with changed content are written and files no longer
+        belonging to the device are removed, return {file path: change} dict
         """
 
-        # dump json
-        filename = self._get_dev_json_dump_filename(device)
-        #with open(os.path.join(dump_path,filename),'w') as fh:
-        with codecs.open(os.path.join(dump_path,filename), 'wb', encoding='utf8') as fh: 
-            fh.write(json.dumps(device,indent=2))
-        self.logger.debug('device %s (%s) json dumped' % (device['id'], device['name']))
-        
+        files = {}
+        blob_store = self._get_blob_store() if getattr(self.args, self.astr_dump_dedup, False) else None
+
         buttons = []
         if device['properties'].get('rows'):
             for entry in device['properties']['rows']:
                 if entry['type'] == 'button':
                     buttons += entry['elements']
-            
-        # dump buttons
-        if len(buttons) > 0:
-            for button in buttons:
-                btn_msg = button['msg']
-                btn_msg = btn_msg.encode('utf-8').replace('\\n','\n')
-                btn_caption = button['caption']
-                filename = self._get_dev_btn_dump_filename(device['id'],button)
-                #with open(os.path.join(dump_path,filename),'wb') as fh:
-                with codecs.open(os.path.join(dump_path,filename), 'wb', encoding='utf8') as fh: 
-                    fh.write(btn_msg.decode('utf8'))
-                self.logger.debug('dev btn %s msg dumped' % btn_caption)    
+
+        # dump json
+        filename = self._get_dev_json_dump_filename(device)
+        if blob_store is not None and buttons:
+            device = copy.deepcopy(device)
+            for entry in device['properties']['rows']:
+                if entry['type'] == 'button':
+                    for button in entry['elements']:
+                        button['msg'] = ''
+        files[filename] = json.dumps(device,indent=2)
+
+        # dump buttons, into the blob store with --dedup
+        btn_refs = []
+        for button in buttons:
+            btn_msg = button['msg']
+            btn_msg = btn_msg.encode('utf-8').replace('\\n','\n')
+            filename = self._get_dev_btn_dump_filename(device['id'],button)
+            if blob_store is None:
+                files[filename] = btn_msg
+                continue
+            ref = blob_store.put_script(btn_msg)
+            ref.update({'id': button['id'], 'name': button['name'], 'caption': button['caption'],
+                        'lua': button['lua'], 'file': filename})
+            btn_refs.append(ref)
+        if btn_refs:
+            files[self._get_dev_btn_refs_filename(device)] = json.dumps(btn_refs, indent=2)
 
         # dump main loop
         if device['properties'].get('mainLoop'):
             mainloop = device['properties']['mainLoop']
             mainloop = mainloop.encode('utf-8').replace('\\n','\n')
             filename = self._get_dev_mainloop_dump_filename(device)
-            with codecs.open(os.path.join(dump_path,filename), 'wb', encoding='utf8') as fh:
-                fh.write(mainloop.decode('utf8'))
-            self.logger.debug('dev mainloop code dumped %s' % filename)
-            
+            files[filename] = mainloop
+
+        changes = self._get_dump_manifest().sync_dir(dump_path, files)
+        self._catalog_dump('devices', device['id'], device, dump_path, files,
+                           self._get_dev_json_dump_filename(device))
+        self.logger.debug('device %s (%s) dumped, %s files changed' % (
+            device['id'], device['name'].encode('utf8'), len(changes)))
+        return changes
 
     def dump_device(self,dev_id):
         """get hc2 device json object via HTTP API and save as local files"""
@@ -301,8 +477,9 @@ class HC2BaseService(object):
          
         device = self._get_device_by_id(dev_id)
         if device:
-            dump_path = self._get_dev_dump_path(dev_id,True)
-            self._dump_device(dump_path, device)
+            dump_path = self._get_dev_dump_path(dev_id)
+            self.last_dump_changes = self._dump_device(dump_path, device)
+            self._save_dump()
             self.logger.debug('... dump_device [%s] completed' % device['name'])
             self.logger.debug('... dump path %s' % dump_path)
         else:
@@ -310,6 +487,122 @@ class HC2BaseService(object):
             
         return device
             
+    def _dump_device_worker(self, device):
+        """dump device into its own dump path, return file changes dict or None if fail"""
+        try:
+            dump_path = self._get_dev_dump_path(device['id'])
+            return self._dump_device(dump_path, device)
+        except Exception:
+            self.logger.error('dump device %s fail' % device.get('id'), exc_info=True)
+            return None
+
+    def dump_devices(self, dev_ids=None, concurrency=None):
+        """dump hc2 devices of dev_ids (all devices if None) with a single /api/devices query,
+        the device files are written by a worker thread pool,
+        return summary dict {total, dumped, failed, missing, seconds} or None if hc2 api call fail"""
+
+        self.logger.debug('dump_devices %s' % ('all' if dev_ids is None else dev_ids))
+        start = time.time()
+        devices = self._get_devices()
+        if devices is None:
+            self.logger.warning('dump_devices fail to query hc2 devices')
+            return None
+
+        missing = []
+        if dev_ids is not None:
+            dev_ids = [str(dev_id) for dev_id in dev_ids]
+            devices_by_id = dict((str(device['id']), device) for device in devices)
+            missing = [int(dev_id) for dev_id in dev_ids if dev_id not in devices_by_id]
+            devices = [devices_by_id[dev_id] for dev_id in dev_ids if dev_id in devices_by_id]
+            for dev_id in missing:
+                self.logger.warning('dump_devices device id %s not exist' % dev_id)
+
+        # create the shared parent folders before workers create device folders
+        devices_path = os.path.join(self._get_dump_root(), 'devices')
+        if not os.path.exists(devices_path):
+            os.makedirs(devices_path)
+
+        concurrency = int(concurrency or getattr(self.args, self.astr_concurrency, None) or 4)
+        manifest = self._get_dump_manifest()
+        catalog = self._get_dump_catalog()
+        pool = ThreadPool(concurrency)
+        try:
+            results = pool.map(self._dump_device_worker, devices)
+        finally:
+            pool.close()
+            pool.join()
+            manifest.save()
+            catalog.save()
+
+        changes = {}
+        for result in results:
+            changes.update(result or {})
+        summary = {
+            'total': len(devices) + len(missing),
+            'dumped': [device['id'] for device, result in zip(devices, results) if result is not None],
+            'failed': [device['id'] for device, result in zip(devices, results) if result is None],
+            'missing': missing,
+            'changes': changes,
+            'seconds': round(time.time() - start, 3),
+        }
+        self.logger.debug('... dump_devices completed, %s dumped, %s failed, %s missing in %ss' % (
+            len(summary['dumped']), len(summary['failed']), len(summary['missing']), summary['seconds']))
+        return summary
+
+    # --- snapshot
+    def _get_snapshot_apis(self):
+        """return [(category, api), ...] of hc2 entities saved in a snapshot"""
+        import api_vdev
+        import api_room
+        import api_user
+        return [
+            ('devices', HC2APIDevice(self.args, self.logger)),
+            ('virtualDevices', api_vdev.HC2APIVirtualDevice(self.args, self.logger)),
+            ('scenes', HC2APIScene(self.args, self.logger)),
+            ('globalVariables', HC2APIGlobalVariable(self.args, self.logger)),
+            ('rooms', api_room.HC2APIRoom(self.args, self.logger)),
+            ('users', api_user.HC2APIUsers(self.args, self.logger)),
+        ]
+
+    def snapshot(self, file_path=None):
+        """stream every hc2 device, virtual device, scene, global variable, room and user
+        into one compressed snapshot file (default: <dump root>/snapshots/<hostname>.<time>.zip),
+        return the snapshot file path"""
+
+        if file_path is None:
+            snapshot_path = os.path.join(self._get_dump_root(), 'snapshots')
+            if not os.path.exists(snapshot_path):
+                os.makedirs(snapshot_path)
+            file_path = os.path.join(snapshot_path, '%s.%s.zip' % (
+                self.hostname, time.strftime('%Y%m%d-%H%M%S')))
+        self.logger.debug('snapshot hc2 into %s' % file_path)
+
+        # write into a temp file, an interrupted snapshot never looks complete
+        tmp_path = file_path + '.tmp'
+        with HC2Snapshot(tmp_path, 'w', hostname=self.hostname, logger=self.logger) as snapshot:
+            for category, api in self._get_snapshot_apis():
+                key_name = api.key_template.strip('{}')
+                count = 0
+                for obj in api.iter_items():
+                    snapshot.add(category, obj[key_name], obj)
+                    count += 1
+                if api.last_error is not None:
+                    self.logger.warning('snapshot %s incomplete, api call fail' % category)
+                    snapshot.add_error(category, api.last_error.to_dict())
+                self.logger.debug('... snapshot %s %s entries' % (count, category))
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        os.rename(tmp_path, file_path)
+
+        self.logger.debug('... snapshot completed')
+        return file_path
+
+    @staticmethod
+    def read_snapshot(file_path, category, key):
+        """return a single json object of category with key (id or name) from snapshot file"""
+        with HC2Snapshot(file_path) as snapshot:
+            return snapshot.get(category, key)
+
     # --- update_vdevice
     def _get_dev_bak_path(self,dev_id,del_exist=False):
         """ create backup folder (./.dump/hostname/devices/dev_id.origin) if not exist"""
@@ -324,24 +617,33 @@ class HC2BaseService(object):
             os.makedirs(bak_path)
         return bak_path
         
-    def _button_update_with_dump_file(self,button,dev_id):
-        # check device dump file exist
-        dump_path = self._get_dev_dump_path(dev_id)
+    def _read_dev_btn_msg(self,button,dev_id):
+        """return unicode button msg of local dump file (or blob store), None if not dumped"""
+        dump_path = self._get_dev_dump_path(dev_id, create=False)
         btn_filename = self._get_dev_btn_dump_filename(dev_id,button)
         btn_file_path = os.path.join(dump_path,btn_filename)
-        if not os.path.exists(btn_file_path):
-            self.logger.warning('device button dump file %s not exist' % btn_file_path)
-            return
-        
-        # update hc2 device button msg content via hc2 api
-        with open(btn_file_path) as fh:
-            btn_msg = fh.read()
-            btn_msg.replace('\n','\\n')
-            self.logger.debug('... new msg content: %s' % btn_msg)
+        if os.path.exists(btn_file_path):
+            with open(btn_file_path) as fh:
+                btn_msg = fh.read()
+        else:
+            ref = self._load_dev_btn_refs(dev_id).get(str(button['id']))
+            if ref is None:
+                self.logger.warning('device button dump file %s not exist' % btn_file_path)
+                return None
+            btn_msg = self._get_blob_store().get_script(ref)
+        return btn_msg.decode('utf8')
+
+    def _button_update_with_dump_file(self,button,dev_id):
+        """set button msg with local dump file content, return True if msg changed"""
+        btn_msg = self._read_dev_btn_msg(button,dev_id)
+        if btn_msg is None or btn_msg == button['msg']:
+            return False
+        self.logger.debug('... new msg content: %s' % btn_msg.encode('utf8'))
             
         # update device rows poperties
         button['msg'] = btn_msg
-        self.logger.debug('... button [%s] msg changed' % button['caption'])
+        self.logger.debug('... button [%s] msg changed' % button['caption'].encode('utf8'))
+        return True
             
     def _get_vdev_by_id(self,dev_id,backup=False):
 
@@ -363,61 +665,65 @@ class HC2BaseService(object):
         
         return dev
     
+    def _get_vdev_model(self,dev):
+        """return VirtualDevice of dev json object (or dev itself if already a VirtualDevice)"""
+        if isinstance(dev, VirtualDevice):
+            return dev
+        return VirtualDevice(dev, self._get_dev_btn_dump_filename)
+
     def _get_dev_all_buttons(self,dev):
-        buttons = []
-        for entry in dev['properties']['rows']:
-            entry_type = entry['type']
-            for element in entry['elements']:
-                if entry_type == 'button':
-                    buttons.append(element)
-        return buttons
+        return self._get_vdev_model(dev).buttons
         
     def _update_vdev_on_hc2(self,dev):
 
         import api_vdev
         hc2_vdev_api = api_vdev.HC2APIVirtualDevice(self.args,self.logger)
-        dev = hc2_vdev_api.put(dev['id'],dev)
+        t_dev = hc2_vdev_api.put(dev['id'],dev)
         
-        if dev:
+        if t_dev:
             self.logger.debug('hc2 virtual device (%s:%s) update completed' % (
                 dev['id'],dev['name'].encode('utf8')))
         else:
             self.logger.warning('hc2 virtual device (%s:%s) put api fail' % (
                 dev['id'],dev['name'].encode('utf8')))
-        return dev
-            
-    def update_vdevice(self,dev_id):
-        """update hc2 virtual device with local dumped files
-        and the origin virtual device json object will be backup"""
 
-        self.logger.debug('update_vdevice %s with local dump files' % dev_id)
-        # check vdev exist in hc2
-        dev = self._get_vdev_by_id(dev_id)
-        if dev is None:
-            self.logger.warning('fail to get dev json from hc2, exit')
-            return
+        if type(t_dev) is dict:
+            self.device_registry.update(t_dev)
+        return t_dev
+            
+    def _rebuild_vdev_with_dump(self,dev_id,dev):
+        """update hc2 vdev json object dev with local dumped files (ui.* properties,
+        ip, port, mainLoop, buttons msg and name), return the list of changes
+        [{'attr': ..., 'old': ..., 'new': ...}, ...] or None if no local dump exist"""
 
         # load local dev json
-        dump_path = self._get_dev_dump_path(dev_id)
+        dump_path = self._get_dev_dump_path(dev_id, create=False)
         filename = self._get_dev_json_dump_filename(dev)
         if os.path.exists(os.path.join(dump_path,filename)) == False:
             self.logger.warning('vdevice id %s dump file (%s) not exist' % (dev_id,filename))
+            return None
         with open(os.path.join(dump_path,filename)) as fh:
             t_dev = json.loads(fh.read())
+
+        changes = []
+
+        def _change(obj, key, value, attr):
+            changes.append({'attr': attr, 'old': obj.get(key), 'new': value})
+            obj[key] = value
             
         # update dev properties attr. ui.*
         for key in t_dev['properties']:
             if key.find('ui.') == 0:
                 if dev['properties'].get(key,False):
                     if dev['properties'][key] != t_dev['properties'][key]:
-                        dev['properties'][key] = t_dev['properties'][key]
+                        _change(dev['properties'], key, t_dev['properties'][key], 'properties.' + key)
                         self.logger.debug('... properties %s value %s updated' % (
                             key,t_dev['properties'][key]))
 
         # update dev properties attr. ip, and port
         for key in ['port','ip']:
             if dev['properties'][key] != t_dev['properties'][key]:
-                dev['properties'][key] = t_dev['properties'][key]
+                _change(dev['properties'], key, t_dev['properties'][key], 'properties.' + key)
                 self.logger.debug('... properties %s value %s updated' % (
                     key,t_dev['properties'][key]))
             
@@ -426,9 +732,9 @@ class HC2BaseService(object):
         file_path = os.path.join(dump_path,filename)
         if os.path.exists(file_path):
             with open(file_path) as fh:
-                mainloop = fh.read()
-                #mainloop = mainloop.replace('\n','\\n')
-                dev['properties']['mainLoop'] = mainloop
+                mainloop = fh.read().decode('utf8')
+            if mainloop != dev['properties'].get('mainLoop'):
+                _change(dev['properties'], 'mainLoop', mainloop, 'properties.mainLoop')
                 self.logger.debug('... properties mainLoop updated')
         else:
             self.logger.warning('vdevice %s mainloop dump file (%s) not exist' % (
@@ -437,27 +743,147 @@ class HC2BaseService(object):
         # update dev properties attr. rows button elements
         buttons = self._get_dev_all_buttons(dev)
         for button in buttons:
-            self.logger.debug('... select button id %s with caption [%s]' % (
-                button['id'],button['caption'].encode('utf8')))
-        
-        # update buttons msg
-        for button in buttons:
-            self._button_update_with_dump_file(button,dev_id)
-        self.logger.debug('... properties row element buttons updated')
+            old_msg = button['msg']
+            if self._button_update_with_dump_file(button,dev_id):
+                changes.append({'attr': 'button.%s.msg' % button['id'], 'old': old_msg, 'new': button['msg']})
+        self.logger.debug('... properties row element buttons checked')
         
         # update dev attr. name
         if dev['name'] != t_dev['name']:
-            dev['name'] = t_dev['name']
+            _change(dev, 'name', t_dev['name'], 'name')
             self.logger.debug('... update vdev name as %s' % (
                 dev['name'].encode('utf8')))
+
+        return changes
+
+    def diff_vdevice(self,dev_id,dev=None):
+        """return the changes update_vdevice would put on hc2 virtual device (see
+        _rebuild_vdev_with_dump), None if the vdev or its local dump not exist"""
+
+        if dev is None:
+            dev = self._get_vdev_by_id(dev_id)
+            if dev is None:
+                return None
+        return self._rebuild_vdev_with_dump(dev_id, copy.deepcopy(dev))
+
+    def update_vdevice(self,dev_id):
+        """update hc2 virtual device with local dumped files,
+        the vdev is put on hc2 only if the local files differ from it,
+        the changes are kept in last_update_diff"""
+
+        self.logger.debug('update_vdevice %s with local dump files' % dev_id)
+        self.last_update_diff = None
+        # check vdev exist in hc2
+        dev = self._get_vdev_by_id(dev_id)
+        if dev is None:
+            self.logger.warning('fail to get dev json from hc2, exit')
+            return
+
+        changes = self._rebuild_vdev_with_dump(dev_id, dev)
+        self.last_update_diff = changes
+        if changes is None:
+            return None
+        if not changes:
+            self.logger.debug('... vdev %s not changed, skip hc2 update' % dev_id)
+            return dev
         
         # update vdev on hc2 vdevice
         vdev = self._update_vdev_on_hc2(dev)      
         
-        self.logger.debug('... update_vdevice completed')
+        self.logger.debug('... update_vdevice completed with %s changes' % len(changes))
         
         return vdev
             
+    def get_dumped_devices(self, pattern=None):
+        """return [(dev_id, dev_name), ...] of local dumped devices ordered by id,
+        pattern is a glob matched with device id or name"""
+
+        return [(int(entry['id']), entry['name'])
+                for entry in self._get_dump_catalog().find('devices', pattern=pattern)]
+
+    def _update_vdevice_worker(self, dev_id, dev):
+        """update_vdevice of dev_id with the already queried hc2 vdev json object dev,
+        return the device report dict"""
+
+        start = time.time()
+        report = {'id': dev_id, 'name': dev['name'] if dev else None, 'status': 'failed',
+                  'changes': [], 'bytes': 0, 'seconds': 0, 'error': None}
+        try:
+            if dev is None:
+                report['error'] = 'virtual device not exist on hc2'
+                return report
+            changes = self._rebuild_vdev_with_dump(dev_id, dev)
+            if changes is None:
+                report['error'] = 'local dump not exist'
+                return report
+            report['changes'] = [change['attr'] for change in changes]
+            if not changes:
+                report['status'] = 'unchanged'
+                return report
+            report['bytes'] = len(json.dumps(dev))
+            if self._update_vdev_on_hc2(dev):
+                report['status'] = 'changed'
+            else:
+                report['error'] = 'hc2 put api fail'
+        except Exception as e:
+            self.logger.error('update vdevice %s fail' % dev_id, exc_info=True)
+            report['error'] = str(e)
+        finally:
+            report['seconds'] = round(time.time() - start, 3)
+        return report
+
+    def update_vdevices(self, dev_ids=None, pattern=None, concurrency=None):
+        """update hc2 virtual devices of dev_ids (or all dumped devices) with local dumped files,
+        only the ones matched with glob pattern if given, hc2 devices are queried once and
+        the vdevs are put concurrently, each vdev once,
+        return summary dict {total, changed, unchanged, failed, bytes, seconds, results},
+        results is the device report list [{id, name, status, changes, bytes, seconds, error}, ...]
+        or None if hc2 api call fail"""
+
+        start = time.time()
+        devices = self._get_devices()
+        if devices is None:
+            self.logger.warning('update_vdevices fail to query hc2 devices')
+            return None
+        vdevs = dict((device['id'], device) for device in devices if device['type'] == 'virtual_device')
+
+        if dev_ids is None:
+            # dumped devices which are not virtual on hc2 are skipped
+            others = set(device['id'] for device in devices) - set(vdevs)
+            dev_ids = [dev_id for dev_id, _ in self.get_dumped_devices(pattern) if dev_id not in others]
+        else:
+            dev_ids = [int(dev_id) for dev_id in dev_ids]
+            if pattern is not None:
+                matched = set(dev_id for dev_id, _ in self.get_dumped_devices(pattern))
+                dev_ids = [dev_id for dev_id in dev_ids if dev_id in matched]
+        # a vdev given twice is updated once
+        t_dev_ids = []
+        for dev_id in dev_ids:
+            if dev_id not in t_dev_ids:
+                t_dev_ids.append(dev_id)
+        dev_ids = t_dev_ids
+        self.logger.debug('update_vdevices %s' % dev_ids)
+
+        # puts are bounded by the in flight limit of the hc2, each worker updates its own
+        # copy of the vdev so a failed put leaves no changed state behind
+        with HC2APIAsync(HC2APIVirtualDevice(self.args, self.logger), concurrency) as hc2_async:
+            results = hc2_async.map(
+                lambda dev_id: self._update_vdevice_worker(dev_id, copy.deepcopy(vdevs.get(dev_id))),
+                dev_ids)
+
+        summary = {
+            'total': len(results),
+            'changed': len([r for r in results if r['status'] == 'changed']),
+            'unchanged': len([r for r in results if r['status'] == 'unchanged']),
+            'failed': len([r for r in results if r['status'] == 'failed']),
+            'bytes': sum([r['bytes'] for r in results]),
+            'seconds': round(time.time() - start, 3),
+            'results': results,
+        }
+        self.logger.debug('... update_vdevices completed, %s changed, %s unchanged, %s failed in %ss' % (
+            summary['changed'], summary['unchanged'], summary['failed'], summary['seconds']))
+        return summary
+
     # --- set vdev button attr lua, waitForResponse
     def set_vdevice_btns(self,dev_id,set_lua=False,set_wait=False):
         """update hc2 virtual device all buttons lua and waitForResponse attr."""
@@ -483,8 +909,9 @@ class HC2BaseService(object):
         self.logger.debug('... hc2 virtual device updated')
         
         # save new vdev from hc2
-        dump_path = self._get_dev_dump_path(dev_id, del_exist=True)
+        dump_path = self._get_dev_dump_path(dev_id)
         self._dump_device(dump_path, new_dev)
+        self._save_dump()
         
         self.logger.debug('... set_vdevice_btns completed')
         
@@ -493,22 +920,12 @@ class HC2BaseService(object):
         """create a new hc2 virtual device with local existing vdev json dumped file"""
         
         self.logger.debug('clone_vdevice with local dumped dev id %s' % local_dev_id)
-        dump_path = self._get_dev_dump_path(local_dev_id)
-        
-        # serach *.json
-        result = []
-        for root, _, files in os.walk(dump_path):
-            for name in files:
-                if fnmatch.fnmatch(name, '*.json'):
-                    result.append(os.path.join(root, name))
-        if len(result) == 1:
-            filename = result[0]
-        else:
-            self.logger.warning('there are multiple or none dev json files exist in dump path (%s)' %
-                                dump_path)
+        filename = self._get_dumped_dev_json_file(local_dev_id)
+        if filename is None:
             return None
         with open(filename) as fh:
             src_dev = json.loads(fh.read())
+        self._restore_dev_btn_msgs(src_dev)
         
         # keep dev json keys ['name','type','actions','properties'] member only
         t_dev = dict(src_dev) # keep original dev json obj
@@ -535,6 +952,43 @@ class HC2BaseService(object):
                     
         return new_dev   
     
+    def _clone_vdev_btn_refs(self,vdev,src_btn_id,dest_btn_id=None):
+        """copy the script reference of src button to dest button (all other buttons if None)
+        in {dev_id}.buttons.refs of a --dedup dump, return False if src button has no reference"""
+
+        dump_path = self._get_dev_dump_path(vdev.id)
+        file_path = os.path.join(dump_path, self._get_dev_btn_refs_filename({'id': vdev.id}))
+        with open(file_path) as fh:
+            refs = json.loads(fh.read())
+        src_ref = dict((str(ref['id']), ref) for ref in refs).get(str(src_btn_id))
+        if src_ref is None:
+            self.logger.warning('... src btn (%s) reference not exist in %s' % (src_btn_id, file_path))
+            return False
+        # script keys of put_script reference, the other keys describe the button
+        script_ref = dict((key, value) for key, value in src_ref.items()
+                          if key not in ('id', 'name', 'caption', 'lua', 'file'))
+
+        dest_btn_ids = [str(button['id']) for button in vdev.buttons] if dest_btn_id is None \
+            else [str(dest_btn_id)]
+        cloned = 0
+        for ref in refs:
+            t_btn_id = str(ref['id'])
+            if t_btn_id == str(src_btn_id) or t_btn_id not in dest_btn_ids:
+                continue
+            for key in ('template', 'params', 'blob'):
+                ref.pop(key, None)
+            ref.update(copy.deepcopy(script_ref))
+            cloned += 1
+            self.logger.debug('... cp src btn (%s) reference for btn (%s)' % (src_btn_id, t_btn_id))
+        if dest_btn_id is not None and not cloned:
+            self.logger.warning('... dest btn (%s) not exist, skip cp src btn (%s) reference' % (
+                dest_btn_id, src_btn_id))
+
+        self._get_dump_manifest().write(file_path, json.dumps(refs, indent=2))
+        self._get_dump_manifest().save()
+        self._btn_refs_cache = None
+        return True
+
     def clone_vdev_btn(self,dev_id,src_btn_id,dest_btn_id=None):
         """clone hc2 VIRTUAL device all buttons code from one of its existing button
             $ python api.py clone_vdev_btn,<dev_id>,<src_btn_id>,<dest_btn_id>
@@ -545,9 +999,10 @@ class HC2BaseService(object):
         
         # dump vdev from hc2
         dev = self.dump_device(dev_id)
+        vdev = self._get_vdev_model(dev)
         
         # get src btn dump filename
-        src_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev,src_btn_id)
+        src_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(vdev,src_btn_id)
         self.logger.debug('... src btn filename %s' % src_btn_filename)
         if src_btn_filename is None:
             self.logger.warning('can not clone vdev button code, exit')
@@ -555,33 +1010,43 @@ class HC2BaseService(object):
 
         # get src btn dump filename
         dump_path = self._get_dev_dump_path(dev_id)
+        if self._load_dev_btn_refs(dev_id):
+            # --dedup dump, the button scripts are blob store references
+            if not self._clone_vdev_btn_refs(vdev,src_btn_id,dest_btn_id):
+                self.logger.warning('can not clone vdev button code, exit')
+                return None
+            self.update_vdevice(dev_id)
+            self.logger.debug('... clone_vdev_btn completed')
+            return
         src_btn_file_path = os.path.join(dump_path,src_btn_filename)
+        if not os.path.exists(src_btn_file_path):
+            self.logger.warning('... src btn file not exist, can not clone vdev button code, exit %s' % (
+                src_btn_filename.encode('utf8')))
+            return None
         #with open(src_btn_file_path) as fh:
         #    btn_msg = fh.read().encode('utf8')
 
         # cp src btn dump file to dest btn dump file
-        buttons = self._get_dev_all_buttons(dev)
-        for button in buttons:
-            dest_btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev, button['id'])
-            dest_btn_file_path = os.path.join(dump_path,dest_btn_filename)
-            if dest_btn_id is None:
-                # update all buttons
+        if dest_btn_id is None:
+            # update all buttons
+            for button, dest_btn_filename in vdev.btn_filenames():
                 t_btn_id = button['id']
                 if str(t_btn_id) != str(src_btn_id):
-                    shutil.copyfile(src_btn_file_path, dest_btn_file_path)
+                    shutil.copyfile(src_btn_file_path, os.path.join(dump_path,dest_btn_filename))
                     self.logger.debug('... cp src btn (%s) dump file for all btn (%s) dump file' % (
                         src_btn_id,t_btn_id))
                 else:
                     self.logger.debug('... skip cp src btn (%s) dump file for all btn (%s) dump file' % (
                         src_btn_id,t_btn_id))
+        else:
+            dest_btn_filename = vdev.btn_filename(dest_btn_id)
+            if dest_btn_filename is not None:
+                shutil.copyfile(src_btn_file_path, os.path.join(dump_path,dest_btn_filename))
+                self.logger.debug('... cp src btn (%s) dump file for dest btn (%s) dump file' % (
+                    src_btn_id,dest_btn_id))
             else:
-                if str(dest_btn_id) == str(button['id']):
-                    shutil.copyfile(src_btn_file_path, dest_btn_file_path)
-                    self.logger.debug('... cp src btn (%s) dump file for dest btn (%s) dump file' % (
-                        src_btn_id,dest_btn_id))
-                else:
-                    self.logger.debug('... skip cp src btn (%s) dump file for dest btn (%s) dump file' % (
-                        src_btn_id,dest_btn_id))
+                self.logger.warning('... dest btn (%s) not exist, skip cp src btn (%s) dump file' % (
+                    dest_btn_id,src_btn_id))
         
         # update hc2 vdev for hc2
         self.update_vdevice(dev_id)
@@ -633,10 +1098,8 @@ class HC2BaseService(object):
         self.logger.debug('backup_vdev_btn_cmd_arg(dev_id=%s)' % dev_id)
         dev = self._get_vdev_by_id(dev_id)
         dump_path = self._get_dev_dump_path(dev_id)
-        buttons = self._get_dev_all_buttons(dev)
         cmd_arg_list = []
-        for button in buttons:
-            btn_filename = self._get_dev_btn_dump_filename(dev_id, button)
+        for button, btn_filename in self._get_vdev_model(dev).btn_filenames():
             btn_file_path = os.path.join(dump_path,btn_filename)
             btn_cmd_arg = self._parse_cmd_arg_text_from_file(btn_file_path)
             btn_caption = button['caption']
@@ -655,68 +1118,141 @@ class HC2BaseService(object):
         self.logger.debug('... backup_vdev_btn_cmd_arg completed')
         return cmd_arg_list
         
-    def restore_btn_cmd_arg_value(self,local_dev_id):
+    def _load_btn_cmd_arg_table(self,cmd_arg_file_path):
+        """return [(btn_id,cmd_text,arg_text), ...] of cmd_arg file, the last row of a btn_id wins"""
+        table = {}
+        order = []
+        with open(cmd_arg_file_path,'rb') as fh:
+            reader = csv.reader(fh, delimiter=',', quotechar="'")
+            for row in reader:
+                if not row:
+                    continue
+                self.logger.debug('... row (%s)' % row)
+                btn_id,_,cmd_text,arg_text = row
+                if btn_id not in table:
+                    order.append(btn_id)
+                table[btn_id] = (cmd_text,arg_text)
+        return [(btn_id,) + table[btn_id] for btn_id in order]
+
+    def _rewrite_btn_cmd_arg(self,btn_file_path,cmd_text,arg_text):
+        """rewrite cmdText and argText lines of button dump file btn_file_path in a single pass,
+        the file is replaced (temp + rename) only if any line changed,
+        return [(old line, new line), ...] of the changed lines"""
+        with open(btn_file_path,'rb') as fh:
+            content = fh.read()
+
+        changes = []
+        def _sub_line(m):
+            # a line holding both is a cmdText line, as the line by line rewrite did
+            if CMD_MATCH_STR in m.group(0):
+                new_line = "%s '%s'" % (CMD_MATCH_STR,cmd_text)
+            else:
+                new_line = "%s '%s'" % (ARG_MATCH_STR,arg_text)
+            if m.group(0) != new_line:
+                changes.append((m.group(0),new_line))
+            return new_line
+        new_content = CMD_ARG_LINE_RE.sub(_sub_line,content)
+
+        if changes:
+            tmp_path = '%s.%s.tmp' % (btn_file_path,os.getpid())
+            with open(tmp_path,'wb') as fh:
+                fh.write(new_content)
+            try:
+                os.rename(tmp_path,btn_file_path)
+            except OSError:
+                # rename can not replace an existing file on windows
+                os.remove(btn_file_path)
+                os.rename(tmp_path,btn_file_path)
+        return changes
+
+    def _restore_btn_cmd_arg_worker(self,dump_path,vdev,row):
+        """restore cmd_arg table row on its button dump file, return the button report dict"""
+        btn_id,cmd_text,arg_text = row
+        report = {'id': btn_id, 'file': None, 'status': 'failed', 'changes': [], 'error': None}
+        try:
+            btn_filename = self._get_dev_btn_dump_filename_by_btn_id(vdev,btn_id)
+            if btn_filename is None:
+                report['status'] = 'missing'
+                report['error'] = 'button not exist in vdev'
+                return report
+            report['file'] = btn_filename
+            btn_file_path = os.path.join(dump_path,btn_filename)
+            if not os.path.exists(btn_file_path):
+                self.logger.warning('... btn file not exist, skip %s' % btn_filename.encode('utf8'))
+                report['status'] = 'missing'
+                report['error'] = 'btn file not exist'
+                return report
+            changes = self._rewrite_btn_cmd_arg(btn_file_path,cmd_text,arg_text)
+            for old_line,new_line in changes:
+                self.logger.debug('... update [%s] to [%s]' % (old_line,new_line))
+            report['changes'] = changes
+            report['status'] = 'changed' if changes else 'unchanged'
+        except Exception as e:
+            self.logger.error('restore btn %s cmd arg fail' % btn_id, exc_info=True)
+            report['error'] = str(e)
+        return report
+
+    def restore_btn_cmd_arg_value(self,local_dev_id,concurrency=None):
         """
         update local vdev button dump file content for line cmdText = <value> and argText = <value>
             $ python api.py restore_btn_cmd_arg_value,<local_dev_id>
         parse file content::
             {btn_id},{btn_caption},{cmd_text},{arg_text}
             ...
+        the cmd_arg file is loaded once and each button file is rewritten once, concurrently
+        if concurrency (default: args.concurrency or 1) > 1,
+        return summary dict {total, changed, unchanged, missing, failed, seconds, results},
+        results is the button report list [{id, file, status, changes, error}, ...]
+        or None if the local dump or cmd_arg file not exist
         """
         self.logger.debug('restore_btn_cmd_arg_value(dev_id=%s)' % local_dev_id)
         dev_id = local_dev_id
+        start = time.time()
 
-        # serach *.json
-        result = []
         dump_path = self._get_dev_dump_path(dev_id)
-        for root, _, files in os.walk(dump_path):
-            for name in files:
-                if fnmatch.fnmatch(name, '*.json'):
-                    result.append(os.path.join(root, name))
-        if len(result) == 1:
-            filename = result[0]
-        else:
-            self.logger.warning('... there are multiple or none dev json files exist in dump path (%s)' %
-                                dump_path)
+        filename = self._get_dumped_dev_json_file(dev_id)
+        if filename is None:
             return None
         
         # get vdev json object from local json file
         with open(filename) as fh:
-            dev = json.loads(fh.read())
+            vdev = self._get_vdev_model(json.loads(fh.read()))
 
         # parsing cmd_arg file and update local btn dump file
         cmd_arg_filename = self._get_vdev_btn_cmd_arg_filename(dev_id)  
         cmd_arg_file_path = os.path.join(os.path.dirname(dump_path),cmd_arg_filename)
-        if os.path.exists(cmd_arg_file_path):
-            with open(cmd_arg_file_path,'rb') as fh:
-                #t_content = fh.read().encode('utf8')
-                reader = csv.reader(fh, delimiter=',', quotechar="'")
-                for row in reader:
-                    self.logger.debug('... row (%s)' % row)
-                    btn_id,_,cmd_text,arg_text = row
-                    btn_filename = self._get_dev_btn_dump_filename_by_btn_id(dev,btn_id)
-                    btn_file_path = os.path.join(dump_path,btn_filename)
-                    if os.path.exists(btn_file_path):
-                        for line in fileinput.input(btn_file_path, inplace=1):
-                            if CMD_MATCH_STR in line:
-                                new_line = "%s '%s'\n" % (CMD_MATCH_STR,cmd_text)
-                            elif ARG_MATCH_STR in line:
-                                new_line = "%s '%s'\n" % (ARG_MATCH_STR,arg_text)
-                            else:
-                                new_line = line
-
-                            if line != new_line:
-                                self.logger.debug('... update [%s] to [%s]' % (
-                                    line.replace('\n',''),new_line.replace('\n','')))
-                            sys.stdout.write(new_line)
-                    else:
-                        self.logger.warning('... btn file not exist, skip' % btn_filename)
-                        
-        else:
+        if not os.path.exists(cmd_arg_file_path):
             self.logger.warning('... no cmd_arg backup file exist, exit! %s' % cmd_arg_filename) 
             return None
-        
-        self.logger.debug('... restore_btn_cmd_arg_value completed')
+        rows = self._load_btn_cmd_arg_table(cmd_arg_file_path)
+
+        # build the button filename index before the workers share vdev
+        vdev.btn_filenames()
+        concurrency = int(concurrency or getattr(self.args, self.astr_concurrency, None) or 1)
+        if concurrency > 1 and len(rows) > 1:
+            pool = ThreadPool(min(concurrency, len(rows)))
+            try:
+                results = pool.map(lambda row: self._restore_btn_cmd_arg_worker(dump_path,vdev,row), rows)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [self._restore_btn_cmd_arg_worker(dump_path,vdev,row) for row in rows]
+
+        summary = {
+            'total': len(results),
+            'changed': len([r for r in results if r['status'] == 'changed']),
+            'unchanged': len([r for r in results if r['status'] == 'unchanged']),
+            'missing': len([r for r in results if r['status'] == 'missing']),
+            'failed': len([r for r in results if r['status'] == 'failed']),
+            'seconds': round(time.time() - start, 3),
+            'results': results,
+        }
+        self.logger.debug('... restore_btn_cmd_arg_value completed, %s changed, %s unchanged, '
+                          '%s missing, %s failed in %ss' % (
+            summary['changed'], summary['unchanged'], summary['missing'], summary['failed'],
+            summary['seconds']))
+        return summary
         
     # # -- dump_scene
     # def _get_scene_json_dump_filename(self,scene):
@@ -860,24 +1396,29 @@ class HC2BaseService(object):
             self.logger.warning('fail to get gvar (name %s) from hc2, exit' % var_name)
             return None
 
+        files = {}
+
         # dump json
-        dump_path = self._get_gvar_dump_path(var_name=var_name,del_exist=True)
+        dump_path = self._get_gvar_dump_path(var_name=var_name)
         filename = self._get_gvar_json_dump_filename(gvar)
-        with codecs.open(os.path.join(dump_path,filename), 'wb', encoding='utf8') as fh: 
-            fh.write(json.dumps(gvar,indent=2))
-        self.logger.debug('... gvar %s json dumped' % (gvar['name']))
+        files[filename] = json.dumps(gvar,indent=2)
         
         # dump gvar value
         gvar_value = gvar['value']
         gvar_value = gvar_value.encode('utf-8').replace('\\n','\n')
         filename = self._get_gvar_value_filename(gvar)
-        with codecs.open(os.path.join(dump_path,filename), 'wb', encoding='utf8') as fh: 
-            obj = self.json_str_check(gvar_value)
-            if obj:
-                fh.write(json.dumps(obj,indent=2).decode('utf8'))
-            else:
-                fh.write(gvar_value.decode('utf8'))
-        self.logger.debug('... gvar value dumped %s' % filename)
+        obj = self.json_str_check(gvar_value)
+        if obj:
+            files[filename] = json.dumps(obj,indent=2)
+        else:
+            files[filename] = gvar_value
+
+        self.last_dump_changes = self._get_dump_manifest().sync_dir(dump_path, files)
+        self._catalog_dump('variables', gvar['name'], gvar, dump_path, files,
+                           self._get_gvar_json_dump_filename(gvar))
+        self._save_dump()
+        self.logger.debug('... gvar %s dumped, %s files changed' % (
+            gvar['name'], len(self.last_dump_changes)))
             
         return gvar
     
@@ -937,37 +1478,60 @@ class HC2BaseService(object):
             self.logger.warning('read_hc2_topology fail, topology file not exist')
             return None
 
+    # hc2 collections of topology, queried with field projection: (section, api class, fields)
+    TOPOLOGY_QUERIES = [
+        ('rooms', HC2APIRoom, ['id', 'name']),
+        ('scenes', HC2APIScene, ['id', 'name', 'roomID', 'visible']),
+        ('devices', HC2APIDevice, ['id', 'name', 'roomID', 'visible', 'type']),
+        ('virtualDevices', HC2APIVirtualDevice, ['id', 'name', 'roomID', 'visible', 'type']),
+    ]
+
+    def _query_topology_items(self, query):
+        """return projected items of a TOPOLOGY_QUERIES entry, None if query fail"""
+
+        section, api_class, fields = query
+        api = api_class(self.args, self.logger)
+        items = list(api.iter_items(fields=fields))
+        if api.last_error is not None:
+            self.logger.warning('get_hc2_topology query %s fail: %s' % (section, api.last_error))
+            return None
+        return items
+
     def get_hc2_topology(self):
-        """"""
-        topology = {}
+        """return hc2 topology {rooms, scenes, devices} of the visible elements, the hc2 rooms,
+        scenes, devices and virtual devices are queried concurrently, None if any query fail"""
 
-        import api_room
-        topology['rooms'] = []
-        rooms = api_room.HC2APIRoom(self.args, self.logger).get(key=None)
-        if rooms:
-            for room in rooms:
-                topology['rooms'].append({'id': room['id'], 'name': room['name']})
-
-        import api_scene
-        topology['scenes'] = []
-        scenes = api_scene.HC2APIScene(self.args, self.logger).get(key=None)
-        if scenes:
-            for scene in scenes:
-                if scene['visible']:
-                    topology['scenes'].append({'id': scene['id'], 'name': scene['name'], 'roomID': scene['roomID']})
-                else:
-                    self.logger.debug('scene id %s NOT visible, ignored' % scene['id'])
-
-        import api_dev
-        # topology['devices'] = []
-        # devices = api_dev.HC2APIDevice(self.args, self.logger).get(key=None)
-        # for device in devices:
-        #     if device['visible']:
-        #         topology['devices'].append({'id': device['id'], 'name': device['name'], 'roomID': device['roomID']})
-        # import api_vdev
-        # devices = api_vdev.HC2APIVirtualDevice(self.args, self.logger).get(key=None)
-        # for device in devices:
-        #     topology['devices'].append({'id': device['id'], 'name': device['name'], 'roomID': device['roomID']})
+        with HC2APIAsync(HC2APIRoom(self.args, self.logger), workers=len(self.TOPOLOGY_QUERIES)) as hc2_async:
+            results = hc2_async.map(self._query_topology_items, [(query,) for query in self.TOPOLOGY_QUERIES])
+        if any(items is None for items in results):
+            return None
+        return self.build_hc2_topology(dict((query[0], items) for query, items in zip(self.TOPOLOGY_QUERIES, results)))
+
+    def build_hc2_topology(self, collections):
+        """return hc2 topology {rooms, scenes, devices} of the visible elements of
+        collections {rooms, scenes, devices[, virtualDevices]} (hc2 json object lists)"""
+
+        topology = {'rooms': [], 'scenes': [], 'devices': []}
+        for room in collections['rooms']:
+            topology['rooms'].append({'id': room['id'], 'name': room['name']})
+
+        for scene in collections['scenes']:
+            if scene.get('visible', True):
+                topology['scenes'].append({'id': scene['id'], 'name': scene['name'], 'roomID': scene['roomID']})
+            else:
+                self.logger.debug('scene id %s NOT visible, ignored' % scene['id'])
+
+        # virtual devices are listed by both the devices and virtualDevices api
+        device_ids = set()
+        for device in collections['devices'] + collections.get('virtualDevices', []):
+            if device['id'] in device_ids:
+                continue
+            device_ids.add(device['id'])
+            if device.get('visible', True):
+                topology['devices'].append({'id': device['id'], 'name': device['name'],
+                                            'roomID': device.get('roomID'), 'type': device.get('type')})
+            else:
+                self.logger.debug('device id %s NOT visible, ignored' % device['id'])
         return topology
 
     def save_hc2_topology(self, topology=None):
@@ -975,6 +1539,9 @@ class HC2BaseService(object):
         topology_file = self._get_hc2_topology_file()
         if topology is None:
             topology = self.get_hc2_topology()
+            if topology is None:
+                self.logger.warning('save_hc2_topology fail to get hc2 topology')
+                return None
         # with codecs.open(topology_file, 'wb', encoding='utf8') as fh:
         #     fh.write(json.dumps(topology, indent=2).decode('utf8'))
         with codecs.open(topology_file, 'w', encoding='utf8') as fh:
@@ -983,51 +1550,142 @@ class HC2BaseService(object):
         self.logger.debug('save_hc2_topology %s' % topology_file)
         return topology_file
 
-    def _get_element_from_topology(self, topology, element_type, element_id):
-        """"""
-        for element in topology[element_type]:
-            if element['id'] == int(element_id):
-                return element
-        self.logger.warning('_get_element_from_topology no matched for type %s id %s' % (element_type, element_id))
-        return None
+    def merge_hc2_topology(self, local_topology, current_topology):
+        """return (merged topology, delta) of hc2 current_topology merged with local_topology,
+        elements are matched by (category, id), the merged elements follow current_topology
+        and keep the local added attributes (e.g. en_text, zh_text) if the element name not changed,
+        delta is {added, removed, renamed, updated, preserved} lists of
+        {category, id, name} entries, renamed with old_name, updated with attrs and preserved
+        with the kept local attrs, neither topology is modified"""
+
+        local_elements = {}
+        for category, elements in local_topology.items():
+            for element in elements:
+                local_elements[(category, element['id'])] = element
+
+        merged = {}
+        delta = {'added': [], 'removed': [], 'renamed': [], 'updated': [], 'preserved': []}
+        for category, elements in current_topology.items():
+            merged[category] = []
+            for current_entry in elements:
+                entry = dict(current_entry)
+                merged[category].append(entry)
+                change = {'category': category, 'id': entry['id'], 'name': entry['name']}
+                local_entry = local_elements.pop((category, entry['id']), None)
+                if local_entry is None:
+                    delta['added'].append(change)
+                    continue
+                if local_entry['name'] != entry['name']:
+                    # local added attrs are of the old name
+                    change['old_name'] = local_entry['name']
+                    delta['renamed'].append(change)
+                    continue
+                preserved = sorted(attr for attr in local_entry if attr not in entry)
+                for attr in preserved:
+                    entry[attr] = local_entry[attr]
+                attrs = sorted(attr for attr in current_entry if local_entry.get(attr) != entry[attr])
+                if attrs:
+                    delta['updated'].append(dict(change, attrs=attrs))
+                if preserved:
+                    delta['preserved'].append(dict(change, attrs=preserved))
+
+        for (category, element_id), local_entry in sorted(local_elements.items()):
+            delta['removed'].append({'category': category, 'id': element_id, 'name': local_entry['name']})
+        return merged, delta
+
+    @staticmethod
+    def is_topology_changed(delta):
+        """return True if topology merge delta has any element added, removed, renamed or updated"""
+        return any(delta[key] for key in ('added', 'removed', 'renamed', 'updated'))
+
+    def update_hc2_topology_file(self, current_topology=None):
+        """merge hc2 topology (current_topology if given) into the local topology file,
+        the file is rewritten only if any element changed, the merge delta is kept as
+        last_topology_delta, return topology file path, None if fail to get hc2 topology"""
 
-    def update_hc2_topology_file(self):
-        """"""
         topology_file = self._get_hc2_topology_file()
+        self.last_topology_delta = None
+        if current_topology is None:
+            current_topology = self.get_hc2_topology()
+        if current_topology is None:
+            self.logger.warning('update_hc2_topology_file fail to get hc2 topology')
+            return None
 
-        if not os.path.exists(topology_file):
+        local_topology = None
+        if os.path.exists(topology_file):
+            try:
+                with open(topology_file) as fh:
+                    local_topology = json.loads(fh.read())
+            except ValueError:
+                self.logger.warning('local topology file %s is not json, replaced' % topology_file)
+        else:
             self.logger.debug('no local topology file exist, create new one')
-            return self.save_hc2_topology()
 
-        # update local topology newly added element attribute
-        current_topology = self.get_hc2_topology()
-        try:
-            with open(topology_file) as fh:
-                local_topology = json.loads(fh.read())
-        except ValueError:
-            local_topology = current_topology
-
-        self.logger.debug('update local topology newly added element attribute ...')
-        for key in local_topology.keys():
-            for local_entry in local_topology[key]:
-                local_entry_id = local_entry['id']
-                current_entry = self._get_element_from_topology(current_topology, key, local_entry_id)
-                if current_entry:
-                    if local_entry['name'] == current_entry['name']:
-                        for attr in local_entry.keys():
-                            # if attr. name not changed, add newly added attr.
-                            if attr not in current_entry.keys():
-                                current_entry[attr] = local_entry[attr]
-                        self.logger.debug('topology element type %s id %s name %s update with local' % (
-                            key, local_entry_id, local_entry['name']
-                        ))
-                    else:
-                        self.logger.debug('topology element type %s id %s name changed (%s -> %s)' % (
-                            key, local_entry_id, local_entry['name'], current_entry['name']
-                        ))
-                else:
-                    self.logger.debug('local topology type %s id %s removed found' % (key, local_entry_id))
-        return self.save_hc2_topology(current_topology)
+        topology, delta = self.merge_hc2_topology(local_topology or {}, current_topology)
+        self.last_topology_delta = delta
+        for key in ('added', 'removed', 'renamed', 'updated'):
+            for change in delta[key]:
+                self.logger.debug('topology element type %s id %s %s' % (change['category'], change['id'], key))
+        if local_topology is not None and not self.is_topology_changed(delta):
+            self.logger.debug('update_hc2_topology_file no change, %s not rewritten' % topology_file)
+            return topology_file
+        return self.save_hc2_topology(topology)
+
+    def get_name_index(self, topology=None):
+        """return HC2NameIndex of topology (dict or topology file path), or of the local topology
+        file (hc2 topology if no local file) if None, the index is rebuilt only when the topology
+        dict or file changed, a topology dict is taken as read only,
+        a HC2NameIndex topology is returned as it is"""
+
+        if isinstance(topology, HC2NameIndex):
+            return topology
+        if topology is None:
+            topology_file = self._get_hc2_topology_file()
+            topology = topology_file if os.path.exists(topology_file) else None
+        if type(topology) is dict:
+            # the cached index keeps a reference of the dict, so its id is not reused
+            cache_key = ('dict', id(topology))
+        elif topology is None:
+            cache_key = ('hc2',)
+        else:
+            cache_key = ('file', topology, os.path.getmtime(topology))
+
+        cached = getattr(self, '_name_index', None)
+        if cached is not None and cached[0] == cache_key:
+            return cached[2]
+
+        if topology is None:
+            self.logger.debug('get_name_index load topology by get_hc2_topology')
+            topology = self.get_hc2_topology()
+            if topology is None:
+                # not cached, hc2 is queried again next time
+                return HC2NameIndex({}, logger=self.logger)
+        elif type(topology) is not dict:
+            self.logger.debug('get_name_index load topology file {}'.format(topology))
+            with open(topology) as fh:
+                topology = json.loads(fh.read())
+        index = HC2NameIndex(topology, logger=self.logger)
+        self._name_index = (cache_key, topology, index)
+        return index
+
+    def get_hc2_matches_by_name(self, name, room_name=None, category='scenes', lang_code='en', topology=None,
+                                top_k=5, threshold=MATCH_RATIO_THRESHOLD):
+        """
+        return top_k elements [{id, name, roomID, text, score}, ...] of category matched with name,
+        in the room matched with room_name if given (see get_hc2_id_by_name)
+        """
+        index = self.get_name_index(topology)
+
+        room_id = None
+        if room_name is not None:
+            rooms = index.search(room_name, 'rooms', lang_code, top_k=1, threshold=threshold)
+            if not rooms:
+                self.logger.info('no matched room found for {} {} category {} lang_code {} found'.format(
+                    name, room_name, category, lang_code))
+                return []
+            room_id = rooms[0]['id']
+
+        return index.search(name, category, lang_code, room_id=room_id, top_k=top_k, threshold=threshold)
 
     def get_hc2_id_by_name(self, name, room_name=None, category='scenes', lang_code='en', topology=None):
         """
@@ -1035,93 +1693,23 @@ class HC2BaseService(object):
         category in ['devices', 'scenes']
         lang_code in ['en', 'zh']
         """
-        sequence_matcher_ratio_thread = 0.85
-
-        self.logger.info('search element name [{}] with room {} category {} lang_code {} with thread {} ...'.format(
-            name, room_name, category, lang_code, sequence_matcher_ratio_thread
+        # names of a voice command are not ascii only, e.g. zh_text names
+        if isinstance(name, bytes):
+            name = name.decode('utf8')
+        if isinstance(room_name, bytes):
+            room_name = room_name.decode('utf8')
+        self.logger.info(u'search element name [{}] with room {} category {} lang_code {} with thread {} ...'.format(
+            name, room_name, category, lang_code, MATCH_RATIO_THRESHOLD
         ))
 
-        self.logger.debug('topology type: %s' % type(topology))
-        if type(topology) is not dict:
-            if topology is None:
-                self.logger.debug('get_hc2_id_by_name load topology by get_hc2_topology')
-                topology = self.get_hc2_topology()
-
-            if type(topology) in [str, unicode]:
-                self.logger.debug('get_hc2_id_by_name load topology file {}'.format(topology))
-                with open(topology) as fh:
-                    topology = json.loads(fh.read())
-
-        lang_attr = '%s_text' % lang_code
-
-        from difflib import SequenceMatcher
-
-        matched_room = None
-        if room_name is None:
-            self.logger.debug('no room name for matching')
-        else:
-            self.logger.debug('room name {} for matching'.format(matched_room))
-            rooms = topology.get('rooms', [])
-            matched_elements = []
-            for room in rooms:
-                match_name = room.get(lang_attr, None)
-                if match_name is None:
-                    match_name = room.get('name', '')
-                s = SequenceMatcher(None, room_name.lower(), match_name.lower())
-                room['match_ratio'] = s.ratio()
-                if room['match_ratio'] > 0.5:
-                    self.logger.debug('{name} and {match_name} match ratio {ratio}'.format(
-                        name=name, match_name=match_name, ratio=room['match_ratio']
-                    ))
-                if room['match_ratio'] >= sequence_matcher_ratio_thread:
-                    matched_elements.append(room)
-                    self.logger.info('room {} ({}) seems to match with {} ratio {}'.format(
-                        match_name, room['id'], room_name, room['matched_ratio']
-                    ))
-            if len(matched_elements) == 0:
-                self.logger.info('no matched room found for {} {} category {} lang_code {} found'.format(
-                    name, room_name, category, lang_code
-                ))
-                return None
-            else:
-                ratio_list = [x['match_ratio'] for x in matched_elements]
-                max_ratio = max(ratio_list)
-                matched_room = matched_elements[ratio_list.index(max_ratio)]
-
-        elements = []
-        if matched_room is None:
-            elements = topology.get(category, [])
-        else:
-            for element in topology.get(category, []):
-                if element['roomID'] == matched_room['id']:
-                    elements.append(element)
-
-        matched_elements = []
-        for element in elements:
-            match_name = element.get(lang_attr, None)
-            if match_name is None:
-                match_name = element.get('name', '')
-            s = SequenceMatcher(None, name.lower(), match_name.lower())
-            element['match_ratio'] = s.ratio()
-            self.logger.debug('[{}] and [{}] match ratio {}'.format(name.encode('utf8'), match_name.encode('utf8'), element['match_ratio']))
-
-            if element['match_ratio'] >= sequence_matcher_ratio_thread:
-                matched_elements.append(element)
-                self.logger.info('element [{}] ({}) seems to match with [{}] ratio {}'.format(
-                    match_name, element['id'], name, element['match_ratio']))
-
-        if len(matched_elements) == 0:
-            self.logger.info('no matched element found for {} room {} category {} lang_code {} found'.format(
+        matches = self.get_hc2_matches_by_name(name, room_name, category, lang_code, topology, top_k=1)
+        if not matches:
+            self.logger.info(u'no matched element found for {} room {} category {} lang_code {} found'.format(
                 name, room_name, category, lang_code))
             return None
-        else:
-            ratio_list = [x['match_ratio'] for x in matched_elements]
-            max_ratio = max(ratio_list)
-            matched = matched_elements[ratio_list.index(max_ratio)]
-            #matched_name = matched['name']
-            self.logger.info('found hc2 matched element {name} with id {matched_id}'.format(
-                name='<matched_name>', matched_id=matched['id']))
-            return matched['id']
+        self.logger.info('found hc2 matched element {name} with id {matched_id}'.format(
+            name='<matched_name>', matched_id=matches[0]['id']))
+        return matches[0]['id']
 
     def test(self):
         topology = '/Users/lee_shiueh/flh/projects/common/src/python/fibaro/.dump/192.168.1.18/topology.json'
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+HC2BlobStore is a content-addressed store of virtual device button
+scripts under .dump/<hostname>/blobs, each blob is zlib compressed and
+named by the sha1 of its content::
+
+    blobs/3f/3f786850e387550fdab836ed7e6dc881de23001b
+
+The buttons of a daikin / saporo unit vdev run the same lua code and only
+differ in the lines::
+
+    local cmdText = 'on'
+    local argText = ''
+
+so a script is stored as a template (the script with empty cmdText and
+argText values) plus the two values as parameters, and all the units of
+a site share one template blob.
+
+Usage::
+
+    store = HC2BlobStore(os.path.join(dump_root, 'blobs'))
+    ref = store.put_script(button_msg)   # {'template': sha1, 'params': {...}} or {'blob': sha1}
+    button_msg = store.get_script(ref)
+
+"""
+
+import os
+import re
+import zlib
+import hashlib
+import logging
+
+# script lines whose value is kept as template parameter
+SCRIPT_PARAM_NAMES = ('cmdText', 'argText')
+_PARAM_RE = re.compile(r'^(?P<head>[ \t]*local[ \t]+(?P<name>%s)[ \t]*=[ \t]*)(?P<value>.*)$' %
+                       '|'.join(SCRIPT_PARAM_NAMES), re.MULTILINE)
+
+
+def split_script(script):
+    """return (template, params) of script, params is {} if script has no parameter line"""
+
+    params = {}
+
+    def _strip_value(m):
+        name = m.group('name')
+        if name in params:
+            # only the first line of a parameter is a template parameter
+            return m.group(0)
+        params[name] = m.group('value')
+        return m.group('head')
+
+    template = _PARAM_RE.sub(_strip_value, script)
+    return template, params
+
+
+def render_script(template, params):
+    """return script of template with params values, the reverse of split_script"""
+
+    rendered = set()
+
+    def _set_value(m):
+        name = m.group('name')
+        if name in rendered or name not in params:
+            return m.group(0)
+        rendered.add(name)
+        return m.group('head') + params[name]
+
+    return _PARAM_RE.sub(_set_value, template)
+
+
+class HC2BlobStore(object):
+
+    def __init__(self, store_root, logger=None):
+        self.store_root = store_root
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _blob_path(self, sha1):
+        return os.path.join(self.store_root, sha1[:2], sha1)
+
+    def __contains__(self, sha1):
+        return os.path.exists(self._blob_path(sha1))
+
+    def put(self, content):
+        """store content (unicode or utf8 str), return its sha1"""
+
+        if not isinstance(content, bytes):
+            content = content.encode('utf8')
+        sha1 = hashlib.sha1(content).hexdigest()
+        blob_path = self._blob_path(sha1)
+        if os.path.exists(blob_path):
+            return sha1
+
+        blob_dir = os.path.dirname(blob_path)
+        if not os.path.exists(blob_dir):
+            try:
+                os.makedirs(blob_dir)
+            except OSError:
+                # created by another dump worker
+                if not os.path.isdir(blob_dir):
+                    raise
+        # write under a unique temp name, concurrent writers of the same blob write the same bytes
+        tmp_path = '%s.%s.%s.tmp' % (blob_path, os.getpid(), id(content))
+        with open(tmp_path, 'wb') as fh:
+            fh.write(zlib.compress(content))
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)
+        else:
+            os.rename(tmp_path, blob_path)
+        self.logger.debug('blob %s stored' % sha1)
+        return sha1
+
+    def get(self, sha1):
+        """return utf8 str content of blob sha1"""
+
+        with open(self._blob_path(sha1), 'rb') as fh:
+            return zlib.decompress(fh.read())
+
+    def put_script(self, script):
+        """store button script, return its reference dict
+        {'template': sha1, 'params': {...}} or {'blob': sha1}"""
+
+        if not isinstance(script, bytes):
+            script = script.encode('utf8')
+        template, params = split_script(script)
+        if params and render_script(template, params) == script:
+            return {'template': self.put(template), 'params': params}
+        return {'blob': self.put(script)}
+
+    def get_script(self, ref):
+        """return utf8 str button script of reference dict ref"""
+
+        if 'template' in ref:
+            params = dict((name, value.encode('utf8') if not isinstance(value, bytes) else value)
+                          for name, value in ref['params'].items())
+            return render_script(self.get(ref['template']), params)
+        return self.get(ref['blob'])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+HC2DeviceRegistry keeps hc2 devices indexed by id, name, roomID and type,
+so a device lookup is a dict access instead of a scan over the whole
+/api/devices collection.
+
+The indexes hold DeviceSummary records only, a full device json object
+is queried with /api/devices/<id> when it is asked for.
+"""
+
+import logging
+import threading
+
+
+class HC2DeviceRegistry(object):
+
+    def __init__(self, dev_api, logger=None):
+        """dev_api is the HC2APIDevice used to query devices"""
+        self.dev_api = dev_api
+        self.logger = logger or logging.getLogger(__name__)
+        self.loaded = False
+        self.by_id = {}
+        self.by_name = {}
+        self.by_room = {}
+        self.by_type = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, dev_id):
+        return str(dev_id) in self.by_id
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def values(self):
+        """return DeviceSummary list ordered by device id"""
+        with self._lock:
+            return sorted(self.by_id.values(), key=lambda summary: summary.id)
+
+    @staticmethod
+    def _add_index(index, key, dev_id):
+        index.setdefault(key, set()).add(dev_id)
+
+    @staticmethod
+    def _remove_index(index, key, dev_id):
+        dev_ids = index.get(key)
+        if dev_ids is not None:
+            dev_ids.discard(dev_id)
+            if not dev_ids:
+                index.pop(key)
+
+    def _discard(self, dev_id):
+        summary = self.by_id.pop(dev_id, None)
+        if summary is None:
+            return
+        self._remove_index(self.by_name, summary.name, dev_id)
+        self._remove_index(self.by_room, summary.roomID, dev_id)
+        self._remove_index(self.by_type, summary.type, dev_id)
+
+    def _update(self, device):
+        summary = self.dev_api.summary_cls.from_json(device) if type(device) is dict else device
+        dev_id = str(summary.id)
+        self._discard(dev_id)
+        self.by_id[dev_id] = summary
+        self._add_index(self.by_name, summary.name, dev_id)
+        self._add_index(self.by_room, summary.roomID, dev_id)
+        self._add_index(self.by_type, summary.type, dev_id)
+
+    def load(self, devices=None):
+        """rebuild all indexes with devices, or with hc2 /api/devices if devices is None,
+        return the device list or None if hc2 api call fail"""
+
+        if devices is None:
+            devices = self.dev_api.get(key=None)
+            if devices is None:
+                self.logger.warning('hc2 device api for all devices call fail')
+                return None
+
+        with self._lock:
+            self.by_id.clear()
+            self.by_name.clear()
+            self.by_room.clear()
+            self.by_type.clear()
+            for device in devices:
+                self._update(device)
+            self.loaded = True
+        self.logger.debug('%s loaded %s devices' % (self.__class__.__name__, len(devices)))
+        return devices
+
+    def load_summaries(self):
+        """rebuild all indexes with streamed /api/devices summary records only"""
+
+        summaries = self.dev_api.summaries()
+        if self.dev_api.last_error is not None:
+            self.logger.warning('hc2 device api for all devices call fail')
+            return None
+        return self.load(summaries)
+
+    def update(self, device):
+        """add or replace device (json object or DeviceSummary) in all indexes"""
+        with self._lock:
+            self._update(device)
+
+    def discard(self, dev_id):
+        """remove device from all indexes"""
+        with self._lock:
+            self._discard(str(dev_id))
+
+    def get(self, dev_id):
+        """return hc2 device json object queried with /api/devices/<dev_id>"""
+
+        dev_id = str(dev_id)
+        if self.loaded and dev_id not in self.by_id:
+            self.logger.debug('device id %s not indexed, query hc2' % dev_id)
+        device = self.dev_api.get(key=dev_id)
+        if device:
+            self.update(device)
+        else:
+            self.discard(dev_id)
+            self.logger.warning('hc2 device id %s not exist' % dev_id)
+        return device
+
+    def get_summary(self, dev_id):
+        with self._lock:
+            return self.by_id.get(str(dev_id))
+
+    def _find(self, index, key):
+        with self._lock:
+            return sorted([self.by_id[dev_id] for dev_id in index.get(key, ())],
+                          key=lambda summary: summary.id)
+
+    def find_by_name(self, name):
+        return self._find(self.by_name, name)
+
+    def find_by_room(self, room_id):
+        return self._find(self.by_room, int(room_id))
+
+    def find_by_type(self, dev_type):
+        return self._find(self.by_type, dev_type)
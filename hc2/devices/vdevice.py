@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+VirtualDevice is a hc2 virtual device json object parsed once, with its
+rows and elements indexed by id and its buttons indexed by id and
+caption, so the button utilities look a button up with a dict access
+instead of scanning all the rows for every button.
+
+The indexed buttons are the element dicts of the device json object,
+a change made on a button is a change of the device itself.
+
+Usage::
+
+    vdev = VirtualDevice(dev, self._get_dev_btn_dump_filename)
+    button = vdev.button(btn_id)
+    filename = vdev.btn_filename(btn_id)
+    for button in vdev.buttons:
+        ...
+
+"""
+
+
+class VirtualDevice(object):
+
+    def __init__(self, dev, btn_filename_func=None):
+        """btn_filename_func(dev_id, button) returns the dump filename of a button"""
+        self.dev = dev
+        self.btn_filename_func = btn_filename_func
+        self.rows = dev.get('properties', {}).get('rows', [])
+        self.buttons = []
+        self.buttons_by_id = {}
+        self.buttons_by_caption = {}
+        self.elements_by_id = {}
+        self.row_by_element_id = {}
+        self._btn_filenames = {}
+
+        for row in self.rows:
+            for element in row.get('elements', []):
+                elem_id = str(element['id'])
+                self.elements_by_id[elem_id] = element
+                self.row_by_element_id[elem_id] = row
+                if row['type'] == 'button':
+                    self.buttons.append(element)
+                    self.buttons_by_id[elem_id] = element
+                    self.buttons_by_caption.setdefault(element.get('caption'), []).append(element)
+
+    def __len__(self):
+        return len(self.buttons)
+
+    def __iter__(self):
+        return iter(self.buttons)
+
+    def __contains__(self, btn_id):
+        return str(btn_id) in self.buttons_by_id
+
+    @property
+    def id(self):
+        return self.dev['id']
+
+    @property
+    def name(self):
+        return self.dev['name']
+
+    def button(self, btn_id):
+        """return button element of btn_id, None if not exist"""
+        return self.buttons_by_id.get(str(btn_id))
+
+    def find_by_caption(self, caption):
+        """return button elements with caption"""
+        return self.buttons_by_caption.get(caption, [])
+
+    def btn_filename(self, button):
+        """return dump filename of button (element dict or button id), None if not exist"""
+
+        if not isinstance(button, dict):
+            button = self.button(button)
+            if button is None:
+                return None
+        btn_id = str(button['id'])
+        filename = self._btn_filenames.get(btn_id)
+        if filename is None:
+            filename = self.btn_filename_func(self.id, button)
+            self._btn_filenames[btn_id] = filename
+        return filename
+
+    def btn_filenames(self):
+        """return [(button, dump filename), ...] in rows order"""
+        return [(button, self.btn_filename(button)) for button in self.buttons]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+HC2DumpCatalog is a sqlite database (.dump/<hostname>/catalog.db)
+recording every entity dumped under .dump/<hostname>, so that finding
+the dump files of an entity, listing the dumped entities or asking which
+entities changed since a time is an indexed query instead of a walk over
+the dump folders.
+
+A catalog entry is::
+
+    {
+        "category": "devices",            # devices | scenes | variables
+        "id": "10",                       # entity id (variable name)
+        "name": "DAIKIN_UNIT_10",
+        "type": "virtual_device",
+        "room_id": 3,
+        "dump_path": "<abs path>/devices/10",
+        "json_file": "<abs path>/devices/10/10.DAIKIN_UNIT_10.json",
+        "files": ["10.DAIKIN_UNIT_10.json", "10.main.DAIKIN_UNIT_10.lua", ...],
+        "sha1": "...",                    # hash of all the dump files content
+        "pulled": 1510000000.0,           # last time the entity was dumped
+        "changed": 1510000000.0           # last time its dump content changed
+    }
+
+Usage::
+
+    catalog = HC2DumpCatalog(dump_root)
+    catalog.record('devices', device['id'], dump_path, files, json_filename,
+                   name=device['name'], type=device['type'], room_id=device['roomID'])
+    catalog.save()
+    entry = catalog.get('devices', 10)
+    entries = catalog.find('devices', type='virtual_device')
+    entries = catalog.changed_since(time.time() - 3600)
+
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from dump_manifest import _unicode_path
+
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS entities (
+        category TEXT NOT NULL,
+        id TEXT NOT NULL,
+        name TEXT,
+        type TEXT,
+        room_id INTEGER,
+        dump_path TEXT NOT NULL,
+        json_file TEXT,
+        files TEXT NOT NULL,
+        sha1 TEXT NOT NULL,
+        pulled REAL NOT NULL,
+        changed REAL NOT NULL,
+        PRIMARY KEY (category, id))''',
+    'CREATE INDEX IF NOT EXISTS entities_name ON entities (category, name)',
+    'CREATE INDEX IF NOT EXISTS entities_type ON entities (category, type)',
+    'CREATE INDEX IF NOT EXISTS entities_room ON entities (category, room_id)',
+    'CREATE INDEX IF NOT EXISTS entities_changed ON entities (changed)',
+]
+
+_COLUMNS = ('category', 'id', 'name', 'type', 'room_id', 'dump_path', 'json_file',
+            'files', 'sha1', 'pulled', 'changed')
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf8')
+    return value
+
+
+def _key(key):
+    """return entity id (or variable name) as catalog text key"""
+    if isinstance(key, bytes):
+        return key.decode('utf8')
+    return u'%s' % key
+
+
+class HC2DumpCatalog(object):
+
+    filename = 'catalog.db'
+
+    def __init__(self, dump_root, logger=None):
+        self.dump_root = _unicode_path(dump_root)
+        self.logger = logger or logging.getLogger(__name__)
+        self.file_path = os.path.join(self.dump_root, self.filename)
+        self.created = not os.path.exists(self.file_path)
+        self._lock = threading.Lock()
+        # one connection shared by the dump worker threads, guarded by _lock
+        self._conn = sqlite3.connect(self.file_path, check_same_thread=False)
+        with self._lock:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entities').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def save(self):
+        """commit the recorded entries"""
+        with self._lock:
+            self._conn.commit()
+        return self.file_path
+
+    @staticmethod
+    def hash_files(files):
+        """return sha1 of dump files {filename: content}"""
+        sha1 = hashlib.sha1()
+        for filename in sorted(files):
+            content = files[filename]
+            if not isinstance(content, bytes):
+                content = content.encode('utf8')
+            sha1.update(_text(filename).encode('utf8') + b'\0')
+            sha1.update(hashlib.sha1(content).digest())
+        return sha1.hexdigest()
+
+    def _rel_path(self, path):
+        return os.path.relpath(_unicode_path(path), self.dump_root).replace(os.sep, '/')
+
+    def _abs_path(self, rel_path):
+        return os.path.join(self.dump_root, *rel_path.split('/'))
+
+    def record(self, category, key, dump_path, files, json_filename=None,
+               name=None, type=None, room_id=None, pulled=None):
+        """record entity key of category dumped as files ({filename: content}) in dump_path,
+        return True if its dump content is new or changed"""
+
+        key = _key(key)
+        sha1 = self.hash_files(files)
+        pulled = pulled or time.time()
+        rel_path = self._rel_path(dump_path)
+        json_file = rel_path + '/' + _text(json_filename) if json_filename else None
+        with self._lock:
+            row = self._conn.execute('SELECT sha1, changed FROM entities WHERE category = ? AND id = ?',
+                                     (category, key)).fetchone()
+            changed = pulled if row is None or row[0] != sha1 else row[1]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entities (%s) VALUES (%s)' % (
+                    ', '.join(_COLUMNS), ', '.join('?' * len(_COLUMNS))),
+                (category, key, _text(name), _text(type), room_id, rel_path, json_file,
+                 json.dumps(sorted(_text(filename) for filename in files)), sha1, pulled, changed))
+        return changed == pulled
+
+    def remove(self, category, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM entities WHERE category = ? AND id = ?',
+                               (category, _key(key)))
+
+    def _entry(self, row):
+        entry = dict(zip(_COLUMNS, row))
+        entry['files'] = json.loads(entry['files'])
+        entry['dump_path'] = self._abs_path(entry['dump_path'])
+        if entry['json_file']:
+            entry['json_file'] = self._abs_path(entry['json_file'])
+        return entry
+
+    def _select(self, where='', params=()):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT %s FROM entities %s ORDER BY category, CAST(id AS INTEGER), id' % (
+                    ', '.join(_COLUMNS), where), params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get(self, category, key):
+        """return catalog entry of category entity key, None if not dumped"""
+        entries = self._select('WHERE category = ? AND id = ?', (category, _key(key)))
+        return entries[0] if entries else None
+
+    def find(self, category=None, name=None, type=None, room_id=None, pattern=None):
+        """return catalog entries matched with all the given conditions ordered by id,
+        pattern is a glob matched with entity id or name"""
+
+        conditions, params = [], []
+        for column, value in (('category', category), ('name', name), ('type', type),
+                              ('room_id', room_id)):
+            if value is not None:
+                conditions.append('%s = ?' % column)
+                params.append(_text(value))
+        if pattern is not None:
+            conditions.append('(id GLOB ? OR name GLOB ?)')
+            params += [_text(pattern)] * 2
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return self._select(where, params)
+
+    def changed_since(self, timestamp, category=None):
+        """return catalog entries whose dump content changed after timestamp"""
+        if category is None:
+            return self._select('WHERE changed > ?', (timestamp,))
+        return self._select('WHERE category = ? AND changed > ?', (category, timestamp))
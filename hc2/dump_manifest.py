@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+HC2DumpManifest keeps the content hash of every file dumped under
+.dump/<hostname> in .dump/<hostname>/manifest.json, so that a pull only
+writes the files whose content changed instead of re-creating the whole
+dump folder.
+
+A manifest entry is::
+
+    "devices/10/10.daikin.json": {"sha1": "...", "size": 1234, "mtime": 1510000000.0}
+
+size and mtime tell if the local file was modified since it was dumped,
+in which case the file is hashed again before it is skipped.
+
+Usage::
+
+    manifest = HC2DumpManifest(dump_root)
+    changes = manifest.sync_dir(dump_path, {filename: content, ...})
+    manifest.save()
+
+changes is a dict of {relative file path: 'added' | 'modified' | 'removed'}.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+
+ADDED = 'added'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+
+
+def _unicode_path(path):
+    """return path as text, so os.listdir returns the same type as the unicode dump filenames"""
+    if isinstance(path, bytes):
+        return path.decode(sys.getfilesystemencoding() or 'utf8')
+    return path
+
+
+class HC2DumpManifest(object):
+
+    filename = 'manifest.json'
+
+    def __init__(self, dump_root, logger=None):
+        self.dump_root = _unicode_path(dump_root)
+        self.logger = logger or logging.getLogger(__name__)
+        self.file_path = os.path.join(self.dump_root, self.filename)
+        self.entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.file_path):
+            try:
+                with open(self.file_path) as fh:
+                    self.entries = json.loads(fh.read())
+            except ValueError:
+                self.logger.warning('dump manifest %s corrupted, all files will be rewritten' %
+                                    self.file_path)
+                self.entries = {}
+        return self
+
+    def save(self):
+        """write manifest file if any entry changed"""
+
+        with self._lock:
+            if not self._dirty:
+                return self.file_path
+            content = json.dumps(self.entries, indent=2, sort_keys=True)
+            self._dirty = False
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            fh.write(content)
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+        os.rename(tmp_path, self.file_path)
+        self.logger.debug('dump manifest %s saved' % self.file_path)
+        return self.file_path
+
+    def _rel_path(self, file_path):
+        return os.path.relpath(file_path, self.dump_root).replace(os.sep, '/')
+
+    @staticmethod
+    def _hash_file(file_path):
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(64 * 1024), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def _file_hash(self, file_path, entry):
+        """return sha1 of the local file, the manifest one if size and mtime not changed"""
+
+        stat = os.stat(file_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['sha1']
+        return self._hash_file(file_path)
+
+    def write(self, file_path, content):
+        """write content (unicode or utf8 str) to file_path if it differs from the local file,
+        return ADDED, MODIFIED or None if unchanged"""
+
+        if not isinstance(content, bytes):
+            content = content.encode('utf8')
+        sha1 = hashlib.sha1(content).hexdigest()
+        rel_path = self._rel_path(file_path)
+        with self._lock:
+            entry = self.entries.get(rel_path)
+
+        exist = os.path.exists(file_path)
+        if exist and self._file_hash(file_path, entry) == sha1:
+            change = None
+            if entry is None or entry['sha1'] != sha1:
+                # local file already has the content, just track it
+                stat = os.stat(file_path)
+                self._set_entry(rel_path, sha1, stat)
+        else:
+            with open(file_path, 'wb') as fh:
+                fh.write(content)
+            self._set_entry(rel_path, sha1, os.stat(file_path))
+            change = MODIFIED if exist else ADDED
+        return change
+
+    def _set_entry(self, rel_path, sha1, stat):
+        with self._lock:
+            self.entries[rel_path] = {'sha1': sha1, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            self._dirty = True
+
+    def remove(self, file_path):
+        """delete file_path and its manifest entry"""
+
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        with self._lock:
+            if self.entries.pop(self._rel_path(file_path), None) is not None:
+                self._dirty = True
+
+    def sync_dir(self, dump_path, files):
+        """make dump_path hold exactly files ({filename: content}),
+        return {relative file path: ADDED | MODIFIED | REMOVED} of the changed files"""
+
+        dump_path = _unicode_path(dump_path)
+        if not os.path.exists(dump_path):
+            os.makedirs(dump_path)
+
+        changes = {}
+        for filename, content in files.items():
+            file_path = os.path.join(dump_path, filename)
+            change = self.write(file_path, content)
+            if change:
+                changes[self._rel_path(file_path)] = change
+
+        for filename in os.listdir(dump_path):
+            file_path = os.path.join(dump_path, filename)
+            if filename not in files and os.path.isfile(file_path):
+                self.remove(file_path)
+                changes[self._rel_path(file_path)] = REMOVED
+
+        for rel_path, change in sorted(changes.items()):
+            self.logger.debug('... dump file %s %s' % (rel_path, change))
+        return changes
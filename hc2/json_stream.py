@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Incremental decoding of a top level json array, so that a large hc2
+collection response (e.g. /api/devices) can be handled one element at a
+time while it is being downloaded.
+"""
+
+import re
+import json
+import codecs
+
+# structural characters outside and inside of a json string
+_STRUCT_RE = re.compile(r'["\[\]{},]')
+_STRING_RE = re.compile(r'["\\]')
+
+
+def project(obj, fields=None):
+    """return obj with fields keys only, or obj itself if fields is None"""
+
+    if fields is None or type(obj) is not dict:
+        return obj
+    return dict((field, obj[field]) for field in fields if field in obj)
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """yield each decoded element of the top level json array read from chunks (byte strings),
+    raise ValueError if the content is not a json array"""
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    buf = u''
+    pos = 0  # scan position in buf
+    start = None  # buf position where current array element starts
+    depth = 0
+    in_string = False
+
+    def _chunks():
+        for chunk in chunks:
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    for text in _chunks():
+        # drop consumed content and keep only the pending element
+        cut = pos if start is None else start
+        buf = buf[cut:] + text
+        pos -= cut
+        if start is not None:
+            start -= cut
+
+        while True:
+            if in_string:
+                m = _STRING_RE.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                if m.group() == '\\':
+                    if m.end() >= len(buf):
+                        # escaped char is in next chunk
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                in_string = False
+                pos = m.end()
+                continue
+
+            m = _STRUCT_RE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            c = m.group()
+            pos = m.end()
+            if c == '"':
+                in_string = True
+            elif c in '[{':
+                if depth == 0 and c != '[':
+                    raise ValueError('json content is not an array')
+                depth += 1
+                if depth == 1:
+                    start = pos
+            elif c in ']}':
+                depth -= 1
+                if depth == 0:
+                    element = buf[start:m.start()]
+                    if element.strip():
+                        yield json.loads(element)
+                    return
+            elif c == ',' and depth == 1:
+                yield json.loads(buf[start:m.start()])
+                start = pos
+
+    raise ValueError('json array content incomplete')
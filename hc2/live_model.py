@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+"""
+HC2LiveModel is an in-memory model of a hc2 (devices, scenes, global
+variables and rooms) seeded once from the hc2 collections and kept
+current from the hc2 /api/refreshStates change feed, so a reader looks
+the model up instead of querying the whole collections again.
+
+Every change applied to the model is passed to the subscribed callbacks
+as a change dict::
+
+    {
+        "category": "devices",    # devices | scenes | globalVariables | rooms, None if seeded
+        "id": 10,                 # element id (variable name)
+        "kind": "updated",        # added | updated | removed | seeded
+        "property": "value",      # changed device property, scene runningInstances or variable
+                                  # value, None if the whole element is added, replaced or removed
+        "old": "0",
+        "new": "1",
+        "element": {...}          # element json object of the model, None if removed
+    }
+
+Along with a change, the hc2 response cache entries of the element are
+dropped and the device registry is updated. The topology (and its name
+index) is rebuilt from the model only after an element is added,
+removed, renamed, moved or its visibility changed.
+
+Usage::
+
+    model = HC2LiveModel(args, poll_interval=1.0)
+    model.subscribe(callback, categories=['devices'])
+    with model:                       # seed, then poll refreshStates in a thread
+        device = model.devices[10]
+        index = model.get_name_index()
+
+"""
+
+import time
+import logging
+import threading
+
+from api_dev import HC2APIDevice
+from api_scene import HC2APIScene
+from api_gvar import HC2APIGlobalVariable
+from api_room import HC2APIRoom
+from api_refresh import HC2APIRefreshStates
+from api_async import HC2APIAsync
+from base_service import HC2BaseService
+from devices.registry import HC2DeviceRegistry
+
+# model categories: (category, api class, element key attribute)
+LIVE_CATEGORIES = [
+    ('devices', HC2APIDevice, 'id'),
+    ('scenes', HC2APIScene, 'id'),
+    ('globalVariables', HC2APIGlobalVariable, 'name'),
+    ('rooms', HC2APIRoom, 'id'),
+]
+# element attributes in topology, a change of them rebuilds the topology
+TOPOLOGY_ATTRS = ('name', 'roomID', 'visible', 'type')
+# hc2 events whose element is queried again: event type: category
+_QUERY_EVENTS = {
+    'DeviceCreatedEvent': 'devices',
+    'DeviceModifiedEvent': 'devices',
+    'DeviceChangedRoomEvent': 'devices',
+    'SceneCreatedEvent': 'scenes',
+    'SceneModifiedEvent': 'scenes',
+    'RoomCreatedEvent': 'rooms',
+    'RoomModifiedEvent': 'rooms',
+    'GlobalVariableAddedEvent': 'globalVariables',
+}
+_REMOVE_EVENTS = {
+    'DeviceRemovedEvent': 'devices',
+    'SceneRemovedEvent': 'scenes',
+    'RoomRemovedEvent': 'rooms',
+    'GlobalVariableRemovedEvent': 'globalVariables',
+}
+# refreshStates device change keys which are not device properties
+_CHANGE_SKIP_KEYS = ('id', 'log', 'logTemp')
+# max seconds between poll retries while hc2 is not reachable
+RETRY_INTERVAL_MAX = 30
+
+
+class HC2LiveModel(object):
+
+    def __init__(self, args, logger=None, poll_interval=1.0):
+        """poll_interval is the min seconds between refreshStates requests"""
+        self.args = args
+        self.logger = logger or logging.getLogger(__name__)
+        self.poll_interval = poll_interval
+        self.apis = dict((category, api_class(args, self.logger)) for category, api_class, _ in LIVE_CATEGORIES)
+        self.refresh_api = HC2APIRefreshStates(args, self.logger)
+        self.service = HC2BaseService(args, self.logger)
+        self.registry = HC2DeviceRegistry(self.apis['devices'], self.logger)
+        self.elements = dict((category, {}) for category, _, _ in LIVE_CATEGORIES)
+        self.last = None  # refreshStates cursor
+        self.seeded = None
+        self.updated = None
+        self._topology = None
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def devices(self):
+        return self.elements['devices']
+
+    @property
+    def scenes(self):
+        return self.elements['scenes']
+
+    @property
+    def gvars(self):
+        return self.elements['globalVariables']
+
+    @property
+    def rooms(self):
+        return self.elements['rooms']
+
+    @staticmethod
+    def _key(category, key):
+        return key if category == 'globalVariables' else int(key)
+
+    def get(self, category, key):
+        """return element json object of category key in the model, None if not exist"""
+        return self.elements[category].get(self._key(category, key))
+
+    # -- subscription
+    def subscribe(self, callback, categories=None):
+        """call callback(change) for every change of categories (all if None) applied to the model,
+        and with a seeded change every time the model is seeded"""
+        self._subscribers.append((callback, categories))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [entry for entry in self._subscribers if entry[0] != callback]
+
+    def _notify(self, changes):
+        for callback, categories in list(self._subscribers):
+            for change in changes:
+                if categories is not None and change['category'] is not None and \
+                        change['category'] not in categories:
+                    continue
+                try:
+                    callback(change)
+                except Exception:
+                    self.logger.error('live model subscriber %s fail' % callback, exc_info=True)
+
+    @staticmethod
+    def _change(category, key, kind, element, prop=None, old=None, new=None):
+        return {'category': category, 'id': key, 'kind': kind, 'property': prop,
+                'old': old, 'new': new, 'element': element}
+
+    # -- seed
+    def _query_elements(self, entry):
+        category, api_class, key_attr = entry
+        api = self.apis[category]
+        # the model starts from hc2 content, not a cached response
+        api._invalidate_cache()
+        items = api.get(key=None)
+        if items is None:
+            self.logger.warning('live model query hc2 %s fail' % category)
+        return items
+
+    def seed(self):
+        """query the hc2 collections into the model, return True if seeded"""
+
+        # the cursor is taken first, changes made while querying are applied again by the next poll
+        state = self.refresh_api.poll()
+        if state is None:
+            self.logger.warning('live model query hc2 refreshStates fail')
+            return False
+        with HC2APIAsync(self.refresh_api, workers=len(LIVE_CATEGORIES)) as hc2_async:
+            results = hc2_async.map(self._query_elements, [(entry,) for entry in LIVE_CATEGORIES])
+        if any(items is None for items in results):
+            return False
+
+        with self._lock:
+            for (category, _, key_attr), items in zip(LIVE_CATEGORIES, results):
+                self.elements[category] = dict((self._key(category, item[key_attr]), item) for item in items)
+            self.registry.load(list(self.devices.values()))
+            self.last = state['last']
+            self._topology = None
+            self.seeded = self.updated = time.time()
+        self.logger.debug('live model seeded, refreshStates last %s, %s' % (
+            self.last, ', '.join('%s %s' % (category, len(self.elements[category]))
+                                 for category, _, _ in LIVE_CATEGORIES)))
+        self._notify([self._change(None, None, 'seeded', None)])
+        return True
+
+    # -- refreshStates
+    def _parse_state(self, state):
+        """return model operations [(operation, category, key, args), ...] of refreshStates state"""
+
+        operations = []
+        for change in state.get('changes') or []:
+            for name, value in change.items():
+                if name not in _CHANGE_SKIP_KEYS:
+                    operations.append(('property', 'devices', change['id'], (name, value)))
+        for event in state.get('events') or []:
+            event_type, data = event.get('type'), event.get('data') or {}
+            if event_type == 'DevicePropertyUpdatedEvent':
+                operations.append(('property', 'devices', data['id'], (data['property'], data['newValue'])))
+            elif event_type == 'GlobalVariableChangedEvent':
+                operations.append(('property', 'globalVariables', data['variableName'], ('value', data['newValue'])))
+            elif event_type == 'SceneRunningInstancesEvent':
+                operations.append(('property', 'scenes', data['id'], ('runningInstances', data['runningInstances'])))
+            elif event_type in _QUERY_EVENTS:
+                category = _QUERY_EVENTS[event_type]
+                operations.append(('query', category, data['variableName' if category == 'globalVariables' else 'id'], None))
+            elif event_type in _REMOVE_EVENTS:
+                category = _REMOVE_EVENTS[event_type]
+                operations.append(('remove', category, data['variableName' if category == 'globalVariables' else 'id'], None))
+            else:
+                self.logger.debug('live model ignore hc2 event %s' % event_type)
+        return [(operation, category, self._key(category, key), args)
+                for operation, category, key, args in operations]
+
+    def _query_element(self, category, key):
+        api = self.apis[category]
+        api._invalidate_cache(key)
+        element = api.get(key=key)
+        if element is None:
+            self.logger.warning('live model query hc2 %s %s fail' % (category, key))
+        return element
+
+    def _set_property(self, category, key, name, value):
+        """return change of element property name set as value, None if not changed"""
+
+        element = self.elements[category].get(key)
+        if element is None:
+            self.logger.debug('live model %s %s not exist, %s change ignored' % (category, key, name))
+            return None
+        properties = element.setdefault('properties', {}) if category == 'devices' else element
+        old = properties.get(name)
+        if old == value:
+            return None
+        properties[name] = value
+        return self._change(category, key, 'updated', element, name, old, value)
+
+    def _set_element(self, category, key, element):
+        """return change of element replaced (None to remove), None if not changed"""
+
+        old = self.elements[category].get(key)
+        if element is None:
+            if old is None:
+                return None
+            self.elements[category].pop(key)
+            return self._change(category, key, 'removed', None, old=old)
+        self.elements[category][key] = element
+        return self._change(category, key, 'added' if old is None else 'updated', element, old=old, new=element)
+
+    def poll_once(self):
+        """apply the refreshStates changes after the model cursor,
+        return the applied change list, None if any api call fail (nothing applied)"""
+
+        state = self.refresh_api.poll(self.last)
+        if state is None:
+            return None
+        if self.last is not None and state['last'] < self.last:
+            self.logger.warning('live model hc2 refreshStates cursor reset (%s -> %s), seed again' % (
+                self.last, state['last']))
+            return [] if self.seed() else None
+
+        operations = self._parse_state(state)
+        # removed or changed elements are queried before the model is locked
+        queried = {}
+        for operation, category, key, _ in operations:
+            if operation == 'query' and (category, key) not in queried:
+                element = self._query_element(category, key)
+                if element is None:
+                    # keep the cursor, the changes are polled again
+                    return None
+                queried[(category, key)] = element
+
+        changes = []
+        with self._lock:
+            for operation, category, key, args in operations:
+                if operation == 'property':
+                    change = self._set_property(category, key, *args)
+                elif operation == 'query':
+                    change = self._set_element(category, key, queried[(category, key)])
+                else:
+                    change = self._set_element(category, key, None)
+                if change is None:
+                    continue
+                changes.append(change)
+                if category == 'devices':
+                    if change['element'] is None:
+                        self.registry.discard(key)
+                    else:
+                        self.registry.update(change['element'])
+                if self._is_topology_change(change):
+                    self._topology = None
+            self.last = state['last']
+            if changes:
+                self.updated = time.time()
+
+        for change in changes:
+            if change['property'] is not None or (change['category'], change['id']) not in queried:
+                self.apis[change['category']]._invalidate_cache(change['id'])
+        self._notify(changes)
+        return changes
+
+    @staticmethod
+    def _is_topology_change(change):
+        if change['category'] not in ('devices', 'scenes', 'rooms'):
+            return False
+        if change['property'] is not None:
+            return change['property'] in TOPOLOGY_ATTRS and change['category'] != 'devices'
+        if change['kind'] != 'updated':
+            return True
+        return any(change['old'].get(attr) != change['new'].get(attr) for attr in TOPOLOGY_ATTRS)
+
+    # -- topology
+    def _sorted_elements(self, category):
+        return [element for _, element in sorted(self.elements[category].items())]
+
+    def get_topology(self):
+        """return hc2 topology {rooms, scenes, devices} of the model, the same dict is returned
+        until the model topology changed"""
+
+        with self._lock:
+            if self._topology is None:
+                self._topology = self.service.build_hc2_topology({
+                    'rooms': self._sorted_elements('rooms'),
+                    'scenes': self._sorted_elements('scenes'),
+                    'devices': self._sorted_elements('devices'),
+                })
+            return self._topology
+
+    def get_name_index(self):
+        """return HC2NameIndex of the model topology, rebuilt only if the topology changed"""
+        return self.service.get_name_index(self.get_topology())
+
+    # -- polling thread
+    def _run(self):
+        failures = 0
+        while not self._stopped.is_set():
+            started = time.time()
+            if self.seeded is None or failures:
+                # changes may be missed while hc2 is not reachable
+                succeeded = self.seed()
+            else:
+                succeeded = self.poll_once() is not None
+            if not succeeded:
+                failures += 1
+                self._stopped.wait(min(self.poll_interval * 2 ** failures, RETRY_INTERVAL_MAX))
+                continue
+            failures = 0
+            self._stopped.wait(max(0, self.poll_interval - (time.time() - started)))
+
+    def start(self):
+        """seed the model and keep it current in a polling thread"""
+
+        if self.seeded is None:
+            self.seed()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """stop the polling thread, a refreshStates request in progress is left to the daemon thread"""
+        self._stopped.set()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def status(self):
+        status = dict((category, len(elements)) for category, elements in self.elements.items())
+        status.update({'last': self.last, 'seeded': self.seeded, 'updated': self.updated})
+        return status
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+HC2NameIndex is a fuzzy name index of the elements (rooms, scenes,
+devices, ...) of a hc2 topology, built once and queried many times by
+voice or text name lookups.
+
+Every element is indexed with its name and its <lang_code>_text names
+(e.g. en_text, zh_text) by character trigrams. A query collects the
+elements sharing trigrams with the query name as candidates, ranks them
+by trigram overlap and re-ranks the best candidates with the
+difflib.SequenceMatcher ratio, which is the returned score.
+
+The topology is read only, the index keeps its own records of the
+elements and never adds attributes to the topology dicts.
+
+Usage::
+
+    index = HC2NameIndex(topology)
+    matches = index.search(u'reading mode', category='scenes', lang_code='en', top_k=3)
+    # [{'id': 12, 'name': u'Reading Mode', 'roomID': 3, 'text': u'reading mode', 'score': 1.0}, ...]
+
+"""
+
+import heapq
+import logging
+from difflib import SequenceMatcher
+
+# SequenceMatcher ratio a name should reach to be taken as the named element
+MATCH_RATIO_THRESHOLD = 0.85
+
+
+def _normalize(text):
+    if isinstance(text, bytes):
+        text = text.decode('utf8')
+    return u' '.join((text or u'').lower().split())
+
+
+class HC2NameIndex(object):
+
+    gram_size = 3
+    # candidates re-ranked with SequenceMatcher for each query
+    max_candidates = 32
+    # postings visited for candidate retrieval of each query
+    max_postings = 2048
+
+    def __init__(self, topology, categories=None, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.categories = categories or [key for key, value in topology.items() if isinstance(value, list)]
+        self.lang_codes = set()
+        for category in self.categories:
+            for element in topology.get(category, []):
+                for attr in element:
+                    if attr.endswith('_text'):
+                        self.lang_codes.add(attr[:-len('_text')])
+
+        self._records = {}
+        self._texts = {}
+        self._gram_counts = {}
+        self._postings = {}
+        for category in self.categories:
+            records = [{'id': element.get('id'), 'name': element.get('name'), 'roomID': element.get('roomID')}
+                       for element in topology.get(category, [])]
+            self._records[category] = records
+            for lang_code in [None] + sorted(self.lang_codes):
+                texts = []
+                for element in topology.get(category, []):
+                    text = element.get('%s_text' % lang_code) if lang_code else None
+                    texts.append(_normalize(text or element.get('name')))
+                self._index_texts((category, lang_code), texts)
+
+    def __len__(self):
+        return sum(len(records) for records in self._records.values())
+
+    @classmethod
+    def _grams(cls, text):
+        """return the set of character n-grams of text, padded so short names have n-grams"""
+        padded = u' ' * (cls.gram_size - 1) + text + u' '
+        return set(padded[i:i + cls.gram_size] for i in range(len(padded) - cls.gram_size + 1))
+
+    def _index_texts(self, key, texts):
+        postings = {}
+        gram_counts = []
+        for position, text in enumerate(texts):
+            grams = self._grams(text)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._texts[key] = texts
+        self._gram_counts[key] = gram_counts
+        self._postings[key] = postings
+
+    def search(self, name, category='scenes', lang_code='en', room_id=None, top_k=5, threshold=0.0):
+        """return the top_k elements of category best matched with name,
+        [{id, name, roomID, text, score}, ...] ordered by score (SequenceMatcher ratio),
+        only elements of room_id if given and with score >= threshold"""
+
+        if category not in self._records:
+            return []
+        key = (category, lang_code if lang_code in self.lang_codes else None)
+        texts = self._texts[key]
+        records = self._records[category]
+        query = _normalize(name)
+        query_grams = self._grams(query)
+
+        # candidate retrieval: elements sharing n-grams with the query, the rarest n-grams first
+        # and the common ones only while the visited postings are within max_postings
+        shared = {}
+        postings = self._postings[key]
+        visited = 0
+        for gram_postings in sorted((postings.get(gram, ()) for gram in query_grams), key=len):
+            if visited and visited + len(gram_postings) > self.max_postings:
+                break
+            visited += len(gram_postings)
+            for position in gram_postings:
+                shared[position] = shared.get(position, 0) + 1
+        if room_id is not None:
+            shared = dict((position, count) for position, count in shared.items()
+                          if records[position]['roomID'] == room_id)
+
+        # rank by n-gram dice coefficient, re-rank the best ones with SequenceMatcher
+        gram_counts = self._gram_counts[key]
+        query_size = len(query_grams)
+        candidates = heapq.nlargest(max(self.max_candidates, top_k), (
+            (float(count) / (query_size + gram_counts[position]), -position)
+            for position, count in shared.items()))
+        matches = []
+        for _, position in candidates:
+            # skip a candidate whose ratio upper bound can not reach the top_k scores
+            bound = max(threshold, -matches[top_k - 1][0] if len(matches) >= top_k else 0.0)
+            matcher = SequenceMatcher(None, query, texts[-position])
+            if bound and (matcher.real_quick_ratio() < bound or matcher.quick_ratio() < bound):
+                continue
+            score = matcher.ratio()
+            if score >= threshold:
+                matches.append((-score, -position))
+                matches.sort()
+
+        result = []
+        for score, position in matches[:top_k]:
+            match = dict(records[position])
+            match['text'] = texts[position]
+            match['score'] = round(-score, 4)
+            result.append(match)
+        self.logger.debug((u'search [%s] in %s with lang_code %s: %s' % (
+            query, category, lang_code,
+            u', '.join(u'%s %s' % (match['id'], match['score']) for match in result))).encode('utf8'))
+        return result
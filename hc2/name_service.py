@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""
+HC2NameServer is a resident HTTP service resolving hc2 element names
+(e.g. the scene name of a voice command) into hc2 ids, with the topology
+and HC2NameIndex of each served hc2 kept in memory.
+
+Each hc2 is served by a HC2NameResolver under a key (the remote name).
+The name index is rebuilt in a watcher thread when the local
+topology.json of the hc2 changes, or pulled from hc2 again every
+refresh interval, and swapped in at once, requests are answered with the
+previous index until the new one is ready.
+
+A live resolver keeps a HC2LiveModel of its hc2 current from the hc2
+refreshStates change feed instead, the model topology is merged into
+topology.json when an element is added, removed, renamed or moved.
+
+Endpoints (GET query parameters, or a POST json body)::
+
+    /resolve?name=<name>&lang=<en|zh>&key=<remote>[&category=scenes][&room=<room name>][&top_k=5]
+    /start?name=<name>&lang=<en|zh>&key=<remote>   resolve the scene name and start the scene
+    /vb/i/s/?s=<name>&c=<lang>&k=<remote>          resolve with the parameters of voice clients
+    /reload?key=<remote>[&refresh=1]               reload the topology (pulled from hc2 if refresh)
+    /status
+
+key can be left out if only one hc2 is served.
+
+Usage::
+
+    server = HC2NameServer({'home': HC2NameResolver(args, refresh_interval=3600)}, port=8000)
+    server.serve_forever()
+
+    server = HC2NameServer({'home': HC2NameResolver(args, live=True)}, port=8000)
+
+"""
+
+import os
+import sys
+import json
+import socket
+import time
+import logging
+import threading
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+from scene_service import HC2SceneService
+from name_index import HC2NameIndex, MATCH_RATIO_THRESHOLD
+from live_model import HC2LiveModel
+
+# request parameter aliases, the voice client (s, c, k) and the scene_name, lang_code json body
+_PARAM_ALIASES = {
+    's': 'name', 'scene_name': 'name',
+    'c': 'lang', 'lang_code': 'lang',
+    'k': 'key',
+}
+
+
+class HC2NameResolver(object):
+
+    def __init__(self, args, logger=None, refresh_interval=None, live=False):
+        """refresh_interval is the seconds to pull hc2 topology again, never if None,
+        the topology is kept current by a HC2LiveModel if live"""
+        self.logger = logger or logging.getLogger(__name__)
+        self.service = HC2SceneService(args, self.logger)
+        self.refresh_interval = refresh_interval
+        self.live_model = HC2LiveModel(args, self.logger) if live else None
+        self.state = None
+        self._reload_lock = threading.Lock()
+        self._live_topology = None
+
+    def start(self):
+        if self.live_model is not None:
+            self.live_model.start()
+
+    def stop(self):
+        if self.live_model is not None:
+            self.live_model.stop()
+
+    def _get_live_topology(self):
+        """return live model topology, None if not live or the model is not seeded"""
+        if self.live_model is None or self.live_model.seeded is None:
+            return None
+        return self.live_model.get_topology()
+
+    def _topology_file_mtime(self):
+        topology_file = self.service._get_hc2_topology_file()
+        return os.path.getmtime(topology_file) if os.path.exists(topology_file) else None
+
+    def reload(self, refresh=False):
+        """build the name index of the local topology file, pull hc2 topology into the file first
+        if refresh or no file, the new state {index, topology_file, mtime, loaded, refreshed} is
+        swapped in when ready and returned"""
+
+        with self._reload_lock:
+            state = self.state or {}
+            refreshed = state.get('refreshed')
+            if refresh or self._topology_file_mtime() is None:
+                live_topology = self._get_live_topology()
+                self.service.update_hc2_topology_file(live_topology)
+                self._live_topology = live_topology
+                refreshed = time.time()
+            topology_file = self.service._get_hc2_topology_file()
+            mtime = self._topology_file_mtime()
+            with open(topology_file) as fh:
+                topology = json.loads(fh.read())
+            self.state = {
+                'index': HC2NameIndex(topology, logger=self.logger),
+                'topology_file': topology_file,
+                'mtime': mtime,
+                'loaded': time.time(),
+                'refreshed': refreshed or mtime,
+            }
+            self.logger.info('hc2 %s name index loaded with %s elements' % (
+                self.service.hostname, len(self.state['index'])))
+            return self.state
+
+    def check(self):
+        """reload if the refresh interval elapsed or the topology file changed,
+        the current index is kept if reload fail"""
+
+        state = self.state
+        try:
+            if state is None:
+                self.reload()
+            elif self._get_live_topology() is not self._live_topology:
+                # the live model topology changed
+                self.reload(refresh=True)
+            elif self.refresh_interval and time.time() - state['refreshed'] >= self.refresh_interval:
+                self.reload(refresh=True)
+            elif self._topology_file_mtime() != state['mtime']:
+                self.reload()
+        except Exception:
+            self.logger.error('hc2 %s topology reload fail' % self.service.hostname, exc_info=True)
+
+    def resolve(self, name, category='scenes', lang_code='en', room_name=None, top_k=5,
+                threshold=MATCH_RATIO_THRESHOLD):
+        """return matches [{id, name, roomID, text, score}, ...] of name (see get_hc2_matches_by_name)"""
+        state = self.state or self.reload()
+        return self.service.get_hc2_matches_by_name(name, room_name, category, lang_code,
+                                                    topology=state['index'], top_k=top_k,
+                                                    threshold=threshold)
+
+    def start_scene(self, scene_id):
+        return self.service.start_scene(scene_id)
+
+    def status(self):
+        state = self.state or {}
+        return {
+            'hostname': self.service.hostname,
+            'elements': len(state['index']) if state else 0,
+            'topology_file': state.get('topology_file'),
+            'loaded': state.get('loaded'),
+            'refreshed': state.get('refreshed'),
+            'live': self.live_model.status() if self.live_model is not None else None,
+        }
+
+
+class _HC2NameHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        self.server.name_server.logger.debug('name server ' + fmt % args)
+
+    def _handle(self, method):
+        url = urlparse.urlparse(self.path)
+        params = dict((name, value.decode('utf8')) for name, value in urlparse.parse_qsl(url.query))
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                try:
+                    body = json.loads(self.rfile.read(length))
+                except ValueError:
+                    body = None
+                if isinstance(body, dict):
+                    params.update(body)
+        status, content = self.server.name_server.handle(url.path, params)
+        data = json.dumps(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], socket.error):
+            # client closed its keep-alive connection
+            self.name_server.logger.debug('name server connection %s:%s closed' % client_address)
+        else:
+            self.name_server.logger.error('name server request from %s:%s fail' % client_address, exc_info=True)
+
+
+class HC2NameServer(object):
+
+    def __init__(self, resolvers, host='0.0.0.0', port=8000, poll_interval=2.0, logger=None):
+        """resolvers is {key: HC2NameResolver}, the topology files are checked every poll_interval"""
+        self.resolvers = resolvers
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._httpd = None
+        self._threads = []
+        self._stopped = threading.Event()
+
+    # -- server life cycle
+    def start(self):
+        for resolver in self.resolvers.values():
+            resolver.start()
+            resolver.check()
+        self._httpd = _ThreadingHTTPServer((self.host, self.port), _HC2NameHandler)
+        self._httpd.name_server = self
+        self.port = self._httpd.server_address[1]
+        self._stopped.clear()
+        self._threads = [threading.Thread(target=self._httpd.serve_forever),
+                         threading.Thread(target=self._watch)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        self.logger.info('name server listen on %s:%s for %s' % (
+            self.host, self.port, ', '.join(sorted(self.resolvers))))
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        for resolver in self.resolvers.values():
+            resolver.stop()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stopped.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            for resolver in self.resolvers.values():
+                resolver.check()
+
+    # -- request handling
+    def _get_resolver(self, params):
+        key = params.get('key')
+        if key is None and len(self.resolvers) == 1:
+            return list(self.resolvers.values())[0]
+        return self.resolvers.get(key)
+
+    def handle(self, path, params):
+        """return (http status, json content) of request path with params,
+        500 with the error if the request fail"""
+
+        try:
+            return self._handle_request(path, params)
+        except Exception as e:
+            self.logger.error('name server request %s fail' % path, exc_info=True)
+            return 500, {'error': str(e)}
+
+    def _handle_request(self, path, params):
+        params = dict((_PARAM_ALIASES.get(name, name), value) for name, value in params.items())
+        path = path.rstrip('/') or '/'
+        if path == '/status':
+            return 200, dict((key, resolver.status()) for key, resolver in self.resolvers.items())
+        if path not in ('/resolve', '/start', '/vb/i/s', '/reload'):
+            return 404, {'error': 'unknown path %s' % path}
+
+        resolver = self._get_resolver(params)
+        if resolver is None:
+            return 400, {'error': 'unknown hc2 key %s' % params.get('key')}
+        if path == '/reload':
+            try:
+                resolver.reload(refresh=params.get('refresh') in ('1', 'true', True, 1))
+            except Exception as e:
+                self.logger.error('hc2 %s topology reload fail' % resolver.service.hostname, exc_info=True)
+                return 500, {'error': str(e)}
+            return 200, resolver.status()
+
+        name = params.get('name')
+        if not name:
+            return 400, {'error': 'no name to resolve'}
+        category = params.get('category', 'scenes')
+        try:
+            matches = resolver.resolve(name, category, params.get('lang', 'en'), params.get('room'),
+                                       top_k=int(params.get('top_k', 5)),
+                                       threshold=float(params.get('threshold', MATCH_RATIO_THRESHOLD)))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        content = {
+            'name': name,
+            'category': category,
+            'id': matches[0]['id'] if matches else None,
+            'matches': matches,
+        }
+        if not matches:
+            return 404, content
+
+        if path == '/start':
+            if category != 'scenes':
+                return 400, {'error': 'only scenes can be started'}
+            content['started'] = bool(resolver.start_scene(content['id']))
+            if not content['started']:
+                return 502, content
+        return 200, content
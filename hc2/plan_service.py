@@ -0,0 +1,209 @@
+import os
+import sys
+import copy
+import json
+import difflib
+
+from .scene_service import HC2SceneService
+from .api_scene import HC2APIScene
+from .api_gvar import HC2APIGlobalVariable
+from .api_async import HC2APIAsync
+
+PLAN_CATEGORIES = ['devices', 'scenes', 'globalVariables']
+
+
+class HC2PlanService(HC2SceneService):
+    """dry run of update_vdevice, update_scene and push_gvar for every local dumped
+    entity, each hc2 collection is queried once (and the scenes whose lua code it does
+    not list) and nothing is written, not even a dump folder or the dump catalog"""
+
+    def __init__(self, args=None, logger=None):
+        super(HC2PlanService, self).__init__(args, logger)
+
+    @staticmethod
+    def _plan_change(attr, old, new):
+        """return plan change entry, text with multiple lines as unified diff lines"""
+
+        change = {'attr': attr}
+        if any(isinstance(value, (str, type(u''))) and '\n' in value for value in (old, new)):
+            change['diff'] = list(difflib.unified_diff(
+                (old or u'').splitlines(), (new or u'').splitlines(),
+                'hc2/' + attr, 'local/' + attr, lineterm=''))
+        else:
+            change['old'] = old
+            change['new'] = new
+        return change
+
+    @staticmethod
+    def _read_text(file_path):
+        with open(file_path) as fh:
+            return fh.read().decode('utf8')
+
+    def _list_dumped(self, category):
+        """return [(id, name), ...] of category entities in the dump catalog, listed from
+        the dump folders if no catalog exists yet, neither of them is created"""
+
+        catalog = self._get_dump_catalog(create=False)
+        if catalog is not None:
+            return [(entry['id'], entry['name']) for entry in catalog.find(category)]
+
+        category_path = os.path.join(self._get_dump_root_path(), category)
+        if isinstance(category_path, bytes):
+            category_path = category_path.decode(sys.getfilesystemencoding() or 'utf8')
+        if not os.path.isdir(category_path):
+            return []
+        dumped = []
+        for key in os.listdir(category_path):
+            dump_path = os.path.join(category_path, key)
+            if not os.path.isdir(dump_path):
+                continue
+            for filename in os.listdir(dump_path):
+                # {id}.{name}.json of devices and scenes, {name}.json of variables
+                if filename == key + '.json':
+                    dumped.append((key, key))
+                    break
+                if filename.startswith(key + '.') and filename.endswith('.json'):
+                    dumped.append((key, filename[len(key) + 1:-len('.json')]))
+                    break
+        return sorted(dumped, key=lambda item: (not item[0].isdigit(), item[0].zfill(12)))
+
+    def _list_dumped_ids(self, category):
+        """return ids (variable names) of category entities dumped in this hc2 dump root"""
+        return [key for key, name in self._list_dumped(category)]
+
+    # -- devices
+    def plan_devices(self, devices=None):
+        """return plan entries of local dumped virtual devices"""
+
+        if devices is None:
+            devices = self._get_devices()
+            if devices is None:
+                self.logger.warning('plan fail to query hc2 devices')
+                return None
+        devices = dict((device['id'], device) for device in devices)
+
+        plan = []
+        for dev_id, dev_name in self._list_dumped('devices'):
+            dev_id = int(dev_id)
+            device = devices.get(dev_id)
+            if device is None:
+                plan.append({'id': dev_id, 'name': dev_name, 'action': 'missing', 'changes': []})
+                continue
+            if device['type'] != 'virtual_device':
+                # only virtual devices are updated with local dump files
+                continue
+            changes = self._rebuild_vdev_with_dump(dev_id, copy.deepcopy(device))
+            if changes is None:
+                plan.append({'id': dev_id, 'name': device['name'], 'action': 'no_dump', 'changes': []})
+            elif changes:
+                plan.append({'id': dev_id, 'name': device['name'], 'action': 'update',
+                             'changes': [self._plan_change(c['attr'], c['old'], c['new']) for c in changes]})
+        return plan
+
+    # -- scenes
+    def plan_scenes(self, scenes=None):
+        """return plan entries of local dumped scenes"""
+
+        hc2_scene_api = HC2APIScene(self.args, self.logger)
+        if scenes is None:
+            scenes = hc2_scene_api.get(key=None)
+            if scenes is None:
+                self.logger.warning('plan fail to query hc2 scenes')
+                return None
+        scenes = dict((str(scene['id']), scene) for scene in scenes)
+        dump_root = self._get_dump_root_path()
+
+        # scene lua code is not listed by every hc2 firmware, only the scenes with a local
+        # lua file (the ones update_scene puts lua of) are queried, concurrently
+        queries = []
+        for scene_id in self._list_dumped_ids('scenes'):
+            scene = scenes.get(scene_id)
+            if scene is not None and 'lua' not in scene and os.path.exists(os.path.join(
+                    dump_root, 'scenes', scene_id, self._get_scene_lua_code_filename(scene))):
+                queries.append(scene_id)
+        if queries:
+            with HC2APIAsync(hc2_scene_api) as hc2_async:
+                for scene_id, scene in zip(queries, hc2_async.get_many(queries)):
+                    if scene is None:
+                        self.logger.warning('plan fail to query hc2 scene %s' % scene_id)
+                        return None
+                    scenes[scene_id] = scene
+
+        plan = []
+        for scene_id in self._list_dumped_ids('scenes'):
+            scene = scenes.get(scene_id)
+            if scene is None:
+                plan.append({'id': int(scene_id), 'name': None, 'action': 'missing', 'changes': []})
+                continue
+
+            dump_path = os.path.join(dump_root, 'scenes', scene_id)
+            json_file = os.path.join(dump_path, self._get_scene_json_dump_filename(scene))
+            if not os.path.exists(json_file):
+                plan.append({'id': scene['id'], 'name': scene['name'], 'action': 'no_dump', 'changes': []})
+                continue
+            with open(json_file) as fh:
+                t_scene = json.loads(fh.read())
+
+            changes = []
+            lua_file = os.path.join(dump_path, self._get_scene_lua_code_filename(scene))
+            if os.path.exists(lua_file):
+                lua_code = self._read_text(lua_file)
+                if lua_code != scene.get('lua'):
+                    changes.append(self._plan_change('lua', scene.get('lua'), lua_code))
+            if scene['name'] != t_scene['name']:
+                changes.append(self._plan_change('name', scene['name'], t_scene['name']))
+            if changes:
+                plan.append({'id': scene['id'], 'name': scene['name'], 'action': 'update', 'changes': changes})
+        return plan
+
+    # -- global variables
+    def plan_gvars(self, gvars=None):
+        """return plan entries of local dumped global variables"""
+
+        if gvars is None:
+            gvars = HC2APIGlobalVariable(self.args, self.logger).get(key=None)
+            if gvars is None:
+                self.logger.warning('plan fail to query hc2 global variables')
+                return None
+        gvars = dict((gvar['name'], gvar) for gvar in gvars)
+
+        plan = []
+        for var_name in self._list_dumped_ids('variables'):
+            gvar = gvars.get(var_name)
+            if gvar is None:
+                plan.append({'id': var_name, 'name': var_name, 'action': 'missing', 'changes': []})
+                continue
+            dump_path = os.path.join(self._get_dump_root_path(), 'variables', var_name)
+            if not os.path.exists(os.path.join(dump_path, self._get_gvar_json_dump_filename(gvar))):
+                plan.append({'id': var_name, 'name': var_name, 'action': 'no_dump', 'changes': []})
+                continue
+            value_file = os.path.join(dump_path, self._get_gvar_value_filename(gvar))
+            if not os.path.exists(value_file):
+                # push_gvar puts the hc2 value back as is
+                continue
+            # push_gvar puts the value file content as is, even a pretty printed
+            # json value of pull_gvar is a change of the hc2 value string
+            value = self._read_text(value_file)
+            if value == gvar['value']:
+                continue
+            plan.append({'id': var_name, 'name': var_name, 'action': 'update',
+                         'changes': [self._plan_change('value', gvar['value'], value)]})
+        return plan
+
+    def plan(self, categories=None):
+        """return {category: [plan entry, ...]} of pending changes of local dump files,
+        plan entry is {id, name, action (update | missing | no_dump), changes}"""
+
+        categories = categories or PLAN_CATEGORIES
+        self.logger.debug('plan %s' % categories)
+        result = {}
+        for category in categories:
+            func = {'devices': self.plan_devices,
+                    'scenes': self.plan_scenes,
+                    'globalVariables': self.plan_gvars}[category]
+            result[category] = func()
+        return result
+
+
+if __name__ == '__main__':
+    HC2PlanService.main()
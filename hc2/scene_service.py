@@ -1,7 +1,6 @@
 
 import os
 import shutil
-import codecs
 import json
 
 from .base_service import HC2BaseService
@@ -40,21 +39,27 @@ class HC2SceneService(HC2BaseService):
         save hc2 scene json file ({scene_id}.{scene_name}.json)
         and lua code:
             {scene_id}.{scene_name}.lua
+        only changed files are written, return {file path: change} dict
         """
 
+        files = {}
+
         # dump json
         filename = self._get_scene_json_dump_filename(scene)
-        with codecs.open(os.path.join(dump_path, filename), 'wb', encoding='utf8') as fh:
-            fh.write(json.dumps(scene, indent=2))
-        self.logger.debug('... scene %s (%s) json dumped' % (scene['id'], scene['name']))
+        files[filename] = json.dumps(scene, indent=2)
 
         # dump scene lua code
         lua_code = scene['lua']
         lua_code = lua_code.encode('utf-8').replace('\\n', '\n')
         filename = self._get_scene_lua_code_filename(scene)
-        with codecs.open(os.path.join(dump_path, filename), 'wb', encoding='utf8') as fh:
-            fh.write(lua_code.decode('utf8'))
-        self.logger.debug('... scene lua code dumped %s' % filename)
+        files[filename] = lua_code
+
+        changes = self._get_dump_manifest().sync_dir(dump_path, files)
+        self._catalog_dump('scenes', scene['id'], scene, dump_path, files,
+                           self._get_scene_json_dump_filename(scene))
+        self.logger.debug('... scene %s (%s) dumped, %s files changed' % (
+            scene['id'], scene['name'].encode('utf8'), len(changes)))
+        return changes
 
     def dump_scene(self, scene_id):
         """get hc2 scene json object via HTTP API and save as local files"""
@@ -64,8 +69,9 @@ class HC2SceneService(HC2BaseService):
         hc2_scene_api = HC2APIScene(self.args, self.logger)
         scene = hc2_scene_api.get(key=scene_id)
         if scene:
-            dump_path = self._get_scene_dump_path(scene_id, True)
-            self._dump_scene(dump_path, scene)
+            dump_path = self._get_scene_dump_path(scene_id)
+            self.last_dump_changes = self._dump_scene(dump_path, scene)
+            self._save_dump()
             self.logger.debug('... dump_scene [%s] completed' % scene['name'])
             self.logger.debug('... dump path %s' % dump_path)
         else:
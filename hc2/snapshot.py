@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+HC2Snapshot is a single compressed file (zip) holding every entity of a
+hc2 controller, one deflated json member per entity::
+
+    index.json
+    devices/<id>.json
+    virtualDevices/<id>.json
+    scenes/<id>.json
+    globalVariables/<name>.json
+    rooms/<id>.json
+    users/<id>.json
+
+Entities are added one at a time as they are streamed from the hc2 api,
+and any single entity can be read back through the zip central directory
+without extracting the others. python2 tarfile has no xz support and a
+tar.gz needs a full scan to find a member, so zip is used.
+
+Usage::
+
+    with HC2Snapshot(file_path, 'w', hostname=hostname) as snapshot:
+        for device in dev_api.iter_items():
+            snapshot.add('devices', device['id'], device)
+
+    with HC2Snapshot(file_path) as snapshot:
+        device = snapshot.get('devices', 10)
+
+"""
+
+import os
+import json
+import time
+import logging
+import zipfile
+
+
+class HC2Snapshot(object):
+
+    index_name = 'index.json'
+
+    def __init__(self, file_path, mode='r', hostname=None, logger=None):
+        if mode not in ('r', 'w'):
+            raise ValueError('%s mode should be r or w, got %s' % (self.__class__.__name__, mode))
+        self.file_path = file_path
+        self.mode = mode
+        self.logger = logger or logging.getLogger(__name__)
+        self._zip = zipfile.ZipFile(file_path, mode, zipfile.ZIP_DEFLATED, allowZip64=True)
+        if mode == 'w':
+            self.index = {
+                'hostname': hostname,
+                'created': int(time.time()),
+                'categories': {},
+                'errors': {},
+            }
+        else:
+            self.index = json.loads(self._zip.read(self.index_name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _member_name(category, key):
+        return u'%s/%s.json' % (category, key)
+
+    def add(self, category, key, obj):
+        """add json object obj of category with key (id or name)"""
+
+        name = self._member_name(category, key)
+        self._zip.writestr(name, json.dumps(obj, indent=2))
+        self.index['categories'].setdefault(category, []).append({
+            'key': key,
+            'name': obj.get('name') if type(obj) is dict else None,
+            'file': name,
+        })
+
+    def add_error(self, category, error):
+        """record category fail to be snapshot"""
+        self.index['errors'][category] = error
+
+    def close(self):
+        if self._zip is None:
+            return
+        if self.mode == 'w':
+            self._zip.writestr(self.index_name, json.dumps(self.index, indent=2))
+        self._zip.close()
+        self._zip = None
+
+    # -- read a snapshot
+    def categories(self):
+        return sorted(self.index['categories'].keys())
+
+    def entries(self, category):
+        """return index entries [{key, name, file}, ...] of category"""
+        return self.index['categories'].get(category, [])
+
+    def get(self, category, key):
+        """return json object of category with key, None if not in snapshot"""
+
+        for entry in self.entries(category):
+            if '%s' % entry['key'] == '%s' % key:
+                return json.loads(self._zip.read(entry['file']))
+        self.logger.warning('snapshot %s has no %s %s' % (
+            os.path.basename(self.file_path), category, key))
+        return None
+
+    def iter_items(self, category):
+        """yield json objects of category one at a time"""
+
+        for entry in self.entries(category):
+            yield json.loads(self._zip.read(entry['file']))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Compact summary records of hc2 devices, scenes and rooms.
+
+Listing and topology building only need a few attributes of each entity,
+a __slots__ record keeps those without the whole json object (e.g. the
+properties tree and button lua code of a virtual device).
+"""
+
+
+class HC2Summary(object):
+
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for field in self.__slots__:
+            setattr(self, field, kwargs.get(field))
+
+    @classmethod
+    def from_json(cls, obj):
+        """return record from hc2 api json object"""
+        record = cls.__new__(cls)
+        for field in cls.__slots__:
+            setattr(record, field, obj.get(field))
+        return record
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<%s %s %r>' % (self.__class__.__name__, self.id, self.name)
+
+
+class DeviceSummary(HC2Summary):
+
+    __slots__ = ('id', 'name', 'roomID', 'type', 'visible')
+
+
+class SceneSummary(HC2Summary):
+
+    __slots__ = ('id', 'name', 'roomID', 'type', 'visible')
+
+
+class RoomSummary(HC2Summary):
+
+    __slots__ = ('id', 'name', 'sectionID')
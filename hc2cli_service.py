@@ -12,43 +12,86 @@ class HC2CliService(object):
     def __init__(self, args=None, logger=None):
         self.logger = logger if logger else logging.getLogger(__name__)
         self.args = args
+        self._apis = {}
+
+    def _get_api(self, api_cls):
+        """return api_cls instance shared by all commands of this service"""
+        api = self._apis.get(api_cls)
+        if api is None:
+            api = api_cls(self.args, self.logger)
+            self._apis[api_cls] = api
+        return api
 
     # -- common functions
     @staticmethod
     def _list_name_id(host_name, api_name, data_set):
+        """write entries of data_set (list or iterator) as soon as each is available"""
 
-        count = 1
+        count = 0
         import sys
-        if data_set:
-            sys.stderr.write('remote hc2 (%s) scene list (%s):\n' % (
-                host_name, len(data_set)))
-            for entry in data_set:
-                sys.stderr.write('{count}: {name} (id: {scene_id})\n'.format(
-                    count=count, name=entry['name'].encode('utf8'), scene_id=entry.get('id', None)))
-                count += 1
+        for entry in data_set or []:
+            if count == 0:
+                sys.stderr.write('remote hc2 (%s) %s list:\n' % (host_name, api_name))
+            count += 1
+            sys.stderr.write('{count}: {name} (id: {scene_id})\n'.format(
+                count=count, name=entry['name'].encode('utf8'), scene_id=entry.get('id', None)))
+        if count:
+            sys.stderr.write('total %s %s\n' % (count, api_name))
         else:
             sys.stderr.write('err: no {api_name} available\n'.format(api_name=api_name))
 
+    @staticmethod
+    def _list_dump_changes(changes):
+        """write changed local dump files of a pull"""
+
+        import sys
+        for file_path, change in sorted((changes or {}).items()):
+            sys.stderr.write('{change:>8}: {file_path}\n'.format(
+                change=change, file_path=file_path.encode('utf8')))
+        sys.stderr.write('%s dump files changed\n' % len(changes or {}))
+
+    @staticmethod
+    def _list_update_diff(changes):
+        """write changed attributes of a vdev update"""
+
+        import sys
+        for change in changes:
+            sys.stderr.write('changed: %s\n' % change['attr'])
+        if not changes:
+            sys.stderr.write('no change, hc2 update skipped\n')
+
     # -- functions for command [dev]
     def dev_pull(self,dev_id):
         """query dev json from hc2 and save as local files including buttons and mainLoop code"""
         from hc2.base_service import HC2BaseService
         hc2 = HC2BaseService(self.args, self.logger)
         device = hc2.dump_device(dev_id)
+        if device:
+            self._list_dump_changes(hc2.last_dump_changes)
         return device
     
+    def dev_pull_all(self, dev_ids=None):
+        """query all hc2 devices (or dev_ids) at once and save each as local files,
+        return dump summary dict"""
+        from hc2.base_service import HC2BaseService
+        hc2 = HC2BaseService(self.args, self.logger)
+        summary = hc2.dump_devices(dev_ids)
+        if summary:
+            self._list_dump_changes(summary['changes'])
+        return summary
+
     # -- functions for command [vdev]
     def vdev_delete(self,dev_id):
         """delete hc2 vdev with http delete method"""        
         from hc2.api_vdev import HC2APIVirtualDevice
-        hc2 = HC2APIVirtualDevice(self.args, self.logger)
+        hc2 = self._get_api(HC2APIVirtualDevice)
         result = hc2.delete(dev_id)
         return result
     
     def vdev_create(self,dev):
         """create hc2 vdev with http post method"""        
         from hc2.api_vdev import HC2APIVirtualDevice
-        hc2 = HC2APIVirtualDevice(self.args, self.logger)
+        hc2 = self._get_api(HC2APIVirtualDevice)
         device = hc2.post(dev)
         if device:
             # when create new vdev, it needs to post origin dev object in order to update dev btn and mainloop
@@ -61,34 +104,44 @@ class HC2CliService(object):
         update hc2 vdev with http put method"""
         from hc2.base_service import HC2BaseService
         hc2 = HC2BaseService(self.args, self.logger)
-        return hc2.update_vdevice(dev_id)
+        vdev = hc2.update_vdevice(dev_id)
+        if hc2.last_update_diff is not None:
+            self._list_update_diff(hc2.last_update_diff)
+        return vdev
     
+    def vdev_update_many(self, dev_ids=None, pattern=None):
+        """update hc2 vdevs (dev_ids or all dumped vdevs, only the ones matched with pattern
+        if given) with local dumped files concurrently, return the push summary dict"""
+        from hc2.base_service import HC2BaseService
+        hc2 = HC2BaseService(self.args, self.logger)
+        return hc2.update_vdevices(dev_ids, pattern)
+
     # -- functions for command [gvar]
     def gvar_query(self,var_name):
         """query hc2 global variable with http get method"""
         from hc2.api_gvar import HC2APIGlobalVariable
-        hc2 = HC2APIGlobalVariable(self.args, self.logger)
+        hc2 = self._get_api(HC2APIGlobalVariable)
         var = hc2.get(var_name)
         return var
     
     def gvar_create(self,var):
         """create hc2 global variable with http post method"""
         from hc2.api_gvar import HC2APIGlobalVariable
-        hc2 = HC2APIGlobalVariable(self.args, self.logger)
+        hc2 = self._get_api(HC2APIGlobalVariable)
         t_var = hc2.post(var)
         return t_var
     
     def gvar_delete(self,var_name):
         """delete hc2 global variable with http delete method"""
         from hc2.api_gvar import HC2APIGlobalVariable
-        hc2 = HC2APIGlobalVariable(self.args, self.logger)
+        hc2 = self._get_api(HC2APIGlobalVariable)
         var = hc2.delete(var_name)
         return var
     
     def gvar_update(self,var_name,var):
         """update hc2 global variable value with http put mthod"""
         from hc2.api_gvar import HC2APIGlobalVariable
-        hc2 = HC2APIGlobalVariable(self.args, self.logger)
+        hc2 = self._get_api(HC2APIGlobalVariable)
         t_var = hc2.put(var_name,var)
         return t_var
     
@@ -97,6 +150,8 @@ class HC2CliService(object):
         from hc2.base_service import HC2BaseService
         hc2 = HC2BaseService(self.args, self.logger)
         gvar = hc2.pull_gvar(var_name)
+        if gvar:
+            self._list_dump_changes(hc2.last_dump_changes)
         return gvar
     
     def gvar_push(self,var_name):
@@ -109,11 +164,10 @@ class HC2CliService(object):
     def gvar_list(self):
         """list all global variable name from remote hc2"""
         from hc2.api_gvar import HC2APIGlobalVariable
-        hc2 = HC2APIGlobalVariable(self.args, self.logger)
-        g_vars = hc2.get('')
+        hc2 = self._get_api(HC2APIGlobalVariable)
         self._list_name_id(host_name=hc2.hostname,
                            api_name='globalVariables',
-                           data_set=g_vars)
+                           data_set=hc2.iter_items(fields=['id', 'name']))
 
     # -- functions for command [scene]
     def scene_pull(self, scene_id):
@@ -122,6 +176,8 @@ class HC2CliService(object):
         from hc2.scene_service import HC2SceneService
         hc2 = HC2SceneService(self.args, self.logger)
         scene = hc2.dump_scene(scene_id)
+        if scene:
+            self._list_dump_changes(hc2.last_dump_changes)
         return scene
     
     def scene_update(self, scene_id):
@@ -135,12 +191,11 @@ class HC2CliService(object):
     def scene_list(self):
         """list current scene name & id on remote hc2"""
 
-        from hc2.scene_service import HC2SceneService
-        hc2 = HC2SceneService(self.args, self.logger)
-        scenes = hc2.get_scenes()
+        from hc2.api_scene import HC2APIScene
+        hc2 = self._get_api(HC2APIScene)
         self._list_name_id(host_name=hc2.hostname,
                            api_name='scenes',
-                           data_set=scenes)
+                           data_set=hc2.iter_items(fields=['id', 'name']))
 
     def scene_start(self, scene_id):
         """start hc2 scene with scene_id"""
@@ -149,31 +204,74 @@ class HC2CliService(object):
         hc2 = HC2SceneService(self.args, self.logger)
         return hc2.start_scene(scene_id)
 
+    # -- function for command [plan]
+    def plan(self, categories=None):
+        """return pending changes of local dump files against remote hc2, nothing is written"""
+
+        from hc2.plan_service import HC2PlanService
+        hc2 = HC2PlanService(self.args, self.logger)
+        return hc2.plan(categories)
+
     # -- function for command [service]
     def service_reboot(self):
         """reboot hc2"""
         from hc2.api_service import HC2APIService
-        hc2 = HC2APIService(self.args, self.logger)
+        hc2 = self._get_api(HC2APIService)
         data = hc2.reboot()
         import sys
         sys.stderr.write('remote hc2 (%s) service reboot return data %s\n' % (hc2.hostname, data))
 
+    def service_snapshot(self, file_path=None):
+        """save all hc2 entities into one compressed snapshot file"""
+        from hc2.base_service import HC2BaseService
+        hc2 = HC2BaseService(self.args, self.logger)
+        file_path = hc2.snapshot(file_path)
+        import sys
+        sys.stderr.write('remote hc2 (%s) snapshot saved in %s\n' % (hc2.hostname, file_path))
+        return file_path
+
+    def service_dumps(self, category=None, pattern=None, changed_since=None):
+        """list local dumped hc2 entities of the dump catalog"""
+        from hc2.base_service import HC2BaseService
+        import time
+        import sys
+        hc2 = HC2BaseService(self.args, self.logger)
+        entries = hc2.get_dump_catalog(category, pattern, changed_since)
+        for entry in entries:
+            sys.stderr.write(u'{category:<9} {id:>6} {changed} {name}\n'.format(
+                category=entry['category'], id=entry['id'], name=entry['name'] or u'',
+                changed=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['changed']))
+            ).encode('utf8'))
+        sys.stderr.write('%s dumped entities of remote hc2 (%s)\n' % (len(entries), hc2.hostname))
+        return entries
+
     # -- function for command [rooms]
     def room_list(self):
         """list current room on remote hc2"""
-        from hc2.room_service import HC2RoomService
-        hc2 = HC2RoomService(self.args, self.logger)
-        rooms = hc2.get_rooms()
+        from hc2.api_room import HC2APIRoom
+        hc2 = self._get_api(HC2APIRoom)
         self._list_name_id(host_name=hc2.hostname,
                            api_name='rooms',
-                           data_set=rooms)
+                           data_set=hc2.iter_items(fields=['id', 'name']))
 
     # -- functions for command [topology]
     def topology_pull(self, category='all'):
         """pull hc2 topology with category [all, devices, scenes, rooms]"""
         from hc2.base_service import HC2BaseService
+        import sys
         hc2 = HC2BaseService(self.args, self.logger)
-        return hc2.update_hc2_topology_file()
+        topology_file = hc2.update_hc2_topology_file()
+        delta = hc2.last_topology_delta
+        if delta is not None:
+            for key in ('added', 'removed', 'renamed', 'updated'):
+                for change in delta[key]:
+                    sys.stderr.write(u'{key:<8} {category:<8} {id:>6} {name}{old_name}\n'.format(
+                        key=key, category=change['category'], id=change['id'], name=change['name'],
+                        old_name=u' (was %s)' % change['old_name'] if 'old_name' in change else u''
+                    ).encode('utf8'))
+            if not hc2.is_topology_changed(delta):
+                sys.stderr.write('remote hc2 (%s) topology not changed\n' % hc2.hostname)
+        return topology_file
 
     def topology_get(self):
         from hc2.base_service import HC2BaseService
@@ -213,8 +311,7 @@ class HC2CliService(object):
     def daikin_update_btn_cmd_arg(self, dev_id):
         from hc2.base_service import HC2BaseService
         hc2 = HC2BaseService(self.args, self.logger)
-        cmd_arg_list = hc2.restore_btn_cmd_arg_value(dev_id)
-        return cmd_arg_list
+        return hc2.restore_btn_cmd_arg_value(dev_id)
     
     def daikin_btn_cmd_arg_file_code_update(self, dev_id):
         cmd_arg_file_path = self.daikin_btn_cmd_arg_file_path(dev_id)
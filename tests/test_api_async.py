@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_async import HC2APIAsync
+from hc2.api_base import HC2APIBase
+from hc2.api_room import HC2APIRoom
+
+
+class TestHostLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=4, scenes=4)).start()
+        self.api = HC2APIRoom(self.server.args())
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def _call(self, item):
+        with self._lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        time.sleep(0.02)
+        with self._lock:
+            self.inflight -= 1
+        return item
+
+    def test_limit_shared_by_host(self):
+        with HC2APIAsync(self.api, concurrency=2) as first:
+            # more workers, same hc2 in flight limit
+            with HC2APIAsync(self.api, workers=6) as second:
+                self.assertIs(first.host_limit, second.host_limit)
+                results = [first.submit(self._call, i) for i in range(6)]
+                self.assertEqual(second.map(self._call, range(6)), list(range(6)))
+                self.assertEqual([result.get() for result in results], list(range(6)))
+        self.assertEqual(self.max_inflight, 2)
+
+    def test_later_concurrency_applies(self):
+        HC2APIAsync(self.api, concurrency=2).close()
+        with HC2APIAsync(self.api, concurrency=5) as hc2_async:
+            self.assertEqual(hc2_async.host_limit.limit, 5)
+            hc2_async.map(self._call, range(10))
+        self.assertEqual(self.max_inflight, 5)
+        # no configured concurrency keeps the limit
+        self.assertEqual(HC2APIAsync(self.api).host_limit.limit, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import logging
+import time
+import threading
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.api_breaker import HC2CircuitBreaker
+from hc2.api_cache import HC2ResponseCache
+from hc2.api_room import HC2APIRoom
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestIterItemsRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=4, scenes=4)).start()
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def _iter_rooms(self, api, result):
+        result['rooms'] = list(api.iter_items(fields=['id', 'name']))
+        result['error'] = api.last_error
+
+    def test_stream_retries_release_connections(self):
+        """503 streamed responses are closed, so retries of a one connection pool never block"""
+
+        api = HC2APIRoom(self.server.args(pool_maxsize=1, max_retries=2, cache_ttl=0))
+        self.server.error_rate = 1.0
+        result = {}
+        thread = threading.Thread(target=self._iter_rooms, args=(api, result))
+        thread.daemon = True
+        thread.start()
+        thread.join(15)
+        self.assertFalse(thread.is_alive(), 'iter_items blocked on the connection pool')
+        self.assertEqual(result['rooms'], [])
+        self.assertEqual(result['error'].status_code, 503)
+        self.assertEqual(self.server.request_counts[('GET', '/rooms')], 3)
+
+        self.server.error_rate = 0.0
+        result = {}
+        thread = threading.Thread(target=self._iter_rooms, args=(api, result))
+        thread.daemon = True
+        thread.start()
+        thread.join(15)
+        self.assertFalse(thread.is_alive(), 'iter_items blocked on the connection pool')
+        self.assertIsNone(result['error'])
+        self.assertEqual(len(result['rooms']), len(self.server.fixtures.rooms))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=4, scenes=4)).start()
+        self.api = HC2APIRoom(self.server.args(max_retries=0, cache_ttl=0))
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def test_half_open_trial_request_exception(self):
+        """a requests error other than timeout or connection error on the half open trial call
+        opens the circuit again instead of leaving it half open"""
+
+        breaker = self.api.circuit_breaker
+        breaker.state = HC2CircuitBreaker.OPEN
+        breaker.opened_time = 0
+
+        def request(*args, **kwargs):
+            raise requests.exceptions.ChunkedEncodingError('broken chunk')
+        self.api.session.request = request
+        try:
+            self.assertIsNone(self.api.get())
+        finally:
+            del self.api.session.request
+        self.assertEqual(self.api.last_error.kind, 'unknown')
+        self.assertEqual(breaker.state, HC2CircuitBreaker.OPEN)
+
+        # the next trial call closes the circuit
+        breaker.opened_time = 0
+        self.assertIsNotNone(self.api.get())
+        self.assertEqual(breaker.state, HC2CircuitBreaker.CLOSED)
+
+
+class TestResponseCacheTTL(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=4, scenes=4)).start()
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def test_ttl_of_each_api(self):
+        """the host cache is shared, but an api with cache_ttl 0 always queries hc2"""
+
+        cached_api = HC2APIRoom(self.server.args())
+        uncached_api = HC2APIRoom(self.server.args(cache_ttl=0))
+        self.assertIs(cached_api.cache, uncached_api.cache)
+
+        cached_api.get()
+        cached_api.get()
+        self.assertEqual(self.server.total_requests(), 1)
+        uncached_api.get()
+        uncached_api.get()
+        self.assertEqual(self.server.total_requests(), 3)
+
+    def test_smaller_ttl(self):
+        cache = HC2ResponseCache(ttl=10)
+        cache.set('/api/rooms', 'content')
+        time.sleep(0.05)
+        self.assertIsNone(cache.get('/api/rooms', ttl=0.01))
+        self.assertEqual(cache.get('/api/rooms'), 'content')
+        cache.set('/api/rooms', 'new content', ttl=0)
+        self.assertIsNone(cache.get('/api/rooms'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hc2.blob_store import HC2BlobStore, split_script, render_script
+
+SCRIPT = (
+    "--[[ daikin unit 3 ]]\n"
+    "local cmdText = 'power'\n"
+    "local argText = 'on'\n"
+    "fibaro:debug(cmdText .. ' ' .. argText)\n"
+)
+
+
+class TestBlobStoreScript(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = HC2BlobStore(os.path.join(self.tmp_dir, 'blobs'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _round_trip(self, script):
+        """return (reference, script of the reference saved in a refs file and loaded back)"""
+        ref = json.loads(json.dumps(self.store.put_script(script)))
+        return ref, self.store.get_script(ref)
+
+    def test_template_params(self):
+        ref, script = self._round_trip(SCRIPT)
+        self.assertEqual(script, SCRIPT)
+        self.assertEqual(ref['params'], {'cmdText': "'power'", 'argText': "'on'"})
+        self.assertNotIn("'power'", self.store.get(ref['template']))
+
+    def test_repeated_param_lines(self):
+        source = SCRIPT + "if x then\n  local cmdText = 'mode'\n  local argText = 'cool'\nend\n"
+        ref, script = self._round_trip(source)
+        self.assertEqual(script, source)
+        # only the first line of each parameter is a template parameter
+        self.assertEqual(ref['params'], {'cmdText': "'power'", 'argText': "'on'"})
+        self.assertIn("local cmdText = 'mode'", self.store.get(ref['template']))
+
+    def test_crlf(self):
+        source = SCRIPT.replace('\n', '\r\n')
+        ref, script = self._round_trip(source)
+        self.assertEqual(script, source)
+        self.assertIn('\r\n', self.store.get(ref['template']))
+        self.assertEqual(render_script(*split_script(source)), source)
+
+    def test_non_ascii(self):
+        source = SCRIPT.replace("'on'", "'開機'").replace('daikin', '大金')
+        ref, script = self._round_trip(source)
+        self.assertEqual(script, source)
+        self.assertEqual(self._round_trip(source.decode('utf8'))[1], source)
+
+    def test_no_param_line(self):
+        source = "fibaro:debug('no param')\n"
+        ref, script = self._round_trip(source)
+        self.assertEqual(ref.keys(), ['blob'])
+        self.assertEqual(script, source)
+
+    def test_scripts_share_template(self):
+        other = SCRIPT.replace("'power'", "'mode'").replace("'on'", "'cool'")
+        ref, script = self._round_trip(SCRIPT)
+        other_ref, other_script = self._round_trip(other)
+        self.assertEqual((script, other_script), (SCRIPT, other))
+        self.assertEqual(ref['template'], other_ref['template'])
+        self.assertNotEqual(ref['params'], other_ref['params'])
+        blobs = [name for _, _, names in os.walk(self.store.store_root) for name in names]
+        self.assertEqual(len(blobs), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
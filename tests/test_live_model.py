@@ -0,0 +1,72 @@
+import os
+import sys
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.api_vdev import HC2APIVirtualDevice
+from hc2.live_model import HC2LiveModel
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestLiveModel(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=8, vdevs=2, scenes=4), refresh_wait=0.2).start()
+        self.args = self.server.args(cache_ttl=0)
+        self.model = HC2LiveModel(self.args)
+        self.changes = []
+        self.model.subscribe(self.changes.append, categories=['devices'])
+        self.assertTrue(self.model.seed())
+        self.vdev_id = self.server.fixtures.devices[0]['id']
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def _rename_vdev(self, name):
+        vdev = HC2APIVirtualDevice(self.args).get(self.vdev_id)
+        vdev['name'] = name
+        HC2APIVirtualDevice(self.args).put(self.vdev_id, vdev)
+
+    def test_property_change(self):
+        dev_id = self.server.fixtures.devices[-1]['id']
+        self.server.set_device_property(dev_id, 'value', '42')
+        changes = self.model.poll_once()
+        self.assertEqual([(c['id'], c['property'], c['new']) for c in changes], [(dev_id, 'value', '42')])
+        self.assertEqual(self.model.devices[dev_id]['properties']['value'], '42')
+        self.assertEqual(self.changes[-1]['kind'], 'updated')
+
+    def test_device_rename(self):
+        topology = self.model.get_topology()
+        self._rename_vdev('RENAMED_VDEV')
+        changes = self.model.poll_once()
+        self.assertEqual([(c['id'], c['kind']) for c in changes], [(self.vdev_id, 'updated')])
+        self.assertEqual(self.model.devices[self.vdev_id]['name'], 'RENAMED_VDEV')
+        self.assertIsNot(self.model.get_topology(), topology)
+        self.assertEqual(self.model.get_name_index().search('renamed vdev', 'devices')[0]['id'], self.vdev_id)
+
+    def test_element_query_fail_keeps_cursor(self):
+        last = self.model.last
+        self._rename_vdev('RENAMED_VDEV')
+        dev_api = self.model.apis['devices']
+        dev_api.get = lambda key=None, params=None: None
+        try:
+            self.assertIsNone(self.model.poll_once())
+        finally:
+            del dev_api.get
+        self.assertEqual(self.model.last, last)
+        self.assertNotEqual(self.model.devices[self.vdev_id]['name'], 'RENAMED_VDEV')
+
+        # the change is polled again
+        self.assertEqual(len(self.model.poll_once()), 1)
+        self.assertEqual(self.model.devices[self.vdev_id]['name'], 'RENAMED_VDEV')
+        self.assertGreater(self.model.last, last)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import logging
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.base_service import HC2BaseService
+from hc2.name_index import HC2NameIndex, MATCH_RATIO_THRESHOLD
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestNameIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        fixtures = HC2Fixtures(devices=10, scenes=20, rooms=10)
+        # a second 'Reading Mode' scene in another room than the first one
+        cls.reading = fixtures.scenes[0]
+        cls.reading_dup = fixtures.scenes[11]
+        cls.reading_dup['name'] = cls.reading['name']
+        cls.rooms = dict((room['id'], room['name']) for room in fixtures.rooms)
+        server = FakeHC2Server(fixtures).start()
+        try:
+            cls.hc2 = HC2BaseService(server.args(cache_ttl=0))
+            cls.topology = cls.hc2.get_hc2_topology()
+        finally:
+            server.stop()
+            HC2APIBase.close_sessions()
+        cls.scenes = dict((scene['name'], scene) for scene in cls.topology['scenes'])
+        cls.scenes[u'Reading Mode'] = cls.reading
+        for scene in cls.topology['scenes']:
+            if scene['name'] == u'Movie Time':
+                scene['zh_text'] = u'電影時間'
+        cls.index = HC2NameIndex(cls.topology)
+
+    def _id_by_name(self, name, **kwargs):
+        return self.hc2.get_hc2_id_by_name(name, topology=self.topology, **kwargs)
+
+    def test_threshold(self):
+        self.assertEqual(MATCH_RATIO_THRESHOLD, 0.85)
+
+    def test_exact_names(self):
+        for name, scene in self.scenes.items():
+            if name == u'Reading Mode':
+                continue
+            self.assertEqual(self._id_by_name(name), scene['id'])
+        # case and white spaces are normalized
+        self.assertEqual(self._id_by_name(u'  movie   TIME '), self.scenes[u'Movie Time']['id'])
+
+    def test_typo_above_threshold(self):
+        # ratio 0.947 and 0.889
+        self.assertEqual(self._id_by_name(u'movie tme'), self.scenes[u'Movie Time']['id'])
+        self.assertEqual(self._id_by_name(u'pary mde'), self.scenes[u'Party Mode']['id'])
+
+    def test_typo_below_threshold(self):
+        # ratio 0.824 and 0.571
+        self.assertIsNone(self._id_by_name(u'prty md'))
+        self.assertIsNone(self._id_by_name(u'movi'))
+        # still ranked first without threshold
+        matches = self.index.search(u'prty md', 'scenes')
+        self.assertEqual(matches[0]['id'], self.scenes[u'Party Mode']['id'])
+        self.assertEqual(matches[0]['score'], 0.8235)
+
+    def test_ranking(self):
+        matches = self.index.search(u'good night', 'scenes', top_k=3)
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(matches[0]['id'], self.scenes[u'Good Night']['id'])
+        self.assertEqual(matches[0]['score'], 1.0)
+        scores = [match['score'] for match in matches]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(matches[1]['name'], u'Good Night 2')
+
+    def test_duplicate_names_in_rooms(self):
+        self.assertNotEqual(self.reading['roomID'], self.reading_dup['roomID'])
+        matches = self.index.search(u'reading mode', 'scenes', top_k=2)
+        self.assertEqual(sorted(match['id'] for match in matches),
+                         sorted([self.reading['id'], self.reading_dup['id']]))
+        self.assertEqual([match['score'] for match in matches], [1.0, 1.0])
+
+        for scene in (self.reading, self.reading_dup):
+            room_name = self.rooms[scene['roomID']]
+            self.assertEqual(self._id_by_name(u'Reading Mode', room_name=room_name), scene['id'])
+            matches = self.index.search(u'reading mode', 'scenes', room_id=scene['roomID'])
+            self.assertEqual([match['id'] for match in matches if match['score'] == 1.0], [scene['id']])
+
+    def test_unknown_room(self):
+        self.assertIsNone(self._id_by_name(u'Reading Mode', room_name=u'Swimming Pool'))
+
+    def test_lang_code(self):
+        movie_id = self.scenes[u'Movie Time']['id']
+        self.assertEqual(self._id_by_name(u'電影時間', lang_code='zh'), movie_id)
+        self.assertIsNone(self._id_by_name(u'電影時間', lang_code='en'))
+        # an element without zh_text is searched by its name
+        self.assertEqual(self._id_by_name(u'Party Mode', lang_code='zh'), self.scenes[u'Party Mode']['id'])
+        # a lang_code without any <lang_code>_text falls back to the names
+        self.assertEqual(self._id_by_name(u'Movie Time', lang_code='fr'), movie_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
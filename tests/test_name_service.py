@@ -0,0 +1,52 @@
+import os
+import sys
+import logging
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.name_service import HC2NameServer, HC2NameResolver
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestNameServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=4, scenes=10)).start()
+        self.resolver = HC2NameResolver(self.server.args(dump_root=tempfile.mkdtemp()))
+        self.name_server = HC2NameServer({'home': self.resolver}, '127.0.0.1', 0).start()
+        self.base_url = 'http://127.0.0.1:%s' % self.name_server.port
+
+    def tearDown(self):
+        self.name_server.stop()
+        self.server.stop()
+        HC2APIBase.close_sessions()
+
+    def test_resolve(self):
+        scene = [scene for scene in self.server.fixtures.scenes if scene['visible']][0]
+        r = requests.get(self.base_url + '/vb/i/s/', params={'s': scene['name'].lower(), 'c': 'en'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['id'], scene['id'])
+
+    def test_request_error_answered_500(self):
+        def resolve(*args, **kwargs):
+            raise KeyError('roomID')
+        self.resolver.resolve = resolve
+        r = requests.get(self.base_url + '/resolve', params={'name': 'reading mode'})
+        self.assertEqual(r.status_code, 500)
+        self.assertIn('roomID', r.json()['error'])
+
+    def test_post_body_not_object(self):
+        r = requests.post(self.base_url + '/resolve', data='[1, 2]',
+                          headers={'Content-Type': 'application/json'})
+        self.assertEqual(r.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.plan_service import HC2PlanService
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestPlanService(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=8, vdevs=2, scenes=4, gvars=4)).start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dump_root = os.path.join(self.tmp_dir, '.dump')
+        self.args = self.server.args(dump_root=self.dump_root, cache_ttl=0)
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+        shutil.rmtree(self.tmp_dir)
+
+    def _pull(self):
+        hc2 = HC2PlanService(self.args)
+        scene_id = self.server.fixtures.scenes[0]['id']
+        hc2.dump_scene(scene_id)
+        hc2.pull_gvar('AC_Ctrl_Datas')
+        hc2.pull_gvar('gvar_2')
+        return hc2._get_dump_root_path(), scene_id
+
+    def test_plan_without_dump_writes_nothing(self):
+        plan = HC2PlanService(self.args).plan()
+        self.assertEqual(plan, {'devices': [], 'scenes': [], 'globalVariables': []})
+        self.assertFalse(os.path.exists(self.dump_root))
+
+    def test_plan_without_catalog_keeps_dump_untouched(self):
+        dump_path, scene_id = self._pull()
+        os.remove(os.path.join(dump_path, 'catalog.db'))
+        self.server.reset_counts()
+
+        plan = HC2PlanService(self.args).plan(['scenes', 'globalVariables'])
+        self.assertFalse(os.path.exists(os.path.join(dump_path, 'catalog.db')))
+        self.assertEqual(plan['scenes'], [])
+        # one GET of each collection, the scenes list their lua code
+        self.assertEqual(self.server.total_requests(), 2)
+        # pull_gvar saves the json value pretty printed, push_gvar would put it as is
+        self.assertEqual([entry['id'] for entry in plan['globalVariables']], ['AC_Ctrl_Datas'])
+
+    def test_plan_compares_pushed_gvar_value(self):
+        dump_path, scene_id = self._pull()
+        value_file = os.path.join(dump_path, 'variables', 'gvar_2', 'gvar_2_value.txt')
+        with open(value_file, 'w') as fh:
+            fh.write(' 7')
+
+        plan = HC2PlanService(self.args).plan(['globalVariables'])
+        changes = dict((entry['id'], entry['changes']) for entry in plan['globalVariables'])
+        self.assertEqual(changes['gvar_2'][0]['new'], u' 7')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.base_service import HC2BaseService
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestUpdateVdevices(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=20, vdevs=2, scenes=2)).start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hc2 = HC2BaseService(self.server.args(dump_root=self.tmp_dir, cache_ttl=0))
+        self.vdevs = [dev for dev in self.server.fixtures.devices if dev['type'] == 'virtual_device']
+        self.hc2.dump_devices([dev['id'] for dev in self.vdevs])
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+        shutil.rmtree(self.tmp_dir)
+
+    def _pushed_ids(self, summary):
+        return [result['id'] for result in summary['results']]
+
+    def test_repeated_id_pushed_once(self):
+        dev_id = self.vdevs[1]['id']
+        summary = self.hc2.update_vdevices([dev_id, dev_id, self.vdevs[0]['id'], dev_id])
+        self.assertEqual(self._pushed_ids(summary), [dev_id, self.vdevs[0]['id']])
+        self.assertEqual(summary['total'], 2)
+
+    def test_given_ids_filtered_with_pattern(self):
+        dev_ids = [dev['id'] for dev in self.vdevs]
+        summary = self.hc2.update_vdevices(dev_ids, pattern=self.vdevs[0]['name'])
+        self.assertEqual(self._pushed_ids(summary), [self.vdevs[0]['id']])
+        summary = self.hc2.update_vdevices(dev_ids, pattern='NO_SUCH_*')
+        self.assertEqual(summary['total'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
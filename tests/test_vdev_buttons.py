@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_hc2 import FakeHC2Server, HC2Fixtures
+from hc2.api_base import HC2APIBase
+from hc2.api_vdev import HC2APIVirtualDevice
+from hc2.base_service import HC2BaseService, CMD_MATCH_STR, ARG_MATCH_STR
+
+logging.getLogger('hc2').setLevel(logging.CRITICAL)
+
+
+class TestCloneVdevBtn(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=20, vdevs=2, scenes=2)).start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.args = self.server.args(dump_root=self.tmp_dir, cache_ttl=0, dump_dedup=True)
+        self.hc2 = HC2BaseService(self.args)
+        self.dev_id = self.server.fixtures.devices[1]['id']
+        self.buttons = self._buttons()
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+        shutil.rmtree(self.tmp_dir)
+
+    def _buttons(self):
+        return self.hc2._get_vdev_model(HC2APIVirtualDevice(self.args).get(self.dev_id)).buttons
+
+    def test_clone_one_button_of_dedup_dump(self):
+        vdev = HC2APIVirtualDevice(self.args).get(self.dev_id)
+        buttons = self.hc2._get_vdev_model(vdev).buttons
+        buttons[0]['msg'] += u'\n-- cloned'
+        HC2APIVirtualDevice(self.args).put(self.dev_id, vdev)
+        src, dest, other = buttons[0], buttons[1], buttons[2]
+
+        self.hc2.clone_vdev_btn(self.dev_id, src['id'], dest['id'])
+        dump_path = self.hc2._get_dev_dump_path(self.dev_id)
+        self.assertTrue(os.path.exists(os.path.join(dump_path, '%s.buttons.refs' % self.dev_id)))
+
+        buttons = self._buttons()
+        self.assertEqual(buttons[1]['msg'], src['msg'])
+        self.assertEqual(buttons[2]['msg'], other['msg'])
+
+    def test_clone_all_buttons_of_dedup_dump(self):
+        src = self.buttons[0]
+        self.hc2.clone_vdev_btn(self.dev_id, src['id'])
+        self.assertEqual(set(button['msg'] for button in self._buttons()), set([src['msg']]))
+
+
+def _baseline_rewrite(content, cmd_text, arg_text):
+    """the line by line fileinput rewrite of restore_btn_cmd_arg_value before the batch rewriter"""
+    new_lines = []
+    for line in content.splitlines(True):
+        if CMD_MATCH_STR in line:
+            new_line = "%s '%s'\n" % (CMD_MATCH_STR, cmd_text)
+        elif ARG_MATCH_STR in line:
+            new_line = "%s '%s'\n" % (ARG_MATCH_STR, arg_text)
+        else:
+            new_line = line
+        new_lines.append(new_line)
+    return ''.join(new_lines)
+
+
+class TestRewriteBtnCmdArg(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeHC2Server(HC2Fixtures(devices=20, vdevs=2, scenes=2)).start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hc2 = HC2BaseService(self.server.args(dump_root=self.tmp_dir, cache_ttl=0))
+        # the first fixture vdev is a daikin unit
+        dev = self.hc2.dump_device(self.server.fixtures.devices[0]['id'])
+        dump_path = self.hc2._get_dev_dump_path(dev['id'])
+        button, filename = self.hc2._get_vdev_model(dev).btn_filenames()[0]
+        self.btn_file_path = os.path.join(dump_path, filename)
+        with open(self.btn_file_path, 'rb') as fh:
+            self.content = fh.read()
+
+    def tearDown(self):
+        self.server.stop()
+        HC2APIBase.close_sessions()
+        shutil.rmtree(self.tmp_dir)
+
+    def _rewrite(self, content, cmd_text, arg_text):
+        with open(self.btn_file_path, 'wb') as fh:
+            fh.write(content)
+        changes = self.hc2._rewrite_btn_cmd_arg(self.btn_file_path, cmd_text, arg_text)
+        with open(self.btn_file_path, 'rb') as fh:
+            return changes, fh.read()
+
+    def test_same_as_baseline_rewrite(self):
+        self.assertIn(CMD_MATCH_STR, self.content)
+        for cmd_text, arg_text in [('power', 'on'), ('mode', ''), ('', '')]:
+            changes, content = self._rewrite(self.content, cmd_text, arg_text)
+            self.assertEqual(content, _baseline_rewrite(self.content, cmd_text, arg_text))
+
+    def test_line_with_cmd_and_arg_text(self):
+        source = self.content + "%s 'x' -- was %s 'y'\n" % (ARG_MATCH_STR, CMD_MATCH_STR)
+        changes, content = self._rewrite(source, 'power', 'on')
+        self.assertEqual(content, _baseline_rewrite(source, 'power', 'on'))
+        self.assertTrue(content.endswith("%s 'power'\n" % CMD_MATCH_STR))
+
+    def test_unchanged_file_untouched(self):
+        changes, content = self._rewrite(self.content, 'power', 'on')
+        mtime = os.path.getmtime(self.btn_file_path)
+        time.sleep(0.05)
+        self.assertEqual(self.hc2._rewrite_btn_cmd_arg(self.btn_file_path, 'power', 'on'), [])
+        self.assertEqual(os.path.getmtime(self.btn_file_path), mtime)
+
+
+if __name__ == '__main__':
+    unittest.main()